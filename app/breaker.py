@@ -0,0 +1,104 @@
+import os, math, time, threading
+from collections import deque
+from app.metrics import Gauge
+
+# Circuit breaker do portal: falhas seguidas de uma etapa (login, lista, coleta) que abrem o circuito (0 desliga)
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "4"))
+# Só contam as falhas dos últimos N segundos
+BREAKER_WINDOW_SECONDS = int(os.getenv("BREAKER_WINDOW_SECONDS", "300"))
+# Tempo (s) que o circuito fica aberto antes de deixar passar um job de teste
+BREAKER_OPEN_SECONDS = int(os.getenv("BREAKER_OPEN_SECONDS", "120"))
+
+STAGES = {"login": "login não confirmou", "lista": "lista de recursos não carregou",
+          "coleta": "nenhum dado coletado", "portal": "portal não respondeu a tempo"}
+
+class CircuitOpen(Exception):
+    def __init__(self, stage: str, retry_after: int):
+        motivo = STAGES.get(stage, stage)
+        super().__init__(f"Portal instável ({motivo}); coletas suspensas, tente novamente em {retry_after} s.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+class PortalBreaker:
+    """Conta as falhas recentes de cada etapa da coleta no portal. Ao chegar em `threshold` falhas
+    de uma etapa o circuito abre e as coletas falham na hora (sem Chrome nem timeouts de 25 s);
+    passado `open_seconds`, um único job de teste é liberado (meio-aberto): se ele der certo o
+    circuito fecha, se falhar abre de novo."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, window: int = BREAKER_WINDOW_SECONDS,
+                 open_seconds: int = BREAKER_OPEN_SECONDS):
+        self.threshold = threshold
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = "fechado"      # "fechado" | "aberto" | "meio-aberto"
+        self.stage = None           # etapa que abriu o circuito
+        self.opened_at = None
+        self.probing = False        # job de teste em andamento (meio-aberto)
+        self._failures = {}         # etapa -> deque de instantes
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        """Segundos até o circuito aceitar um job de teste (0 se já aceita)."""
+        if self.opened_at is None:
+            return 0
+        return max(0, math.ceil(self.opened_at + self.open_seconds - time.time()))
+
+    def check(self):
+        """Levanta CircuitOpen se uma coleta nova não pode ir ao portal agora (não reserva o teste)."""
+        with self._lock:
+            if self.state == "aberto" and self.retry_after() > 0:
+                raise CircuitOpen(self.stage, self.retry_after())
+            if self.state == "meio-aberto" and self.probing:
+                raise CircuitOpen(self.stage, max(1, self.open_seconds // 4))
+
+    def admit(self) -> bool:
+        """Libera uma coleta pelo portal ou levanta CircuitOpen. Devolve True se ela é o job de
+        teste do circuito meio-aberto (quem recebe True chama `end_probe` ao terminar)."""
+        with self._lock:
+            if self.state == "fechado":
+                return False
+            if self.state == "aberto" and self.retry_after() > 0:
+                raise CircuitOpen(self.stage, self.retry_after())
+            if self.probing:
+                raise CircuitOpen(self.stage, max(1, self.open_seconds // 4))
+            self.state, self.probing = "meio-aberto", True
+            return True
+
+    def end_probe(self):
+        """Fim do job de teste. Sem veredito (cancelado, prazo, erro fora do portal), o próximo
+        pedido vira o teste."""
+        with self._lock:
+            self.probing = False
+
+    def success(self):
+        with self._lock:
+            self._failures.clear()
+            self.state, self.stage, self.opened_at, self.probing = "fechado", None, None, False
+
+    def failure(self, stage: str):
+        now = time.time()
+        with self._lock:
+            if self.threshold <= 0:
+                return
+            if self.state == "meio-aberto":
+                # o teste falhou: abre de novo por mais `open_seconds`
+                self.state, self.stage, self.opened_at, self.probing = "aberto", stage, now, False
+                return
+            q = self._failures.setdefault(stage, deque())
+            q.append(now)
+            while q and now - q[0] > self.window:
+                q.popleft()
+            if len(q) >= self.threshold and self.state == "fechado":
+                self.state, self.stage, self.opened_at = "aberto", stage, now
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            recentes = {s: sum(1 for t in q if now - t <= self.window) for s, q in self._failures.items()}
+            return {"state": self.state, "stage": self.stage, "retry_after": self.retry_after(),
+                    "probing": self.probing, "threshold": self.threshold, "failures": recentes}
+
+BREAKER = PortalBreaker()
+
+Gauge("bbz_portal_breaker_state", "Circuit breaker do portal (0 fechado, 1 meio-aberto, 2 aberto)",
+      lambda: {"fechado": 0, "meio-aberto": 1, "aberto": 2}[BREAKER.state])
@@ -0,0 +1,67 @@
+import os, time, threading
+from contextvars import ContextVar
+
+# Prazo de um job (s), contado do início da coleta; 0 = sem prazo
+JOB_DEADLINE_SECONDS = int(os.getenv("JOB_DEADLINE_SECONDS", "600"))
+
+REASONS = {"cancelado": "cancelado pelo usuário", "prazo": "prazo do job esgotado"}
+
+class Budget:
+    """Prazo + cancelamento de um job. A coleta consulta `should_stop()` entre dias e entre quadras;
+    `cancel()` também derruba na hora os navegadores registrados com `on_cancel`."""
+
+    def __init__(self, seconds: float = JOB_DEADLINE_SECONDS):
+        self.deadline = time.time() + seconds if seconds and seconds > 0 else None
+        self.reason = None   # "cancelado" | "prazo"
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def should_stop(self) -> bool:
+        if self.reason is None and self.deadline is not None and time.time() >= self.deadline:
+            self.reason = "prazo"
+        return self.reason is not None
+
+    def cancel(self):
+        with self._lock:
+            if self.reason is None:
+                self.reason = "cancelado"
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def on_cancel(self, fn):
+        """Registra `fn` para rodar no cancelamento (na hora, se já foi cancelado). Devolve `fn`."""
+        with self._lock:
+            if self.reason != "cancelado":
+                self._callbacks.append(fn)
+                return fn
+        fn()
+        return fn
+
+    def remove(self, fn):
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+_BUDGET = ContextVar("job_budget", default=None)
+
+def start_budget(seconds: float = JOB_DEADLINE_SECONDS) -> Budget:
+    """Começa o orçamento do job corrente (contexto atual) e devolve-o."""
+    budget = Budget(seconds)
+    _BUDGET.set(budget)
+    return budget
+
+def current_budget():
+    return _BUDGET.get()
+
+def should_stop() -> bool:
+    """True se o job corrente foi cancelado ou passou do prazo."""
+    budget = _BUDGET.get()
+    return budget is not None and budget.should_stop()
+
+def stop_reason():
+    budget = _BUDGET.get()
+    return budget.reason if budget is not None and budget.should_stop() else None
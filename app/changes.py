@@ -0,0 +1,121 @@
+import os, json, hmac, hashlib, threading
+from datetime import date
+from app import history
+from app.metrics import Counter
+
+# Feed de mudanças de disponibilidade (tabela `feed` do histórico) e o webhook opcional que o repassa.
+# URL que recebe as mudanças por POST ("" desliga o webhook)
+CHANGES_WEBHOOK_URL = os.getenv("CHANGES_WEBHOOK_URL", "")
+# Segredo para assinar o corpo (header X-BBZ-Signature: sha256=<hmac>); vazio = sem assinatura
+CHANGES_WEBHOOK_SECRET = os.getenv("CHANGES_WEBHOOK_SECRET", "")
+# Intervalo (s) entre leituras do feed e máximo de mudanças por POST
+CHANGES_WEBHOOK_INTERVAL = float(os.getenv("CHANGES_WEBHOOK_INTERVAL", "5"))
+CHANGES_WEBHOOK_BATCH = int(os.getenv("CHANGES_WEBHOOK_BATCH", "100"))
+
+WEBHOOK_POSTS = Counter("bbz_webhook_posts_total", "POSTs do webhook de mudanças", labels=("status",))
+
+def change_payload(row: dict) -> dict:
+    """Linha do feed no formato enxuto da API/webhook."""
+    from app.transform import DIAS_SEMANA
+    return {"seq": row["seq"], "data": row["data"],
+            "dia_semana": DIAS_SEMANA[date.fromisoformat(row["data"]).weekday()],
+            "quadra": row["quadra"], "hora": row["hora"],
+            "de": row["prev_status"], "para": row["status"],
+            "livre": row["status"] == history.DISPONIVEL, "em": round(row["scraped_at"], 1)}
+
+def read_changes(store, since: int = None, quadras: list = None, limit: int = 500) -> dict:
+    """{"cursor", "changes", "reset"} a partir do cursor `since`. Sem `since`, só devolve o cursor
+    atual (para começar a acompanhar dali). `reset` avisa que mudanças entre `since` e o começo
+    da resposta já saíram do feed (retenção) ou que o cursor é de outro banco."""
+    head = store.feed_head()
+    if since is None:
+        return {"cursor": head, "changes": [], "reset": False}
+    rows, oldest = store.feed(since, quadras, limit)
+    reset = since > head or (oldest is not None and since < oldest - 1)
+    return {"cursor": rows[-1]["seq"] if rows else head, "reset": reset,
+            "changes": [change_payload(r) for r in rows]}
+
+class WebhookDispatcher:
+    """Lê o feed a partir do cursor salvo no histórico e manda as mudanças em lotes por POST.
+    O cursor só anda depois de um 2xx (entrega pelo menos uma vez); falhas esperam mais a cada
+    tentativa, até 5 min."""
+
+    CURSOR = "webhook"
+
+    def __init__(self, url: str, secret: str = CHANGES_WEBHOOK_SECRET,
+                 interval: float = CHANGES_WEBHOOK_INTERVAL, batch: int = CHANGES_WEBHOOK_BATCH):
+        self.url, self.secret = url, secret
+        self.interval, self.batch = max(0.5, interval), max(1, batch)
+        self.last_error = None
+        self.delivered = 0
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, name="changes-webhook", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _post(self, body: bytes) -> bool:
+        import requests
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            sig = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-BBZ-Signature"] = f"sha256={sig}"
+        try:
+            r = requests.post(self.url, data=body, headers=headers, timeout=10)
+            ok = 200 <= r.status_code < 300
+            self.last_error = None if ok else f"HTTP {r.status_code}"
+        except requests.RequestException as e:
+            ok, self.last_error = False, str(e)
+        WEBHOOK_POSTS.inc(status="ok" if ok else "erro")
+        return ok
+
+    def dispatch_once(self, store) -> int:
+        """Manda o próximo lote pendente. Devolve quantas mudanças foram entregues (-1 se falhou)."""
+        since = store.get_cursor(self.CURSOR)
+        if since is None:
+            # primeira vez: começa do ponto atual, sem despejar o histórico inteiro
+            store.set_cursor(self.CURSOR, store.feed_head())
+            return 0
+        out = read_changes(store, since, limit=self.batch)
+        if not out["changes"]:
+            return 0
+        if not self._post(json.dumps(out, ensure_ascii=False).encode("utf-8")):
+            return -1
+        store.set_cursor(self.CURSOR, out["cursor"])
+        self.delivered += len(out["changes"])
+        return len(out["changes"])
+
+    def _loop(self):
+        backoff = self.interval
+        while not self._stop.is_set():
+            store = history.get_store()
+            try:
+                n = self.dispatch_once(store) if store is not None else 0
+            except Exception as e:
+                n, self.last_error = -1, str(e)
+            if n < 0:
+                backoff = min(backoff * 2, 300)
+            else:
+                backoff = self.interval
+            if n < self.batch:
+                self._stop.wait(backoff)
+
+    def stats(self) -> dict:
+        store = history.get_store()
+        return {"url": self.url, "cursor": store.get_cursor(self.CURSOR) if store else None,
+                "delivered": self.delivered, "last_error": self.last_error}
+
+DISPATCHER = None
+
+def start_webhook():
+    """Liga o webhook se CHANGES_WEBHOOK_URL e o histórico estiverem configurados (rode em um
+    processo só: o cursor é um por banco)."""
+    global DISPATCHER
+    if not CHANGES_WEBHOOK_URL or history.get_store() is None:
+        return None
+    if DISPATCHER is None:
+        DISPATCHER = WebhookDispatcher(CHANGES_WEBHOOK_URL).start()
+    return DISPATCHER
@@ -0,0 +1,528 @@
+import os, time, threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import WebDriverException
+from app.metrics import span, CHROME_LAUNCHES
+from app.budget import current_budget
+
+# Tamanho do pool = máximo de Chromes vivos ao mesmo tempo
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "2"))
+# Recicla o navegador depois de N jobs (evita vazamento de memória do Chrome)
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "20"))
+
+# process = um Chrome por job (padrão); contexts = poucos Chromes longos, um browser context
+# isolado (cookies/storage próprios, via CDP) por job
+DRIVER_MODE = os.getenv("DRIVER_MODE", "process")
+# Modo contexts: contextos simultâneos por Chrome e Chromes por máquina/container
+CONTEXTS_PER_BROWSER = int(os.getenv("CONTEXTS_PER_BROWSER", "6"))
+BROWSERS_PER_HOST = int(os.getenv("BROWSERS_PER_HOST", str(DRIVER_POOL_SIZE)))
+# Admissão por memória: custo estimado (MB) de um contexto e de um Chrome novo, e a folga mínima
+CONTEXT_MEMORY_MB = int(os.getenv("CONTEXT_MEMORY_MB", "120"))
+BROWSER_MEMORY_MB = int(os.getenv("BROWSER_MEMORY_MB", "350"))
+MEMORY_RESERVE_MB = int(os.getenv("MEMORY_RESERVE_MB", "256"))
+# Caminhos do chromedriver e do Chrome; vazios = resolvidos uma vez pelo Selenium Manager
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "")
+CHROME_BINARY = os.getenv("CHROME_BINARY", "")
+
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp",
+                "*.svg", "*.css", "*.woff", "*.woff2", "*.ttf"]
+
+def build_chrome_options() -> webdriver.ChromeOptions:
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1366,900")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                         "AppleWebKit/537.36 (KHTML, like Gecko) "
+                         "Chrome/122.0.0.0 Safari/537.36")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    prefs = {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    }
+    options.add_experimental_option("prefs", prefs)
+
+    # carregar só quando DOM está pronto (não aguarda todos recursos)
+    options.page_load_strategy = "eager"
+    return options
+
+def apply_resource_blocking(driver):
+    """Aceleração de rede: bloqueia recursos estáticos pesados via CDP."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    except Exception:
+        pass
+
+_PATHS = None
+_PATHS_LOCK = threading.Lock()
+
+def resolve_chrome_paths() -> dict:
+    """Caminhos do chromedriver e do Chrome, resolvidos uma vez por processo. Um `Service()` sem
+    caminho roda o Selenium Manager (um subprocesso) a cada Chrome lançado."""
+    global _PATHS
+    with _PATHS_LOCK:
+        if _PATHS is None:
+            from selenium.webdriver.common.driver_finder import DriverFinder
+            with span("chromedriver"):
+                options = build_chrome_options()
+                if CHROME_BINARY:
+                    options.binary_location = CHROME_BINARY
+                finder = DriverFinder(Service(executable_path=CHROMEDRIVER_PATH or None), options)
+                _PATHS = {"driver": finder.get_driver_path(),
+                          "browser": CHROME_BINARY or finder.get_browser_path()}
+        return _PATHS
+
+def _service() -> Service:
+    return Service(executable_path=resolve_chrome_paths()["driver"])
+
+def launch_driver():
+    options = build_chrome_options()
+    browser = resolve_chrome_paths()["browser"]
+    if browser:
+        options.binary_location = browser
+    driver = webdriver.Chrome(service=_service(), options=options)
+    CHROME_LAUNCHES.inc()
+    # as esperas de app/waits.py rodam via execute_async_script e têm timeout próprio
+    driver.set_script_timeout(60)
+    apply_resource_blocking(driver)
+    return driver
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def is_healthy(driver) -> bool:
+    try:
+        return bool(driver.window_handles) and driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+def reset_driver(driver) -> bool:
+    """Limpa o estado deixado pelo job anterior (janelas extras, frames e cookies)."""
+    try:
+        handles = driver.window_handles
+        for h in handles[1:]:
+            driver.switch_to.window(h)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.switch_to.default_content()
+        driver.get("about:blank")
+        try:
+            # limpa cookies de todos os domínios, não só do atual
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            driver.delete_all_cookies()
+        return True
+    except Exception:
+        return False
+
+class DriverPool:
+    """Pool de Chromes headless pré-lançados, reaproveitados entre jobs."""
+
+    def __init__(self, size: int = DRIVER_POOL_SIZE, max_uses: int = DRIVER_MAX_USES):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []   # drivers prontos para uso
+        self._uses = {}   # id(driver) -> nº de jobs atendidos
+        self._in_use = 0
+
+    def prewarm(self, n: int = None):
+        """Lança drivers antecipadamente até `n` Chromes vivos (padrão: tamanho do pool), contando
+        os que estão com jobs."""
+        n = self.size if n is None else min(n, self.size)
+        while True:
+            with self._lock:
+                if len(self._idle) + self._in_use >= n:
+                    return
+            driver = launch_driver()
+            with self._lock:
+                # jobs pegaram navegadores enquanto este subia: não passa do tamanho do pool
+                extra = len(self._idle) + self._in_use >= self.size
+                if not extra:
+                    self._idle.append(driver)
+                    self._uses[id(driver)] = 0
+            if extra:
+                _quit(driver)
+                return
+
+    def acquire(self, timeout: float = None):
+        """Retorna um driver saudável, ou None se não houver vaga dentro do timeout."""
+        if not self._slots.acquire(timeout=timeout):
+            return None
+        with self._lock:
+            self._in_use += 1
+        try:
+            while True:
+                with self._lock:
+                    driver = self._idle.pop() if self._idle else None
+                if driver is None:
+                    driver = launch_driver()
+                    with self._lock:
+                        self._uses[id(driver)] = 0
+                    return driver
+                if is_healthy(driver):
+                    return driver
+                self._discard(driver)
+        except Exception:
+            self._release_slot()
+            raise
+
+    def release(self, driver, broken: bool = False):
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+            if broken or uses >= self.max_uses or not reset_driver(driver):
+                self._discard(driver)
+                return
+            with self._lock:
+                # o slot deste driver ainda conta em _in_use: passar de `size` vivos = sobra
+                keep = len(self._idle) + self._in_use <= self.size
+                if keep:
+                    self._idle.append(driver)
+            if not keep:
+                self._discard(driver)
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def free_slots(self) -> int:
+        """Quantos navegadores ainda podem ser pegos agora sem esperar."""
+        with self._lock:
+            return self.size - self._in_use
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        _quit(driver)
+
+    def abort(self, driver):
+        """Derruba a sessão em uso (cancelamento do job): os comandos em andamento falham na hora
+        e o `release` descarta o driver."""
+        _quit(driver)
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        with span("driver"):
+            driver = self.acquire(timeout=timeout)
+        if driver is None:
+            raise RuntimeError("Nenhum navegador disponível no pool.")
+        budget = current_budget()
+        on_cancel = budget.on_cancel(lambda: self.abort(driver)) if budget else None
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            if on_cancel:
+                budget.remove(on_cancel)
+            self.release(driver, broken=broken)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._uses.clear()
+        for d in idle:
+            _quit(d)
+
+def available_memory_mb():
+    """Memória livre (MB) para o container: limite do cgroup v2 menos o uso, ou o MemAvailable
+    do /proc/meminfo (o menor dos dois). None se não der para saber."""
+    found = []
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                found.append((int(limit) - int(f.read())) / 2**20)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    found.append(int(line.split()[1]) / 1024)
+                    break
+    except (OSError, ValueError):
+        pass
+    return min(found) if found else None
+
+def _target_id(handle: str) -> str:
+    # chromedriver antigo prefixava os handles com "CDwindow-"; o resto é o targetId do CDP
+    return handle[len("CDwindow-"):] if handle.startswith("CDwindow-") else handle
+
+def _all_handles(driver) -> list:
+    """Todos os handles da sessão, sem o filtro por contexto do ContextDriver."""
+    return webdriver.Chrome.window_handles.fget(driver)
+
+class ContextDriver(webdriver.Chrome):
+    """Sessão do chromedriver presa (debuggerAddress) a um Chrome compartilhado. Com um browser
+    context ativo, `window_handles` só lista as janelas desse contexto, para a troca de janelas do
+    scraper não enxergar as abas dos outros jobs."""
+
+    browser_context_id = None
+
+    @property
+    def window_handles(self):
+        handles = super().window_handles
+        if not self.browser_context_id:
+            return handles
+        infos = self.execute_cdp_cmd("Target.getTargets", {})["targetInfos"]
+        mine = {t["targetId"] for t in infos if t.get("browserContextId") == self.browser_context_id}
+        return [h for h in handles if _target_id(h) in mine]
+
+def attach_driver(address: str) -> ContextDriver:
+    options = webdriver.ChromeOptions()
+    options.debugger_address = address
+    options.page_load_strategy = "eager"
+    driver = ContextDriver(service=_service(), options=options)
+    driver.set_script_timeout(60)
+    return driver
+
+class _Browser:
+    """Um Chrome do modo contexts: a sessão que o lançou (dona da aba "home", onde rodam os
+    comandos CDP de criar/descartar contextos) e sessões extras anexadas, uma por job ativo."""
+
+    def __init__(self):
+        self.host = launch_driver()
+        self.home = self.host.current_window_handle
+        self.address = self.host.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        self.idle = []          # sessões anexadas livres
+        self.active = 0
+        self.jobs = 0
+        self.contexts = True    # False se o Chrome recusou Target.createBrowserContext
+        self.dead = False
+        self.lock = threading.Lock()   # a sessão dona é compartilhada entre threads
+
+class ContextPool:
+    """Pool do modo contexts: até `browsers` Chromes, cada um com até `per_browser` browser
+    contexts isolados ao mesmo tempo (um por job, criado e descartado via CDP). Um contexto novo
+    só é admitido se a memória livre do container cobrir o custo estimado mais a folga."""
+
+    def __init__(self, browsers: int = BROWSERS_PER_HOST, per_browser: int = CONTEXTS_PER_BROWSER,
+                 max_uses: int = DRIVER_MAX_USES, context_mb: int = CONTEXT_MEMORY_MB,
+                 browser_mb: int = BROWSER_MEMORY_MB, reserve_mb: int = MEMORY_RESERVE_MB):
+        self.browsers = max(1, browsers)
+        self.per_browser = max(1, per_browser)
+        self.size = self.browsers * self.per_browser
+        # o Chrome é reciclado depois de atender max_uses jobs por contexto
+        self.recycle_after = max(1, max_uses) * self.per_browser
+        self.context_mb, self.browser_mb, self.reserve_mb = context_mb, browser_mb, reserve_mb
+        self._cond = threading.Condition()
+        self._pool = []         # _Browser vivos
+        self._launching = 0
+        self._in_use = 0
+        self._owner = {}        # id(driver) -> _Browser
+
+    def _memory_ok(self, need_mb: int) -> bool:
+        free = available_memory_mb()
+        return free is None or free - need_mb >= self.reserve_mb
+
+    def _capacity(self, b: _Browser) -> int:
+        return self.per_browser if b.contexts else 1
+
+    def _admit(self):
+        """Sob o lock: reserva vaga num Chrome existente (devolve-o), "launch" se vale lançar um
+        Chrome novo, ou None se é preciso esperar."""
+        open_ = [b for b in self._pool if not b.dead and b.active < self._capacity(b)
+                 and b.jobs < self.recycle_after]
+        if open_ and self._memory_ok(self.context_mb):
+            b = min(open_, key=lambda b: b.active)
+            b.active += 1
+            return b
+        if len(self._pool) + self._launching < self.browsers and self._memory_ok(self.browser_mb + self.context_mb):
+            self._launching += 1
+            return "launch"
+        return None
+
+    def prewarm(self, n: int = None):
+        """Lança Chromes antecipadamente até `n` (padrão: todos)."""
+        n = self.browsers if n is None else min(n, self.browsers)
+        while True:
+            with self._cond:
+                if len(self._pool) + self._launching >= n:
+                    return
+                self._launching += 1
+            self._launched()
+
+    def _launched(self, reserve: bool = False):
+        try:
+            b = _Browser()
+        except Exception:
+            with self._cond:
+                self._launching -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._launching -= 1
+            b.active = 1 if reserve else 0
+            self._pool.append(b)
+            self._cond.notify_all()
+        return b
+
+    def acquire(self, timeout: float = None):
+        """Driver num browser context novo, ou None se não houver vaga dentro do timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                got = self._admit()
+                if got is not None:
+                    break
+                left = None if deadline is None else deadline - time.time()
+                if left is not None and left <= 0:
+                    return None
+                # vaga liberada acorda na hora; a memória é reavaliada a cada meio segundo
+                self._cond.wait(0.5 if left is None else min(0.5, left))
+            self._in_use += 1
+        b = None
+        try:
+            b = self._launched(reserve=True) if got == "launch" else got
+            with self._cond:
+                driver = b.idle.pop() if b.idle else None
+            if driver is None or not is_healthy(driver):
+                if driver is not None:
+                    _quit(driver)
+                driver = attach_driver(b.address)
+            self._open_context(b, driver)
+            with self._cond:
+                self._owner[id(driver)] = b
+            return driver
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                if b is not None:
+                    b.active -= 1
+                self._cond.notify_all()
+            raise
+
+    def _open_context(self, b: _Browser, driver: ContextDriver):
+        driver.switch_to.window(b.home)
+        driver.browser_context_id = None
+        params = {"url": "about:blank"}
+        if b.contexts:
+            try:
+                ctx = driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+                driver.browser_context_id = params["browserContextId"] = ctx
+            except WebDriverException:
+                # sem contextos isolados os cookies seriam compartilhados: esse Chrome passa a
+                # atender um job por vez (como no modo process); quem já entrou junto desiste
+                with self._cond:
+                    b.contexts = False
+                    if b.active > 1:
+                        raise
+        target = driver.execute_cdp_cmd("Target.createTarget", params)["targetId"]
+        handle = next(h for h in _all_handles(driver) if _target_id(h) == target)
+        driver.switch_to.window(handle)
+        apply_resource_blocking(driver)
+
+    def _close_context(self, b: _Browser, driver: ContextDriver) -> bool:
+        """Fecha o contexto do job (e todas as janelas dele). False se a sessão não respondeu."""
+        ctx, driver.browser_context_id = driver.browser_context_id, None
+        try:
+            handles = _all_handles(driver)
+            driver.switch_to.window(b.home)
+            if ctx:
+                driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": ctx})
+            else:
+                # Chrome sem contextos: fecha as abas do job e limpa os cookies compartilhados
+                for h in handles:
+                    if h != b.home:
+                        driver.execute_cdp_cmd("Target.closeTarget", {"targetId": _target_id(h)})
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            return True
+        except Exception:
+            # sessão derrubada (ex.: job cancelado): a sessão dona descarta o contexto pelo job
+            if ctx:
+                try:
+                    with b.lock:
+                        b.host.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": ctx})
+                except Exception:
+                    pass
+            return False
+
+    def release(self, driver, broken: bool = False):
+        with self._cond:
+            b = self._owner.pop(id(driver), None)
+        if b is None:
+            _quit(driver)
+            return
+        ok = self._close_context(b, driver) and not broken
+        retire = []
+        with self._cond:
+            self._in_use -= 1
+            b.active -= 1
+            b.jobs += 1
+            if ok:
+                b.idle.append(driver)
+            else:
+                retire.append(driver)
+                with b.lock:
+                    b.dead = b.dead or not is_healthy(b.host)
+            if (b.dead or b.jobs >= self.recycle_after) and b.active == 0:
+                self._pool.remove(b)
+                retire += b.idle + [b.host]   # a sessão dona vai por último: ela fecha o Chrome
+                b.idle = []
+            self._cond.notify_all()
+        for d in retire:
+            _quit(d)
+
+    def free_slots(self) -> int:
+        with self._cond:
+            return self.size - self._in_use
+
+    def abort(self, driver):
+        """Derruba a sessão em uso (cancelamento do job): os comandos em andamento falham na hora
+        e o `release` descarta o driver."""
+        _quit(driver)
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        with span("driver"):
+            driver = self.acquire(timeout=timeout)
+        if driver is None:
+            raise RuntimeError("Nenhum navegador disponível no pool.")
+        budget = current_budget()
+        on_cancel = budget.on_cancel(lambda: self.abort(driver)) if budget else None
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            if on_cancel:
+                budget.remove(on_cancel)
+            self.release(driver, broken=broken)
+
+    def close(self):
+        with self._cond:
+            pool, self._pool = self._pool, []
+            self._owner.clear()
+        for b in pool:
+            for d in b.idle + [b.host]:
+                _quit(d)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ContextPool() if DRIVER_MODE == "contexts" else DriverPool()
+        return _POOL
@@ -0,0 +1,272 @@
+import os, time, queue, sqlite3, threading
+from datetime import date, timedelta
+
+# Banco SQLite do histórico de disponibilidade ("" desliga)
+HISTORY_DB = os.getenv("HISTORY_DB", "data/history.sqlite3")
+# Observações mais velhas que isso (dias) são apagadas
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "90"))
+# Depois de N horas, observações que não mudaram o status são compactadas (só as mudanças ficam)
+HISTORY_COMPACT_AFTER_HOURS = int(os.getenv("HISTORY_COMPACT_AFTER_HOURS", "24"))
+# Intervalo (s) entre rodadas de retenção/compactação
+HISTORY_MAINTENANCE_INTERVAL = int(os.getenv("HISTORY_MAINTENANCE_INTERVAL", "3600"))
+
+DISPONIVEL = "disponível"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (         -- cada linha coletada (observação)
+  data TEXT NOT NULL,                      -- YYYY-MM-DD
+  dow INTEGER NOT NULL,                    -- 0 = segunda
+  hora TEXT NOT NULL,
+  quadra TEXT NOT NULL,
+  status TEXT NOT NULL,
+  prev_status TEXT,                        -- status anterior, quando mudou
+  changed INTEGER NOT NULL,
+  scraped_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_slots_dhq ON slots(data, hora, quadra);
+CREATE INDEX IF NOT EXISTS ix_slots_scraped ON slots(scraped_at);
+CREATE INDEX IF NOT EXISTS ix_slots_changed ON slots(changed, scraped_at);
+
+CREATE TABLE IF NOT EXISTS latest (        -- estado mais recente de cada slot
+  data TEXT NOT NULL,
+  dow INTEGER NOT NULL,
+  hora TEXT NOT NULL,
+  quadra TEXT NOT NULL,
+  status TEXT NOT NULL,
+  scraped_at REAL NOT NULL,
+  changed_at REAL NOT NULL,
+  PRIMARY KEY (data, hora, quadra)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_latest_livre ON latest(status, data, hora);
+
+CREATE TABLE IF NOT EXISTS feed (          -- slots que abriram/fecharam, em ordem (seq = cursor)
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  data TEXT NOT NULL,
+  hora TEXT NOT NULL,
+  quadra TEXT NOT NULL,
+  prev_status TEXT NOT NULL,
+  status TEXT NOT NULL,
+  scraped_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_feed_scraped ON feed(scraped_at);
+
+CREATE TABLE IF NOT EXISTS feed_cursors (  -- até onde cada consumidor interno (webhook) já leu
+  name TEXT PRIMARY KEY,
+  seq INTEGER NOT NULL
+);
+"""
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class HistoryStore:
+    """Histórico das linhas coletadas em SQLite (WAL). Escritas vão para uma fila e uma thread
+    grava em lote, uma transação por rodada; as consultas usam conexões de leitura por thread."""
+
+    def __init__(self, path: str = HISTORY_DB, retention_days: int = HISTORY_RETENTION_DAYS,
+                 compact_after_hours: int = HISTORY_COMPACT_AFTER_HOURS,
+                 maintenance_interval: int = HISTORY_MAINTENANCE_INTERVAL):
+        self.path = path
+        self.retention_days, self.compact_after_hours = retention_days, compact_after_hours
+        self.maintenance_interval = maintenance_interval
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")   # só vale em banco novo, antes do WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.close()
+        self._pending = queue.Queue()
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ---- escrita ----
+    def add(self, quadra: str, day: date, rows: list, scraped_at: float = None):
+        """Enfileira as linhas de um (quadra, dia) recém-coletado."""
+        if rows:
+            self._pending.put((quadra, day, rows, scraped_at or time.time()))
+
+    def flush(self, timeout: float = 10):
+        """Espera a fila de escrita esvaziar (usado em testes/benchmarks e no shutdown)."""
+        done = threading.Event()
+        self._pending.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        last_maint = time.time()
+        while True:
+            try:
+                items = [self._pending.get(timeout=60)]
+            except queue.Empty:
+                items = []
+            while True:
+                try:
+                    items.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            batches = [it for it in items if not isinstance(it, threading.Event)]
+            if batches:
+                try:
+                    self._write(conn, batches)
+                except sqlite3.Error:
+                    conn.rollback()
+            if time.time() - last_maint >= self.maintenance_interval:
+                last_maint = time.time()
+                try:
+                    self.maintain(conn)
+                except sqlite3.Error:
+                    conn.rollback()
+            for it in items:
+                if isinstance(it, threading.Event):
+                    it.set()
+
+    def _write(self, conn, batches: list):
+        with conn:
+            for quadra, day, rows, ts in batches:
+                iso, dow = day.isoformat(), day.weekday()
+                prev = dict(conn.execute("SELECT hora, status FROM latest WHERE data = ? AND quadra = ?",
+                                         (iso, quadra)).fetchall())
+                seen = {}
+                for r in rows:
+                    hora = str(r.get("hora") or "").strip()
+                    if hora:
+                        seen[hora] = str(r.get("status") or "").strip()
+                # horário que sumiu da tabela (ex.: dia virou 'Integral' indisponível) não está livre
+                for hora in prev.keys() - seen.keys():
+                    seen[hora] = "indisponível"
+                obs, latest, flips = [], [], []
+                for hora, status in seen.items():
+                    old = prev.get(hora)
+                    changed = old is not None and old != status
+                    obs.append((iso, dow, hora, quadra, status, old if changed else None, int(changed), ts))
+                    latest.append((iso, dow, hora, quadra, status, ts, ts))
+                    # o feed só leva o que muda para quem quer reservar: livre <-> não livre
+                    if changed and (old == DISPONIVEL) != (status == DISPONIVEL):
+                        flips.append((iso, hora, quadra, old, status, ts))
+                conn.executemany("INSERT INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", obs)
+                conn.executemany("INSERT INTO feed (data, hora, quadra, prev_status, status, scraped_at)"
+                                 " VALUES (?, ?, ?, ?, ?, ?)", sorted(flips))
+                # changed_at só anda quando o status muda
+                conn.executemany("""
+                    INSERT INTO latest VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(data, hora, quadra) DO UPDATE SET
+                      changed_at = CASE WHEN latest.status = excluded.status THEN latest.changed_at
+                                        ELSE excluded.changed_at END,
+                      status = excluded.status, scraped_at = excluded.scraped_at""", latest)
+
+    def maintain(self, conn=None):
+        """Retenção + compactação: apaga o que passou da retenção e, nas observações antigas,
+        mantém só as que mudaram de status (a mais recente de cada slot continua em `latest`)."""
+        own = conn is None
+        conn = conn or _connect(self.path)
+        now = time.time()
+        with conn:
+            conn.execute("DELETE FROM slots WHERE scraped_at < ?", (now - self.retention_days * 86400,))
+            conn.execute("DELETE FROM latest WHERE data < ?",
+                         ((date.today() - timedelta(days=self.retention_days)).isoformat(),))
+            conn.execute("DELETE FROM slots WHERE changed = 0 AND scraped_at < ?",
+                         (now - self.compact_after_hours * 3600,))
+            conn.execute("DELETE FROM feed WHERE scraped_at < ?", (now - self.retention_days * 86400,))
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA optimize")
+        if own:
+            conn.close()
+
+    # ---- leitura ----
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def free_slots(self, quadras: list = None, dias: list = None, hora_de: str = None,
+                   hora_ate: str = None, desde: date = None, limit: int = 20) -> list:
+        """Próximos slots livres pelo último estado conhecido, em ordem de data/hora."""
+        sql = ["SELECT data, dow, hora, quadra, scraped_at FROM latest WHERE status = ? AND data >= ?"]
+        args = [DISPONIVEL, (desde or date.today()).isoformat()]
+        if quadras:
+            sql.append("AND lower(quadra) IN (%s)" % ",".join("?" * len(quadras)))
+            args += [q.strip().lower() for q in quadras]
+        if dias:
+            sql.append("AND dow IN (%s)" % ",".join("?" * len(dias)))
+            args += list(dias)
+        # horas em HH:MM comparam bem como texto; 'Integral' e afins ficam fora de qualquer faixa
+        if hora_de or hora_ate:
+            sql.append("AND hora GLOB '[0-2][0-9]:[0-5][0-9]'")
+        if hora_de:
+            sql.append("AND hora >= ?"); args.append(hora_de)
+        if hora_ate:
+            sql.append("AND hora <= ?"); args.append(hora_ate)
+        sql.append("ORDER BY data, hora, quadra LIMIT ?"); args.append(int(limit))
+        return [dict(r) for r in self._reader().execute(" ".join(sql), args)]
+
+    def changes(self, since: float, quadras: list = None, limit: int = 500) -> list:
+        """Slots cujo status mudou desde `since` (epoch), mais recentes primeiro."""
+        sql = ["SELECT data, dow, hora, quadra, prev_status, status, scraped_at FROM slots"
+               " WHERE changed = 1 AND scraped_at >= ?"]
+        args = [since]
+        if quadras:
+            sql.append("AND lower(quadra) IN (%s)" % ",".join("?" * len(quadras)))
+            args += [q.strip().lower() for q in quadras]
+        sql.append("ORDER BY scraped_at DESC LIMIT ?"); args.append(int(limit))
+        return [dict(r) for r in self._reader().execute(" ".join(sql), args)]
+
+    def feed(self, since: int, quadras: list = None, limit: int = 500):
+        """Mudanças livre <-> não livre com seq > `since`, em ordem. Retorna (linhas, seq mais
+        antigo ainda guardado ou None)."""
+        sql = ["SELECT seq, data, hora, quadra, prev_status, status, scraped_at FROM feed WHERE seq > ?"]
+        args = [int(since)]
+        if quadras:
+            sql.append("AND lower(quadra) IN (%s)" % ",".join("?" * len(quadras)))
+            args += [q.strip().lower() for q in quadras]
+        sql.append("ORDER BY seq LIMIT ?"); args.append(int(limit))
+        conn = self._reader()
+        rows = [dict(r) for r in conn.execute(" ".join(sql), args)]
+        return rows, conn.execute("SELECT min(seq) FROM feed").fetchone()[0]
+
+    def feed_head(self) -> int:
+        """seq da mudança mais recente (0 se o feed está vazio)."""
+        row = self._reader().execute("SELECT seq FROM sqlite_sequence WHERE name = 'feed'").fetchone()
+        return row[0] if row else 0
+
+    def get_cursor(self, name: str):
+        row = self._reader().execute("SELECT seq FROM feed_cursors WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, name: str, seq: int):
+        conn = self._reader()
+        with conn:
+            conn.execute("INSERT INTO feed_cursors VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET seq = excluded.seq",
+                         (name, int(seq)))
+
+    def stats(self) -> dict:
+        conn = self._reader()
+        return {"observations": conn.execute("SELECT count(*) FROM slots").fetchone()[0],
+                "slots": conn.execute("SELECT count(*) FROM latest").fetchone()[0],
+                "pending_batches": self._pending.qsize()}
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_store():
+    """HistoryStore do processo, ou None se HISTORY_DB estiver vazio."""
+    global _STORE
+    if not HISTORY_DB:
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = HistoryStore()
+        return _STORE
+
+def record(quadra: str, day: date, rows: list):
+    """Guarda as linhas recém-coletadas de um dia no histórico (não bloqueia a coleta)."""
+    store = get_store()
+    if store is not None:
+        store.add(quadra, day, rows)
@@ -0,0 +1,231 @@
+"""Motor HTTP: depois do login, busca a tabela de períodos direto no portal, sem clicar no calendário.
+
+O endpoint não é fixo no código: o primeiro dia de cada quadra é clicado via Selenium com um
+gancho em XMLHttpRequest/fetch, e a requisição capturada vira o modelo para os demais dias.
+Se não der para aprender o modelo (ou uma resposta não tiver linhas), o Selenium assume.
+"""
+import os, re, time, threading
+from datetime import date
+from urllib.parse import quote
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+from app.scraper import (
+    ensure_reservas_list_ready, click_resource, switch_to_new_window_if_any,
+    try_switch_to_any_frame, click_day_in_calendar, parse_period_table,
+    hora_from_text, status_from_cells, rows_frame, date_range, record_day, Resource,
+)
+from app.metrics import span, DAY_SECONDS, FALLBACKS
+from app.budget import should_stop, stop_reason
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+# Adapter compartilhado: as conexões keep-alive são reaproveitadas entre jobs,
+# mas cada job tem sua própria Session (e portanto seu próprio cookie jar).
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+_ADAPTER_LOCK = threading.Lock()
+
+_HOOK_JS = """
+if (!window.__bbzHook) {
+  window.__bbzHook = true;
+  var X = XMLHttpRequest.prototype, _open = X.open, _send = X.send, _setH = X.setRequestHeader;
+  X.open = function(m, u) {
+    this.__bbz = {method: m, url: new URL(u, location.href).href, headers: {}};
+    return _open.apply(this, arguments);
+  };
+  X.setRequestHeader = function(k, v) {
+    if (this.__bbz) this.__bbz.headers[k] = v;
+    return _setH.apply(this, arguments);
+  };
+  X.send = function(b) {
+    if (this.__bbz) {
+      this.__bbz.body = (typeof b === 'string') ? b : null;
+      window.__bbzReqs.push(this.__bbz);
+    }
+    return _send.apply(this, arguments);
+  };
+  if (window.fetch) {
+    var _fetch = window.fetch;
+    window.fetch = function(u, o) {
+      o = o || {};
+      window.__bbzReqs.push({method: o.method || 'GET', url: new URL(String(u.url || u), location.href).href,
+                             headers: o.headers || {}, body: (typeof o.body === 'string') ? o.body : null});
+      return _fetch.apply(this, arguments);
+    };
+  }
+}
+window.__bbzReqs = [];
+"""
+
+# formatos em que a data pode aparecer na URL/corpo da requisição do portal
+_DATE_FORMATS = ["%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%Y%m%d"]
+
+def new_session(cookies: list, user_agent: str = None) -> requests.Session:
+    sess = requests.Session()
+    with _ADAPTER_LOCK:
+        sess.mount("https://", _ADAPTER)
+        sess.mount("http://", _ADAPTER)
+    for c in cookies:
+        sess.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+    if user_agent:
+        sess.headers["User-Agent"] = user_agent
+    return sess
+
+def _date_variants(d: date):
+    for fmt in _DATE_FORMATS:
+        raw = d.strftime(fmt)
+        yield fmt, raw, False
+        enc = quote(raw, safe="")
+        if enc != raw:
+            yield fmt, enc, True
+
+class PeriodRequest:
+    """Requisição da tabela de períodos capturada no navegador, com a data como parâmetro."""
+
+    def __init__(self, method: str, url: str, body: str, headers: dict, fmt: str, encoded: bool):
+        self.method, self.url, self.body, self.headers = method.upper(), url, body, headers
+        self.fmt, self.encoded = fmt, encoded
+
+    @classmethod
+    def learn(cls, captured: list, day: date):
+        """Escolhe, entre as requisições capturadas, a última que carrega a data clicada."""
+        for req in reversed(captured or []):
+            url, body = req.get("url") or "", req.get("body") or ""
+            for fmt, token, encoded in _date_variants(day):
+                if token in url or token in body:
+                    return cls(req.get("method") or "GET",
+                               url.replace(token, "{data}"), body.replace(token, "{data}"),
+                               dict(req.get("headers") or {}), fmt, encoded)
+        return None
+
+    def render(self, d: date):
+        token = d.strftime(self.fmt)
+        if self.encoded:
+            token = quote(token, safe="")
+        return self.url.replace("{data}", token), self.body.replace("{data}", token) or None
+
+    def fetch(self, sess: requests.Session, d: date, referer: str = None) -> bytes:
+        url, body = self.render(d)
+        headers = dict(self.headers)
+        if referer:
+            headers.setdefault("Referer", referer)
+        if body and not any(k.lower() == "content-type" for k in headers):
+            headers["Content-Type"] = "application/x-www-form-urlencoded; charset=UTF-8"
+        resp = sess.request(self.method, url, data=body, headers=headers, timeout=HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return resp.content
+
+def _text(el) -> str:
+    return re.sub(r"\s+", " ", el.text_content() or "").strip()
+
+def parse_periodos_html(content, day: date, quadra_nome: str) -> list:
+    """Lê as linhas de #tabelaDePeriodos (página inteira ou só o fragmento de <tr>)."""
+    if not content:
+        return []
+    if isinstance(content, bytes):
+        has_table = b"<table" in content[:200000].lower()
+    else:
+        has_table = "<table" in content[:200000].lower()
+    if not has_table:
+        if isinstance(content, bytes):
+            content = content.decode("utf-8", errors="replace")
+        content = "<table id='tabelaDePeriodos'><tbody>" + content + "</tbody></table>"
+    doc = lxml_html.fromstring(content)
+    rows = doc.xpath("//*[@id='tabelaDePeriodos']//tbody/tr") or doc.xpath("//tbody/tr")
+    out = []
+    for tr in rows:
+        td_hora = tr.xpath("./td[contains(concat(' ', normalize-space(@class), ' '), ' integral ')]")
+        td_res = tr.xpath("./td[contains(concat(' ', normalize-space(@class), ' '), ' reservar ')]")
+        if not td_hora or not td_res:
+            continue
+        has_btn = any("reservar" in _text(b).lower() for b in td_res[0].xpath(".//button"))
+        res_txt, mid_txt = "", ""
+        if not has_btn:
+            res_txt = _text(td_res[0])
+            if not res_txt:
+                mid = tr.xpath("./td[contains(concat(' ', normalize-space(@class), ' '), ' indisponivel ')"
+                               " or contains(concat(' ', normalize-space(@class), ' '), ' disponivel ')]")
+                mid_txt = _text(mid[0]) if mid else ""
+        out.append({"data": day, "quadra": quadra_nome, "hora": hora_from_text(_text(td_hora[0])),
+                    "status": status_from_cells(has_btn, res_txt, mid_txt)})
+    return out
+
+def extract_range_for_quadra_http(wait, driver, res: Resource, start: date, end: date, log=None,
+                                  cached: dict = None, on_day=None) -> pd.DataFrame:
+    """Como `extract_range_for_quadra`, mas só os dias até aprender a requisição da tabela (em
+    geral, o primeiro) passam pelo navegador."""
+    L = log or (lambda msg: None)
+    cached = cached or {}
+    quadra_nome = res.nome
+    ensure_reservas_list_ready(wait, driver, tries=4)
+    click_resource(driver, res)
+    switch_to_new_window_if_any(driver)
+    try_switch_to_any_frame(driver)
+
+    by_day = dict(cached)
+    pending = [d for d in date_range(start, end) if d not in cached]
+
+    def via_selenium(d: date):
+        t0 = time.perf_counter()
+        if click_day_in_calendar(wait, driver, d):
+            by_day[d] = parse_period_table(wait, driver, d, quadra_nome).to_dict("records")
+        else:
+            by_day[d] = []
+        DAY_SECONDS.observe(time.perf_counter() - t0, engine="selenium")
+        record_day(quadra_nome, d, by_day[d], on_day)
+
+    # dias via Selenium (com o gancho capturando a requisição da tabela) até aprender o modelo;
+    # dali em diante, HTTP. Dia sem clique/XHR (desabilitado, tabela em cache) só adia o aprendizado.
+    modelo, sess, referer = None, None, None
+    aprender = True
+    while pending:
+        if should_stop():
+            L(f"{quadra_nome}: coleta interrompida ({stop_reason()}) em {pending[0]:%d/%m}.")
+            break
+        d = pending[0]
+        if modelo is not None:
+            t0 = time.perf_counter()
+            try:
+                with span("fetch_periodos", quadra=quadra_nome, dia=d.isoformat()):
+                    rows = parse_periodos_html(modelo.fetch(sess, d, referer), d, quadra_nome)
+            except Exception as e:
+                rows = None
+                L(f"{quadra_nome}: HTTP falhou em {d:%d/%m} ({e}); voltando ao Selenium.")
+            else:
+                if not rows:
+                    L(f"{quadra_nome}: resposta sem linhas em {d:%d/%m}; voltando ao Selenium.")
+            if rows:
+                DAY_SECONDS.observe(time.perf_counter() - t0, engine="http")
+                by_day[d] = rows
+                record_day(quadra_nome, d, rows, on_day)
+                pending.pop(0)
+                continue
+            # o modelo deixou de servir: o resto do intervalo segue pelo navegador
+            FALLBACKS.inc(kind="http_selenium")
+            modelo, aprender = None, False
+        try:
+            if aprender:
+                driver.execute_script(_HOOK_JS)
+            via_selenium(d)
+            if aprender:
+                modelo = PeriodRequest.learn(driver.execute_script("return window.__bbzReqs || [];"), d)
+                if modelo is not None:
+                    sess = new_session(driver.get_cookies(), driver.execute_script("return navigator.userAgent;"))
+                    referer = driver.execute_script("return location.href;")
+        except Exception:
+            # cancelamento derruba o navegador no meio do dia: fica o que já foi coletado
+            if not should_stop():
+                raise
+            L(f"{quadra_nome}: coleta interrompida ({stop_reason()}) em {d:%d/%m}.")
+            break
+        pending.pop(0)
+        if modelo is not None:
+            L(f"{quadra_nome}: motor HTTP usando {modelo.method} {modelo.url.split('?')[0]}")
+            aprender = False
+        elif aprender and not pending:
+            L(f"{quadra_nome}: requisição de períodos não identificada; coleta feita via Selenium.")
+            FALLBACKS.inc(kind="http_sem_modelo")
+
+    return rows_frame([r for d in sorted(by_day) for r in by_day[d]])
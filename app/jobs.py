@@ -0,0 +1,111 @@
+import os, time, threading
+from datetime import date
+import pandas as pd
+from app import metrics, results
+from app.budget import start_budget, JOB_DEADLINE_SECONDS
+from app.breaker import CircuitOpen
+from app.jobstore import MemoryJobStore
+from app.scraper import scrape_rows, render_result, SCRAPE_ENGINE
+from app.transform import tidy_rows
+
+# Execução de um job de coleta, comum ao processo web (JOB_RUNNER=local) e ao worker.
+# O registro do job só guarda dados em JSON (linhas como registros com data ISO), para caber
+# em qualquer job store; tabela HTML e linhas tratadas são montadas sob demanda por quem lê.
+
+# Intervalo (s) com que um job rodando confere no store se pediram o cancelamento (sqlite/redis)
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "1"))
+
+RUNNING = {}   # job_id -> Budget dos jobs rodando neste processo
+_RUNNING_LOCK = threading.Lock()
+
+def cancel_running(job_id: str) -> bool:
+    """Cancela o job se ele está rodando neste processo (o navegador dele cai na hora)."""
+    with _RUNNING_LOCK:
+        budget = RUNNING.get(job_id)
+    if budget is None:
+        return False
+    budget.cancel()
+    return True
+
+def _watch_cancel(store, job_id: str, budget, done: threading.Event):
+    # outro processo (web) só consegue marcar o pedido no store; quem roda o job confere aqui
+    while not done.wait(CANCEL_POLL_SECONDS):
+        try:
+            if (store.get(job_id) or {}).get("cancel_requested"):
+                budget.cancel()
+                return
+        except Exception:
+            pass
+
+def rows_to_records(df: pd.DataFrame) -> list:
+    """Formato longo data/quadra/hora/status em registros JSON (data em YYYY-MM-DD)."""
+    out = df[["data", "quadra", "hora", "status"]].copy()
+    out["data"] = pd.to_datetime(out["data"]).dt.strftime("%Y-%m-%d")
+    out["hora"] = out["hora"].fillna("").astype(str)
+    out["status"] = out["status"].fillna("").astype(str)
+    return out.to_dict("records")
+
+def records_to_rows(records: list) -> pd.DataFrame:
+    return pd.DataFrame(records, columns=["data", "quadra", "hora", "status"])
+
+def execute_job(store, job_id: str, username: str, password: str, start: date, end: date,
+                engine: str = None, resources: str = None, fresh_since: float = None) -> str:
+    """Roda a coleta de um job e grava o resultado no store. Devolve o status final.
+    O job tem prazo de JOB_DEADLINE_SECONDS e pode ser cancelado (ver `cancel_running`); nos dois
+    casos o que já foi coletado vira um resultado parcial. `resources` é a seleção de recursos
+    (ver `select_resources`; None = DEFAULT_RESOURCES)."""
+    job = store.get(job_id) or {}
+    if job.get("finished_at") or job.get("cancel_requested"):
+        if not job.get("finished_at"):
+            store.finish(job_id, status="error", html=None, error="Job cancelado antes de começar.",
+                         cancelled=True)
+        return (store.get(job_id) or {}).get("status", "error")
+    spans = metrics.start_trace()
+    budget = start_budget(JOB_DEADLINE_SECONDS)
+    t0, status = time.time(), "error"
+    done = threading.Event()
+    with _RUNNING_LOCK:
+        RUNNING[job_id] = budget
+    if not isinstance(store, MemoryJobStore):
+        threading.Thread(target=_watch_cancel, args=(store, job_id, budget, done),
+                         name=f"cancel-{job_id[:8]}", daemon=True).start()
+    store.update(job_id, started_at=t0, deadline_at=budget.deadline)
+    try:
+        result = scrape_rows(username, password, start_date=start, end_date=end,
+                             engine=engine or SCRAPE_ENGINE, fresh_since=fresh_since,
+                             on_event=lambda ev: store.append_event(job_id, ev), resources=resources)
+        status = "ok"
+        if result["diag"] is not None:
+            store.finish(job_id, status="ok", html=result["diag"], error=None, trace=spans)
+        else:
+            records = rows_to_records(result["rows"])
+            store.finish(job_id, status="ok", html=None, error=None, trace=spans, log=result["log"],
+                         rows=records, etag=results.content_etag(records_to_rows(records)),
+                         partial=result.get("partial"), missing=result.get("missing"),
+                         courts=result.get("courts"))
+    except CircuitOpen as e:
+        store.finish(job_id, status="error", html=None, error=str(e), trace=spans,
+                     circuit=e.stage, retry_after=e.retry_after)
+    except Exception as e:
+        store.finish(job_id, status="error", html=None, error=str(e), trace=spans,
+                     cancelled=budget.reason == "cancelado")
+    finally:
+        done.set()
+        with _RUNNING_LOCK:
+            RUNNING.pop(job_id, None)
+        metrics.JOB_SECONDS.observe(time.time() - t0, status=status)
+    return status
+
+def job_tidy_rows(job: dict):
+    """Linhas tratadas (data/dia_semana/quadra/hora/status) de um job ok, ou None se não houver."""
+    if job.get("rows") is None:
+        return None
+    return tidy_rows(records_to_rows(job["rows"]))
+
+def job_html(job: dict) -> str:
+    """HTML do job: o diagnóstico, se houver, ou a tabela larga + log montada das linhas."""
+    if job.get("html") is not None or job.get("rows") is None:
+        return job.get("html")
+    return render_result({"rows": records_to_rows(job["rows"]), "log": job.get("log"), "diag": None,
+                          "partial": job.get("partial"), "missing": job.get("missing"),
+                          "courts": job.get("courts")})
@@ -0,0 +1,427 @@
+"""Armazenamento dos jobs (registro, eventos de progresso e fila de execução).
+
+- memory: dict do processo (padrão; um único processo web roda tudo).
+- sqlite: arquivo compartilhado entre processos da mesma máquina/volume.
+- redis: qualquer servidor que fale o protocolo do Redis (RESP2); cliente próprio, sem dependência.
+
+Com sqlite/redis e JOB_RUNNER=worker, o web só enfileira e `python -m app.worker` executa.
+"""
+import os, json, time, socket, sqlite3, threading
+from collections import deque
+from urllib.parse import urlsplit
+
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "data/jobs.sqlite3")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "bbz:")
+
+# Jobs finalizados somem após JOBS_TTL segundos ou quando passar de JOBS_MAX (no redis vale só o TTL)
+JOBS_TTL = int(os.getenv("JOBS_TTL", "3600"))
+JOBS_MAX = int(os.getenv("JOBS_MAX", "200"))
+# Validade de um job ainda não finalizado (segurança contra jobs órfãos)
+_PENDING_TTL = 86400
+
+def _done_event(job: dict) -> dict:
+    return {"type": "done", "status": job.get("status")}
+
+def _position(started_at, finished_at):
+    """Fora da fila: 0 se já está rodando, None se terminou ou não existe."""
+    return 0 if started_at and not finished_at else None
+
+class MemoryJobStore:
+    """Jobs num dict do processo."""
+
+    def __init__(self, ttl: int = JOBS_TTL, max_jobs: int = JOBS_MAX):
+        self.ttl, self.max_jobs = ttl, max_jobs
+        self.jobs = {}
+        self._queue = deque()   # (job_id, payload)
+        self._cond = threading.Condition()
+
+    def create(self, job_id: str, job: dict):
+        self.jobs[job_id] = {**job, "events": [], "created": time.time()}
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+    def delete(self, job_id: str):
+        self.jobs.pop(job_id, None)
+
+    def append_event(self, job_id: str, ev: dict):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job["events"].append(ev)
+
+    def events(self, job_id: str, start: int = 0):
+        """Eventos a partir do índice `start`, ou None se o job não existe (mais)."""
+        job = self.jobs.get(job_id)
+        return None if job is None else job["events"][start:]
+
+    def finish(self, job_id: str, **fields):
+        job = self.jobs.get(job_id) or {"events": [], "created": time.time()}
+        job.update(fields, finished_at=time.time())
+        job["events"].append(_done_event(job))
+        self.jobs[job_id] = job
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        done = [(j.get("finished_at"), jid) for jid, j in list(self.jobs.items()) if j.get("finished_at")]
+        expired = {jid for ts, jid in done if now - ts > self.ttl}
+        excess = len(self.jobs) - len(expired) - self.max_jobs
+        if excess > 0:
+            alive = sorted((ts, jid) for ts, jid in done if jid not in expired)
+            expired.update(jid for _, jid in alive[:excess])
+        for jid in expired:
+            self.jobs.pop(jid, None)
+
+    def enqueue(self, job_id: str, payload: dict):
+        with self._cond:
+            self._queue.append((job_id, payload))
+            self._cond.notify()
+
+    def dequeue(self, timeout: float = 5):
+        with self._cond:
+            if not self._queue and not self._cond.wait(timeout):
+                return None
+            return self._queue.popleft() if self._queue else None
+
+    def queue_len(self) -> int:
+        return len(self._queue)
+
+    def queue_position(self, job_id: str):
+        with self._cond:
+            for n, (jid, _) in enumerate(self._queue, start=1):
+                if jid == job_id:
+                    return n
+        job = self.jobs.get(job_id) or {}
+        return _position(job.get("started_at"), job.get("finished_at"))
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL,
+                                 created REAL NOT NULL, finished_at REAL);
+CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs(finished_at);
+CREATE TABLE IF NOT EXISTS events (job_id TEXT NOT NULL, idx INTEGER NOT NULL, ev TEXT NOT NULL,
+                                   PRIMARY KEY (job_id, idx)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS queue (seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT UNIQUE NOT NULL,
+                                  payload TEXT NOT NULL, enqueued_at REAL NOT NULL);
+"""
+
+class SQLiteJobStore:
+    """Jobs num arquivo SQLite (WAL), compartilhável entre processos; uma conexão por thread."""
+
+    def __init__(self, path: str = JOB_STORE_PATH, ttl: int = JOBS_TTL, max_jobs: int = JOBS_MAX):
+        self.path, self.ttl, self.max_jobs = path, ttl, max_jobs
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._db().executescript(_SQLITE_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; as escritas abrem BEGIN IMMEDIATE explicitamente
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _tx(self):
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def create(self, job_id: str, job: dict):
+        self._db().execute("INSERT OR REPLACE INTO jobs (id, data, created) VALUES (?, ?, ?)",
+                           (job_id, json.dumps(job), time.time()))
+
+    def get(self, job_id: str):
+        row = self._db().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _merge(self, conn, job_id: str, fields: dict):
+        row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        job = {**(json.loads(row[0]) if row else {}), **fields}
+        conn.execute("INSERT OR REPLACE INTO jobs (id, data, created, finished_at) VALUES "
+                     "(?, ?, COALESCE((SELECT created FROM jobs WHERE id = ?), ?), ?)",
+                     (job_id, json.dumps(job), job_id, time.time(), job.get("finished_at")))
+        return job
+
+    def update(self, job_id: str, **fields):
+        conn = self._tx()
+        try:
+            if conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone():
+                self._merge(conn, job_id, fields)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, job_id: str):
+        conn = self._tx()
+        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        conn.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+        conn.execute("COMMIT")
+
+    def _append(self, conn, job_id: str, ev: dict):
+        conn.execute("INSERT INTO events (job_id, idx, ev) "
+                     "SELECT ?, COALESCE(MAX(idx) + 1, 0), ? FROM events WHERE job_id = ?",
+                     (job_id, json.dumps(ev, ensure_ascii=False), job_id))
+
+    def append_event(self, job_id: str, ev: dict):
+        conn = self._tx()
+        try:
+            self._append(conn, job_id, ev)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def events(self, job_id: str, start: int = 0):
+        conn = self._db()
+        if not conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone():
+            return None
+        return [json.loads(r[0]) for r in conn.execute(
+            "SELECT ev FROM events WHERE job_id = ? AND idx >= ? ORDER BY idx", (job_id, start))]
+
+    def finish(self, job_id: str, **fields):
+        conn = self._tx()
+        try:
+            job = self._merge(conn, job_id, {**fields, "finished_at": time.time()})
+            self._append(conn, job_id, _done_event(job))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn):
+        now = time.time()
+        old = [r[0] for r in conn.execute("SELECT id FROM jobs WHERE finished_at < ?", (now - self.ttl,))]
+        total = conn.execute("SELECT count(*) FROM jobs").fetchone()[0] - len(old)
+        if total > self.max_jobs:
+            old += [r[0] for r in conn.execute(
+                "SELECT id FROM jobs WHERE finished_at IS NOT NULL AND finished_at >= ? "
+                "ORDER BY finished_at LIMIT ?", (now - self.ttl, total - self.max_jobs))]
+        for jid in old:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (jid,))
+            conn.execute("DELETE FROM events WHERE job_id = ?", (jid,))
+
+    def enqueue(self, job_id: str, payload: dict):
+        self._db().execute("INSERT INTO queue (job_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                           (job_id, json.dumps(payload), time.time()))
+
+    def dequeue(self, timeout: float = 5):
+        deadline = time.time() + timeout
+        while True:
+            conn = self._tx()
+            row = conn.execute("SELECT seq, job_id, payload FROM queue ORDER BY seq LIMIT 1").fetchone()
+            if row:
+                conn.execute("DELETE FROM queue WHERE seq = ?", (row[0],))
+            conn.execute("COMMIT")
+            if row:
+                return row[1], json.loads(row[2])
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.5)
+
+    def queue_len(self) -> int:
+        return self._db().execute("SELECT count(*) FROM queue").fetchone()[0]
+
+    def queue_position(self, job_id: str):
+        conn = self._db()
+        row = conn.execute("SELECT seq FROM queue WHERE job_id = ?", (job_id,)).fetchone()
+        if row:
+            return conn.execute("SELECT count(*) FROM queue WHERE seq <= ?", (row[0],)).fetchone()[0]
+        job = self.get(job_id) or {}
+        return _position(job.get("started_at"), job.get("finished_at"))
+
+class RespError(Exception):
+    pass
+
+class RespClient:
+    """Cliente mínimo do protocolo do Redis (RESP2): comandos e pipelines; uma conexão por thread."""
+
+    def __init__(self, url: str = REDIS_URL, timeout: float = 30):
+        u = urlsplit(url)
+        self.host, self.port = u.hostname or "localhost", u.port or 6379
+        self.db = int((u.path or "/0").lstrip("/") or 0)
+        self.username, self.password = u.username, u.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            c = (sock, sock.makefile("rb"))
+            setup = []
+            if self.password:
+                setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+            if self.db:
+                setup.append(("SELECT", self.db))
+            try:
+                if setup:
+                    self._send(c, setup)
+            except BaseException:
+                # AUTH/SELECT recusado ou conexão caiu: não guarda uma conexão sem senha ou no banco errado
+                sock.close()
+                raise
+            self._local.conn = c
+        return c
+
+    def _drop(self):
+        c = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if c:
+            try:
+                c[0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out += [b"$%d\r\n" % len(b), b, b"\r\n"]
+        return b"".join(out)
+
+    def _read(self, f):
+        line = f.readline()
+        if not line:
+            raise ConnectionError("Conexão com o Redis fechada.")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return RespError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else f.read(n + 2)[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read(f) for _ in range(n)]
+        raise ConnectionError(f"Resposta RESP inválida: {line!r}")
+
+    def _send(self, c, cmds):
+        c[0].sendall(b"".join(self._encode(cmd) for cmd in cmds))
+        replies = [self._read(c[1]) for _ in cmds]
+        for r in replies:
+            if isinstance(r, RespError):
+                raise r
+        return replies
+
+    def pipeline(self, *cmds) -> list:
+        """Manda vários comandos de uma vez e devolve as respostas na ordem."""
+        try:
+            return self._send(self._conn(), cmds)
+        except (OSError, ConnectionError):
+            self._drop()
+            raise
+
+    def call(self, *args):
+        return self.pipeline(args)[0]
+
+class RedisJobStore:
+    """Jobs num servidor Redis: registro em hash (um campo JSON por chave do job), eventos em lista,
+    fila em lista consumida com BLPOP. Expiração por TTL (JOBS_MAX não se aplica)."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_PREFIX, ttl: int = JOBS_TTL):
+        self.r, self.prefix, self.ttl = RespClient(url), prefix, ttl
+
+    def _k(self, kind: str, job_id: str = None) -> str:
+        return f"{self.prefix}{kind}" + (f":{job_id}" if job_id else "")
+
+    @staticmethod
+    def _fields(job: dict) -> list:
+        out = []
+        for k, v in job.items():
+            out += [k, json.dumps(v, ensure_ascii=False)]
+        return out
+
+    def create(self, job_id: str, job: dict):
+        key = self._k("job", job_id)
+        self.r.pipeline(("DEL", key, self._k("events", job_id)),
+                        ("HSET", key, *self._fields({**job, "created": time.time()})),
+                        ("EXPIRE", key, _PENDING_TTL))
+
+    def get(self, job_id: str):
+        flat = self.r.call("HGETALL", self._k("job", job_id))
+        if not flat:
+            return None
+        return {flat[i].decode("utf-8"): json.loads(flat[i + 1]) for i in range(0, len(flat), 2)}
+
+    def update(self, job_id: str, **fields):
+        key = self._k("job", job_id)
+        if fields and self.r.call("EXISTS", key):
+            self.r.call("HSET", key, *self._fields(fields))
+
+    def delete(self, job_id: str):
+        self.r.call("DEL", self._k("job", job_id), self._k("events", job_id))
+
+    def append_event(self, job_id: str, ev: dict):
+        key = self._k("events", job_id)
+        self.r.pipeline(("RPUSH", key, json.dumps(ev, ensure_ascii=False)), ("EXPIRE", key, _PENDING_TTL))
+
+    def events(self, job_id: str, start: int = 0):
+        exists, evs = self.r.pipeline(("EXISTS", self._k("job", job_id)),
+                                      ("LRANGE", self._k("events", job_id), start, -1))
+        return None if not exists else [json.loads(e) for e in evs]
+
+    def finish(self, job_id: str, **fields):
+        key, ev_key = self._k("job", job_id), self._k("events", job_id)
+        fields = {**fields, "finished_at": time.time()}
+        status = fields.get("status")
+        if status is None:
+            raw = self.r.call("HGET", key, "status")
+            status = json.loads(raw) if raw else None
+        self.r.pipeline(("HSET", key, *self._fields(fields)),
+                        ("RPUSH", ev_key, json.dumps(_done_event({"status": status}))),
+                        ("EXPIRE", key, self.ttl), ("EXPIRE", ev_key, self.ttl))
+
+    def enqueue(self, job_id: str, payload: dict):
+        self.r.pipeline(("SET", self._k("payload", job_id), json.dumps(payload), "EX", _PENDING_TTL),
+                        ("RPUSH", self._k("queue"), job_id))
+
+    def dequeue(self, timeout: float = 5):
+        got = self.r.call("BLPOP", self._k("queue"), max(1, int(timeout)))
+        if not got:
+            return None
+        job_id = got[1].decode("utf-8")
+        raw, _ = self.r.pipeline(("GET", self._k("payload", job_id)), ("DEL", self._k("payload", job_id)))
+        return (job_id, json.loads(raw)) if raw else None
+
+    def queue_len(self) -> int:
+        return self.r.call("LLEN", self._k("queue"))
+
+    def queue_position(self, job_id: str):
+        ids = [i.decode("utf-8") for i in self.r.call("LRANGE", self._k("queue"), 0, -1)]
+        if job_id in ids:
+            return ids.index(job_id) + 1
+        started, finished = self.r.call("HMGET", self._k("job", job_id), "started_at", "finished_at")
+        return _position(started and json.loads(started), finished and json.loads(finished))
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_store():
+    """Job store do processo, conforme JOB_STORE (memory, sqlite ou redis)."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            if JOB_STORE == "sqlite":
+                _STORE = SQLiteJobStore()
+            elif JOB_STORE == "redis":
+                _STORE = RedisJobStore()
+            elif JOB_STORE == "memory":
+                _STORE = MemoryJobStore()
+            else:
+                raise ValueError(f"JOB_STORE desconhecido: {JOB_STORE}")
+        return _STORE
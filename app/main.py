@@ -1,32 +1,160 @@
-from fastapi import FastAPI, Request, Form, BackgroundTasks
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from fastapi import FastAPI, Request, Form
+from fastapi.responses import (HTMLResponse, RedirectResponse, PlainTextResponse, StreamingResponse,
+                               JSONResponse, Response)
 from fastapi.templating import Jinja2Templates
-import uuid
-from app.scraper import run_scraping
+from starlette.middleware.gzip import GZipMiddleware
+import os, json, time, uuid, asyncio, threading
+from collections import OrderedDict
+from app import history, prefetch, jobstore, session_cache, changes, warmup
+from app.scheduler import SCHEDULER, QueueFull
+from app.breaker import BREAKER, CircuitOpen
+from app import metrics
+
+# pandas/selenium (scraper, jobs, results, transform, driver_pool) só são importados dentro das
+# rotas que precisam deles: o import deste módulo fica leve e o uvicorn serve "/" e /health logo
+# que sobe; STARTUP_WARMUP=1 adianta esses imports (e o primeiro Chrome) em segundo plano
+
+class _GZipExceptStream(GZipMiddleware):
+    """GZip nas respostas comuns; o SSE passa direto (o GZip do Starlette não faz flush por evento)."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 app = FastAPI()
+app.add_middleware(_GZipExceptStream, minimum_size=1024)
 templates = Jinja2Templates(directory="app/templates")
 
-JOBS = {}
+# local: os jobs rodam neste processo; worker: o web só enfileira no job store e `python -m app.worker` coleta
+JOB_RUNNER = os.getenv("JOB_RUNNER", "local")
+STORE = jobstore.get_store()
+if JOB_RUNNER == "worker":
+    if jobstore.JOB_STORE == "memory":
+        raise RuntimeError("JOB_RUNNER=worker precisa de JOB_STORE=sqlite ou redis (compartilhado com o worker).")
+    if not os.getenv("SESSION_CACHE_KEY"):
+        raise RuntimeError("JOB_RUNNER=worker precisa de SESSION_CACHE_KEY igual à do worker (cifra as credenciais na fila).")
+elif JOB_RUNNER != "local":
+    raise RuntimeError(f"JOB_RUNNER desconhecido: {JOB_RUNNER}")
+
+# HTML e linhas tratadas dos últimos jobs lidos, montados a partir das linhas guardadas no store
+_VIEWS = OrderedDict()   # (job_id, etag) -> {"html": ..., "rows": ...}
+_VIEWS_MAX = 32
+_VIEWS_LOCK = threading.Lock()
+
+def _job_view(job_id: str, job: dict, kind: str):
+    """HTML (`kind="html"`) ou linhas tratadas (`kind="rows"`) do job, montados na primeira leitura."""
+    if not job.get("etag"):
+        return job.get("html") if kind == "html" else None
+    key = (job_id, job["etag"])
+    with _VIEWS_LOCK:
+        view = _VIEWS.get(key)
+        if view is None:
+            view = _VIEWS[key] = {}
+            while len(_VIEWS) > _VIEWS_MAX:
+                _VIEWS.popitem(last=False)
+        else:
+            _VIEWS.move_to_end(key)
+    if kind not in view:
+        from app.jobs import job_html, job_tidy_rows
+        view[kind] = job_html(job) if kind == "html" else job_tidy_rows(job)
+    return view[kind]
+
+def _prewarm_pool():
+    from app.driver_pool import get_pool
+    get_pool().prewarm()
+
+@app.on_event("startup")
+def _prewarm_drivers():
+    # opcional: sobe os Chromes do pool antes do primeiro job (no modo worker, quem coleta é o worker)
+    if JOB_RUNNER == "local" and os.getenv("DRIVER_POOL_PREWARM", "0") == "1":
+        threading.Thread(target=_prewarm_pool, daemon=True).start()
+
+@app.on_event("startup")
+def _start_warmup():
+    # opcional (STARTUP_WARMUP=1): imports pesados, chromedriver e um Chrome antes do primeiro job
+    warmup.start_warmup(launch=JOB_RUNNER == "local")
+
+@app.on_event("startup")
+def _start_prefetch():
+    # opcional: mantém os próximos dias quentes com a conta de serviço (PREFETCH_ENABLED=1)
+    if JOB_RUNNER == "local":
+        prefetch.start_prefetcher()
+
+@app.on_event("startup")
+def _start_webhook():
+    # opcional: repassa o feed de mudanças por POST (CHANGES_WEBHOOK_URL)
+    changes.start_webhook()
 
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-def _do_job(job_id: str, username: str, password: str):
+# Jobs com navegador em andamento, para agregar pedidos cujo período já está coberto
+INFLIGHT = {}   # job_id -> {"start", "end", "resources", "started", "followers": [args de _do_job]}
+INFLIGHT_LOCK = threading.Lock()
+
+def _attach_or_lead(job_id: str, start, end, resources, args: tuple):
+    """Se algum job em andamento cobre [start, end] com a mesma seleção de recursos, pendura este
+    como seguidor e devolve o id do líder; senão registra este job como líder e devolve None."""
+    with INFLIGHT_LOCK:
+        for leader_id, f in INFLIGHT.items():
+            if f["start"] <= start and end <= f["end"] and f["resources"] == resources:
+                f["followers"].append(args)
+                return leader_id
+        INFLIGHT[job_id] = {"start": start, "end": end, "resources": resources,
+                            "started": time.time(), "followers": []}
+        return None
+
+def _cached_names(resources):
+    """Nomes dos recursos pedidos, se o catálogo já visto resolve a seleção inteira; senão None."""
+    from app.scraper import known_resources, select_resources
+    chosen, unknown = select_resources(known_resources(), resources)
+    return [r.nome for r in chosen] if chosen and not unknown else None
+
+def _do_job(job_id: str, username: str, password: str, start, end, engine, resources: str = None,
+            fresh_since: float = None):
+    from app.jobs import execute_job
     try:
-        html = run_scraping(username, password)
-        JOBS[job_id] = {"status": "ok", "html": html, "error": None}
-    except Exception as e:
-        JOBS[job_id] = {"status": "error", "html": None, "error": str(e)}
+        execute_job(STORE, job_id, username, password, start, end, engine, resources, fresh_since)
+    finally:
+        _release_leader(job_id)
+
+def _release_leader(job_id: str):
+    """Tira o job do INFLIGHT e entrega os seguidores dele ao scheduler."""
+    with INFLIGHT_LOCK:
+        f = INFLIGHT.pop(job_id, None)
+    if f:
+        # seguidores reaproveitam as linhas por dia que o líder deixou no cache de slots;
+        # não passam pelo limite da fila (em geral nem abrem navegador)
+        for args in f["followers"]:
+            SCHEDULER.submit(args[0], _do_job, *args, f["started"], force=True)
+
+def _enqueue_worker(job_id: str, username: str, password: str, start, end, engine, resources: str = None):
+    """Modo worker: põe o job na fila do store; as credenciais vão cifradas (SESSION_CACHE_KEY)."""
+    queued = STORE.queue_len()
+    if queued >= SCHEDULER.max_queue:
+        raise QueueFull(SCHEDULER.eta(queued + 1))
+    cred = session_cache.encrypt({"username": username, "password": password}).decode("ascii")
+    STORE.enqueue(job_id, {"cred": cred, "start": start.isoformat(), "end": end.isoformat(), "engine": engine,
+                           "resources": resources})
+
+def _queue_position(job_id: str):
+    """1..N na fila, 0 rodando, None fora da fila (scheduler local ou fila do job store)."""
+    if JOB_RUNNER == "worker":
+        return STORE.queue_position(job_id)
+    return SCHEDULER.position(job_id)
 
 @app.post("/run", response_class=HTMLResponse)
-def run(request: Request, background_tasks: BackgroundTasks,
+def run(request: Request,
         username: str = Form(...), password: str = Form(...),
-        start_date: str = Form(None), end_date: str = Form(None)):
+        start_date: str = Form(None), end_date: str = Form(None),
+        engine: str = Form(None), recursos: str = Form(None)):
     import datetime as dt
+    from app.scraper import collect_from_cache, ENGINES
     job_id = uuid.uuid4().hex
-    JOBS[job_id] = {"status": "pending", "html": None, "error": None}
+    STORE.create(job_id, {"status": "pending", "html": None, "error": None, "leader": None})
 
     # Parse e validação leve
     start, end = None, None
@@ -44,35 +172,311 @@ def run(request: Request, background_tasks: BackgroundTasks,
         if (ref_end - ref_start).days > max_span:
             raise ValueError(f"Período muito longo. Máximo permitido: {max_span} dias.")
     except Exception as e:
-        JOBS[job_id] = {"status": "error", "html": None, "error": f"Datas inválidas: {e}"}
+        STORE.finish(job_id, status="error", html=None, error=f"Datas inválidas: {e}")
+        return RedirectResponse(url=f"/result/{job_id}", status_code=303)
+    if engine and engine not in ENGINES:
+        STORE.finish(job_id, status="error", html=None,
+                     error=f"Modo de coleta desconhecido: {engine} (use {' ou '.join(ENGINES)}).")
         return RedirectResponse(url=f"/result/{job_id}", status_code=303)
 
-    def _do_job(job_id: str, username: str, password: str, start, end):
-        from app.scraper import run_scraping
-        try:
-            html = run_scraping(username, password, start_date=start, end_date=end)
-            JOBS[job_id] = {"status": "ok", "html": html, "error": None}
-        except Exception as e:
-            JOBS[job_id] = {"status": "error", "html": None, "error": str(e)}
-
-    background_tasks.add_task(_do_job, job_id, username, password, start, end)
+    # seleção normalizada: "Quadra 1, churrasqueira 1" e "quadra 1,Churrasqueira 1" agregam juntos
+    recursos = ",".join(t.strip().lower() for t in (recursos or "").split(",") if t.strip()) or None
+    args = (job_id, username, password, ref_start, ref_end, engine, recursos)
+    try:
+        # o atalho pelo cache não passa pelo portal: só vale para credenciais já confirmadas nele
+        nomes = (_cached_names(recursos) if JOB_RUNNER != "worker"
+                 and session_cache.verified(username, password) else None)
+        if JOB_RUNNER == "worker":
+            # sem agregação entre processos: cada pedido vira um job na fila compartilhada
+            _enqueue_worker(*args)
+        elif nomes and collect_from_cache(nomes, ref_start, ref_end) is not None:
+            # período todo no cache (ex.: mantido pelo prefetch): resolve aqui, sem fila nem navegador
+            _do_job(*args)
+        else:
+            leader_id = _attach_or_lead(job_id, ref_start, ref_end, recursos, args)
+            if leader_id is not None:
+                # job cujo resultado este vai reaproveitar
+                STORE.update(job_id, leader=leader_id)
+            else:
+                try:
+                    BREAKER.check()
+                    SCHEDULER.submit(job_id, _do_job, *args)
+                except (QueueFull, CircuitOpen):
+                    with INFLIGHT_LOCK:
+                        INFLIGHT.pop(job_id, None)
+                    raise
+    except QueueFull as e:
+        STORE.delete(job_id)
+        return HTMLResponse(f"<h3>Servidor ocupado</h3><p>{e}</p>", status_code=503,
+                            headers={"Retry-After": str(e.retry_after)})
+    except CircuitOpen as e:
+        STORE.finish(job_id, status="error", html=None, error=str(e), circuit=e.stage, retry_after=e.retry_after)
+        return HTMLResponse(f"<h3>Portal indisponível</h3><p>{e}</p>", status_code=503,
+                            headers={"Retry-After": str(e.retry_after), "X-Job-Id": job_id})
     return RedirectResponse(url=f"/result/{job_id}", status_code=303)
 
 @app.get("/result/{job_id}", response_class=HTMLResponse)
 def result(request: Request, job_id: str):
-    job = JOBS.get(job_id)
+    job = STORE.get(job_id)
     if not job:
         return PlainTextResponse("Job não encontrado.", status_code=404)
+    if job["status"] == "ok":
+        job = {**job, "html": _job_view(job_id, job, "html")}
     return templates.TemplateResponse("result.html", {"request": request, "job_id": job_id, "job": job})
 
 @app.get("/api/job/{job_id}", response_class=HTMLResponse)
-def api_job(job_id: str):
-    job = JOBS.get(job_id)
+def api_job(request: Request, job_id: str):
+    job = STORE.get(job_id)
     if not job:
         return PlainTextResponse("Job não encontrado.", status_code=404)
     if job["status"] == "ok":
-        return HTMLResponse(job["html"])
+        from app import results
+        if not job.get("etag"):
+            return HTMLResponse(job.get("html"))
+        etag = results.request_etag(job["etag"], "html")
+        if results.etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return HTMLResponse(_job_view(job_id, job, "html"), headers={"ETag": etag})
+    elif job["status"] == "error" and job.get("circuit"):
+        # falhou na hora pelo circuit breaker: não é erro do app, o portal é que está falhando
+        return HTMLResponse(f"<h3>Portal indisponível</h3><p>{job['error']}</p>", status_code=503,
+                            headers={"Retry-After": str(job.get("retry_after") or 60)})
     elif job["status"] == "error":
         return HTMLResponse(f"<h3>Erro:</h3><pre>{job['error']}</pre>", status_code=500)
     else:
-        return HTMLResponse("<em>Processando…</em>")
+        pos = _queue_position(job_id)
+        headers, info = {}, ""
+        if pos:
+            eta = SCHEDULER.eta(pos)
+            headers = {"X-Queue-Position": str(pos), "X-Queue-ETA": str(eta)}
+            info = f" Posição na fila: {pos} · previsão ~{eta} s."
+        elif pos == 0:
+            headers = {"X-Queue-Position": "0"}
+        elif job.get("leader"):
+            info = " Aguardando uma coleta igual que já está em andamento."
+        return HTMLResponse(f"<em>Processando…</em>{info}", headers=headers)
+
+def _drop_follower(job_id: str) -> bool:
+    """Tira o job da lista de seguidores do líder (ainda não foi submetido). False se não estava."""
+    with INFLIGHT_LOCK:
+        for f in INFLIGHT.values():
+            for args in f["followers"]:
+                if args[0] == job_id:
+                    f["followers"].remove(args)
+                    return True
+    return False
+
+@app.delete("/api/job/{job_id}")
+def api_job_cancel(job_id: str):
+    """Cancela o job: na fila ele sai sem rodar; rodando, o navegador é derrubado na hora e o que
+    já foi coletado vira um resultado parcial (dias que faltaram marcados como "não coletado")."""
+    job = STORE.get(job_id)
+    if not job:
+        return JSONResponse({"error": "Job não encontrado."}, status_code=404)
+    if job.get("finished_at"):
+        return JSONResponse({"status": job["status"], "error": "Job já terminou."}, status_code=409)
+    if JOB_RUNNER == "worker":
+        # o item continua na fila do store; o worker descarta job já finalizado
+        not_started = bool(STORE.queue_position(job_id))
+    elif SCHEDULER.cancel(job_id):
+        # líder que nem começou: os seguidores dele não podem ficar esperando por ele
+        _release_leader(job_id)
+        not_started = True
+    else:
+        not_started = _drop_follower(job_id)
+    if not_started:
+        STORE.finish(job_id, status="error", html=None, error="Job cancelado antes de começar.", cancelled=True)
+        return {"status": "cancelled"}
+    from app.jobs import cancel_running
+    STORE.update(job_id, cancel_requested=True)
+    cancel_running(job_id)
+    return JSONResponse({"status": "cancelling"}, status_code=202)
+
+@app.get("/api/job/{job_id}/rows")
+def api_job_rows(request: Request, job_id: str, format: str = "json", quadra: str = None,
+                 dia_semana: str = None, hora_de: str = None, hora_ate: str = None):
+    """Linhas data/dia_semana/quadra/hora/status do job em JSON, CSV ou Parquet.
+    Filtros: quadra e dia_semana separados por vírgula, hora_de/hora_ate em HH:MM."""
+    from app import results
+    job = STORE.get(job_id)
+    if not job:
+        return JSONResponse({"error": "Job não encontrado."}, status_code=404)
+    if job["status"] == "pending":
+        return JSONResponse({"status": "pending"}, status_code=202)
+    if job["status"] == "error" and job.get("circuit"):
+        return JSONResponse({"status": "circuit_open", "stage": job["circuit"], "error": job["error"]},
+                            status_code=503, headers={"Retry-After": str(job.get("retry_after") or 60)})
+    if job["status"] == "error":
+        return JSONResponse({"status": "error", "error": job["error"]}, status_code=500)
+    if job.get("rows") is None:
+        return JSONResponse({"status": "sem_dados", "error": "A coleta não produziu linhas; veja o HTML do job."},
+                            status_code=404)
+    if format not in results.FORMATS:
+        return JSONResponse({"error": f"Formato desconhecido: {format}"}, status_code=400)
+    try:
+        quadras = [q for q in (quadra or "").split(",") if q.strip()]
+        dias = results.parse_weekdays(dia_semana)
+        df = results.filter_rows(_job_view(job_id, job, "rows"), quadras, dias, hora_de, hora_ate)
+    except ValueError as e:
+        return JSONResponse({"error": f"Filtro inválido: {e}"}, status_code=400)
+
+    etag = results.request_etag(job["etag"], format, sorted(q.lower() for q in quadras), sorted(dias),
+                                hora_de or "", hora_ate or "")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if job.get("partial"):
+        # job cancelado/sem prazo: as linhas são só as dos dias coletados (lista em /api/job/{id}/trace)
+        headers["X-Partial-Result"] = job["partial"]
+    if results.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        body = results.serialize(df, format)
+    except ImportError:
+        return JSONResponse({"error": "Parquet indisponível: instale o pacote pyarrow."}, status_code=501)
+    if format != "json":
+        headers["Content-Disposition"] = f'attachment; filename="bbz-{job_id[:8]}.{format}"'
+    return Response(body, media_type=results.FORMATS[format], headers=headers)
+
+def _history_or_503():
+    store = history.get_store()
+    if store is None:
+        return None, JSONResponse({"error": "Histórico desligado (HISTORY_DB vazio)."}, status_code=503)
+    return store, None
+
+@app.get("/api/slots/free")
+def api_slots_free(quadra: str = None, dia_semana: str = None, hora_de: str = None,
+                   hora_ate: str = None, de: str = None, limit: int = 20):
+    """Próximos horários livres pelo histórico (sem abrir navegador).
+    Ex.: ?quadra=Quadra 2&dia_semana=0,1,2,3,4&hora_de=18:00&limit=1"""
+    import datetime as dt
+    from app import results
+    from app.transform import DIAS_SEMANA
+    store, err = _history_or_503()
+    if err:
+        return err
+    try:
+        desde = dt.date.fromisoformat(de) if de else None
+        dias = results.parse_weekdays(dia_semana)
+    except ValueError as e:
+        return JSONResponse({"error": f"Filtro inválido: {e}"}, status_code=400)
+    t0 = time.perf_counter()
+    slots = store.free_slots([q for q in (quadra or "").split(",") if q.strip()], dias,
+                             hora_de, hora_ate, desde=desde, limit=max(1, min(limit, 1000)))
+    for s in slots:
+        s["dia_semana"] = DIAS_SEMANA[s.pop("dow")]
+    return {"count": len(slots), "ms": round((time.perf_counter() - t0) * 1000, 2), "slots": slots}
+
+@app.get("/api/slots/changes")
+def api_slots_changes(minutos: int = 60, quadra: str = None, limit: int = 500):
+    """Horários que mudaram de status nos últimos `minutos`."""
+    from app.transform import DIAS_SEMANA
+    store, err = _history_or_503()
+    if err:
+        return err
+    t0 = time.perf_counter()
+    rows = store.changes(time.time() - minutos * 60, [q for q in (quadra or "").split(",") if q.strip()],
+                         limit=max(1, min(limit, 5000)))
+    for r in rows:
+        r["dia_semana"] = DIAS_SEMANA[r.pop("dow")]
+    return {"count": len(rows), "ms": round((time.perf_counter() - t0) * 1000, 2), "changes": rows}
+
+@app.get("/api/resources")
+def api_resources():
+    """Recursos vistos na última lista aberta por este processo (vazio até a primeira coleta) e a
+    seleção padrão de DEFAULT_RESOURCES."""
+    from app.scraper import DEFAULT_RESOURCES, known_resources, select_resources
+    itens = known_resources()
+    padrao, _ = select_resources(itens)
+    return {"default": DEFAULT_RESOURCES, "default_names": [r.nome for r in padrao],
+            "resources": [{"nome": r.nome, "label": r.label, "rec": r.rec, "tenis": r.tenis} for r in itens]}
+
+@app.get("/api/breaker")
+def api_breaker():
+    """Estado do circuit breaker do portal (deste processo): falhas recentes por etapa e, aberto,
+    em quantos segundos um job de teste passa."""
+    return BREAKER.stats()
+
+@app.get("/api/changes")
+def api_changes(since: int = None, quadra: str = None, limit: int = 500):
+    """Feed de mudanças livre <-> não livre desde o cursor `since` (sem `since`: só o cursor atual).
+    Cada coleta é comparada, por (quadra, dia), com o último estado do histórico."""
+    store, err = _history_or_503()
+    if err:
+        return err
+    return changes.read_changes(store, since, [q for q in (quadra or "").split(",") if q.strip()],
+                                limit=max(1, min(limit, 5000)))
+
+@app.get("/api/prefetch")
+def api_prefetch():
+    """Estado do prefetch: dias em coleta e quanto falta para cada dia ser recoletado."""
+    if prefetch.PREFETCHER is None:
+        return {"enabled": False}
+    return {"enabled": True, **prefetch.PREFETCHER.stats()}
+
+@app.get("/api/job/{job_id}/trace")
+def api_job_trace(job_id: str):
+    """Spans de cada etapa do job (driver, login, lista, dia a dia, pivot, render)."""
+    job = STORE.get(job_id)
+    if not job:
+        return PlainTextResponse("Job não encontrado.", status_code=404)
+    return JSONResponse({"status": job["status"], "spans": job.get("trace") or [],
+                         "partial": job.get("partial"), "missing": job.get("missing")})
+
+metrics.Gauge("bbz_queue_jobs", "Jobs aguardando na fila",
+              lambda: STORE.queue_len() if JOB_RUNNER == "worker" else SCHEDULER.stats()["queued"])
+metrics.Gauge("bbz_running_jobs", "Jobs rodando agora", lambda: SCHEDULER.stats()["running"])
+
+@app.get("/health/ready")
+def health_ready():
+    """200 quando o processo está pronto para jobs: logo na subida, ou, com STARTUP_WARMUP=1, depois
+    do aquecimento (imports, chromedriver e primeiro Chrome). 503 enquanto aquece ou se falhou."""
+    info = warmup.WARMUP.stats()
+    return JSONResponse(info, status_code=200 if info["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _sse(idx: int, ev: dict) -> str:
+    return f"id: {idx}\nevent: {ev['type']}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n"
+
+@app.get("/api/job/{job_id}/stream")
+async def api_job_stream(request: Request, job_id: str):
+    """Server-Sent Events: blocos (quadra, dia) e progresso assim que saem do scraper, e `done` no fim."""
+    if STORE.get(job_id) is None:
+        return PlainTextResponse("Job não encontrado.", status_code=404)
+    try:
+        start_idx = int(request.headers.get("last-event-id", "-1")) + 1
+    except ValueError:
+        start_idx = 0
+
+    def poll(idx: int):
+        # job store pode ser sqlite/redis: a leitura roda numa thread para não travar o loop
+        events = STORE.events(job_id, idx)
+        return events, (_queue_position(job_id) if events is not None else None)
+
+    async def gen():
+        idx, last_pos, idle = start_idx, None, 0.0
+        while True:
+            events, pos = await asyncio.to_thread(poll, idx)
+            if events is None:
+                yield _sse(idx, {"type": "done", "status": "error"})
+                return
+            for ev in events:
+                yield _sse(idx, ev)
+                idx += 1
+                idle = 0.0
+                if ev["type"] == "done":
+                    return
+            if pos and pos != last_pos:
+                last_pos = pos
+                yield f"event: progress\ndata: {json.dumps({'type': 'progress', 'msg': f'Na fila: posição {pos}'})}\n\n"
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.3)
+            idle += 0.3
+            if idle >= 15:
+                idle = 0.0
+                yield ": ping\n\n"
+
+    return StreamingResponse(gen(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,140 @@
+import time, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Métricas em memória do processo, expostas em texto no formato do Prometheus (/metrics)
+_LOCK = threading.Lock()
+_REGISTRY = []
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def inc(self, n: float = 1, **labels):
+        key = tuple(labels.get(k, "") for k in self.labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with _LOCK:
+            items = sorted(self._values.items())
+        for key, v in items:
+            out.append(f"{self.name}{_labels(self.labels, key)} {v:g}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # labels -> [contagem por bucket..., soma, total]
+        _REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(k, "") for k in self.labels)
+        with _LOCK:
+            v = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with _LOCK:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, v in items:
+            for b, n in zip(self.buckets + ("+Inf",), v[:len(self.buckets)] + [v[-1]]):
+                le = 'le="%s"' % (b if isinstance(b, str) else f"{b:g}")
+                out.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {n}")
+            out.append(f"{self.name}_sum{_labels(self.labels, key)} {v[-2]:.6f}")
+            out.append(f"{self.name}_count{_labels(self.labels, key)} {v[-1]}")
+        return out
+
+class Gauge:
+    """Valor lido na hora da exportação (ex.: tamanho da fila)."""
+
+    def __init__(self, name: str, help: str, fn):
+        self.name, self.help, self.fn = name, help, fn
+        _REGISTRY.append(self)
+
+    def render(self) -> list:
+        try:
+            v = float(self.fn())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {v:g}"]
+
+def render() -> str:
+    lines = []
+    for m in list(_REGISTRY):
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+DAY_SECONDS = Histogram("bbz_day_seconds", "Tempo para coletar um dia de uma quadra",
+                        (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30), labels=("engine",))
+JOB_SECONDS = Histogram("bbz_job_seconds", "Duração de um job de scraping",
+                        (1, 5, 10, 30, 60, 120, 300, 600), labels=("status",))
+QUEUE_WAIT_SECONDS = Histogram("bbz_queue_wait_seconds", "Tempo de um job na fila até um worker pegar",
+                               (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300))
+FALLBACKS = Counter("bbz_fallbacks_total", "Caminhos alternativos tomados", labels=("kind",))
+CHROME_LAUNCHES = Counter("bbz_chrome_launches_total", "Chromes lançados")
+ERRORS = Counter("bbz_errors_total", "Erros por etapa do pipeline", labels=("stage",))
+
+# Spans do job corrente: lista de {"name", "start", "ms", "ok", ...atributos}
+_SPANS = ContextVar("trace_spans", default=None)
+
+def start_trace() -> list:
+    """Começa a registrar os spans do job corrente (contexto atual) e devolve a lista."""
+    spans = []
+    _SPANS.set(spans)
+    return spans
+
+def current_trace():
+    """Lista de spans do job corrente, ou None se ninguém chamou `start_trace`."""
+    return _SPANS.get()
+
+@contextmanager
+def span(name: str, **attrs):
+    """Mede uma etapa; exceções contam em bbz_errors_total{stage=name} e seguem adiante."""
+    ts, t0, ok = time.time(), time.perf_counter(), True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        spans = _SPANS.get()
+        if spans is not None:
+            spans.append({"name": name, "start": round(ts, 3),
+                          "ms": round((time.perf_counter() - t0) * 1000, 1), "ok": ok, **attrs})
+
+def traced(name: str):
+    """Decorator: a função inteira vira um span `name`."""
+    def deco(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return deco
+
+def format_trace(spans: list) -> str:
+    """Resumo por etapa: quantas vezes, tempo total e máximo."""
+    agg = {}
+    for s in spans:
+        a = agg.setdefault(s["name"], [0, 0.0, 0.0])
+        a[0] += 1; a[1] += s["ms"]; a[2] = max(a[2], s["ms"])
+    return "; ".join(f"{name} {n}× {total:.0f} ms (máx {mx:.0f})"
+                     for name, (n, total, mx) in sorted(agg.items(), key=lambda kv: -kv[1][1]))
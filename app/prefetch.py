@@ -0,0 +1,145 @@
+import os, time, random, threading
+from datetime import date, timedelta
+from app import slot_cache, jobstore
+from app.scheduler import SCHEDULER
+from app.metrics import Counter
+
+# Prefetch em segundo plano (opcional): mantém os próximos dias quentes no cache de slots
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+# Conta de serviço usada só pelo prefetch
+PREFETCH_USERNAME = os.getenv("PREFETCH_USERNAME", "")
+PREFETCH_PASSWORD = os.getenv("PREFETCH_PASSWORD", "")
+# Janela mantida quente a partir de hoje (mesmo padrão de 15 dias do run_scraping)
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "15"))
+# Intervalos de recoleta (s). O padrão fica abaixo do TTL do cache para o /run nunca achar o dia vencido.
+PREFETCH_INTERVAL_NEAR = int(os.getenv("PREFETCH_INTERVAL_NEAR", str(int(slot_cache.SLOT_CACHE_TTL_NEAR * 0.8))))
+PREFETCH_INTERVAL_FAR = int(os.getenv("PREFETCH_INTERVAL_FAR", str(int(slot_cache.SLOT_CACHE_TTL * 0.8))))
+# Variação aleatória do intervalo (fração), para não bater no portal sempre no mesmo ritmo
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "0.15"))
+# Máximo de coletas de prefetch ao mesmo tempo e dias por coleta
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+PREFETCH_CHUNK_DAYS = int(os.getenv("PREFETCH_CHUNK_DAYS", "5"))
+
+PREFETCH_RUNS = Counter("bbz_prefetch_runs_total", "Coletas do prefetch", labels=("status",))
+
+class Prefetcher:
+    """Recoleta periodicamente a janela [hoje, hoje + days) com a conta de serviço.
+
+    Dias próximos (hoje/amanhã) são recoletados com mais frequência que os distantes. Só roda
+    quando não há job interativo na fila e sobra navegador livre no pool; cada coleta cobre no
+    máximo `chunk_days` dias, para devolver o navegador rápido se chegar um pedido."""
+
+    def __init__(self, username: str, password: str, days: int = PREFETCH_DAYS,
+                 near: int = PREFETCH_INTERVAL_NEAR, far: int = PREFETCH_INTERVAL_FAR,
+                 jitter: float = PREFETCH_JITTER, concurrency: int = PREFETCH_CONCURRENCY,
+                 chunk_days: int = PREFETCH_CHUNK_DAYS):
+        self.username, self.password = username, password
+        self.days, self.near, self.far, self.jitter = max(1, days), near, far, jitter
+        self.chunk_days = max(1, chunk_days)
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._lock = threading.Lock()
+        self._next = {}        # dia -> quando recoletar (epoch)
+        self._running = set()  # dias em coleta agora
+        self.last_error = None
+        self._thread = None
+
+    def interval(self, day: date) -> float:
+        return self.near if (day - date.today()).days <= 1 else self.far
+
+    def _schedule(self, day: date, now: float):
+        base = self.interval(day)
+        self._next[day] = now + base * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def due_chunks(self, now: float = None) -> list:
+        """Intervalos contíguos (início, fim) de dias vencidos, com até `chunk_days` dias cada."""
+        now = now or time.time()
+        today = date.today()
+        window = [today + timedelta(days=n) for n in range(self.days)]
+        with self._lock:
+            for d in list(self._next):
+                if d < today:
+                    self._next.pop(d)
+            due = [d for d in window if d not in self._running and self._next.get(d, 0) <= now]
+        chunks = []
+        for d in due:
+            if chunks and (d - chunks[-1][1]).days == 1 and (d - chunks[-1][0]).days < self.chunk_days:
+                chunks[-1][1] = d
+            else:
+                chunks.append([d, d])
+        return [tuple(c) for c in chunks]
+
+    def interactive_busy(self) -> bool:
+        """True se há job de usuário esperando (no scheduler local ou na fila do job store) ou se
+        pegar um navegador deixaria o pool sem vaga para o próximo usuário (com pool de 1, basta
+        estar livre)."""
+        from app.driver_pool import get_pool
+        pool = get_pool()
+        reserve = 1 if pool.size > 1 else 0
+        if SCHEDULER.stats()["queued"] > 0 or jobstore.get_store().queue_len() > 0:
+            return True
+        return pool.free_slots() <= reserve
+
+    def run_chunk(self, start: date, end: date):
+        from app.scraper import scrape_rows
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        ok = False
+        try:
+            result = scrape_rows(self.username, self.password, start, end, use_cache=False)
+            ok = result["diag"] is None
+            if not ok:
+                self.last_error = "coleta sem linhas (login/portal)"
+        except Exception as e:
+            self.last_error = str(e)
+        finally:
+            now = time.time()
+            with self._lock:
+                for d in days:
+                    self._running.discard(d)
+                    if ok:
+                        self._schedule(d, now)
+                    else:
+                        # falhou: tenta de novo depois do intervalo curto
+                        self._next[d] = now + self.near
+            PREFETCH_RUNS.inc(status="ok" if ok else "error")
+            self._slots.release()
+
+    def tick(self):
+        for start, end in self.due_chunks():
+            if self.interactive_busy() or not self._slots.acquire(blocking=False):
+                return
+            with self._lock:
+                self._running.update(start + timedelta(days=n) for n in range((end - start).days + 1))
+            threading.Thread(target=self.run_chunk, args=(start, end), name="prefetch", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                self.last_error = str(e)
+            time.sleep(5 + random.uniform(0, 2))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch-loop", daemon=True)
+            self._thread.start()
+        return self
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            nxt = {d.isoformat(): round(ts - now) for d, ts in sorted(self._next.items())}
+            running = sorted(d.isoformat() for d in self._running)
+        return {"days": self.days, "near_interval": self.near, "far_interval": self.far,
+                "running": running, "next_in_seconds": nxt, "last_error": self.last_error}
+
+PREFETCHER = None
+
+def start_prefetcher():
+    """Liga o prefetch se PREFETCH_ENABLED=1 e a conta de serviço estiver configurada."""
+    global PREFETCHER
+    if not PREFETCH_ENABLED or not (PREFETCH_USERNAME and PREFETCH_PASSWORD):
+        return None
+    if PREFETCHER is None:
+        PREFETCHER = Prefetcher(PREFETCH_USERNAME, PREFETCH_PASSWORD).start()
+    return PREFETCHER
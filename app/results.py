@@ -0,0 +1,87 @@
+"""Exportação das linhas de um job (formato longo) em JSON, CSV ou Parquet, com filtros e ETag."""
+import io, re, json, hashlib, unicodedata
+import pandas as pd
+from app.transform import DIAS_SEMANA
+
+FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def content_etag(df: pd.DataFrame) -> str:
+    """Hash do conteúdo das linhas (calculado uma vez por job)."""
+    h = pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()
+    return hashlib.sha256(h).hexdigest()[:32]
+
+def request_etag(base: str, *parts) -> str:
+    """ETag de uma resposta: hash do conteúdo + formato/filtros, entre aspas (RFC 7232)."""
+    key = "|".join([base] + [str(p) for p in parts])
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def _fold(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s.strip().lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+_DIAS = {_fold(d): n for n, d in enumerate(DIAS_SEMANA)}
+
+def parse_weekdays(raw: str) -> list:
+    """'segunda,terca' ou '0,1' (0 = segunda) -> [0, 1]; nome desconhecido vira ValueError."""
+    out = []
+    for tok in (raw or "").split(","):
+        tok = _fold(tok)
+        if not tok:
+            continue
+        if tok.isdigit() and int(tok) < 7:
+            out.append(int(tok))
+        elif tok.split("-")[0] in _DIAS:   # aceita "segunda-feira"
+            out.append(_DIAS[tok.split("-")[0]])
+        else:
+            raise ValueError(f"Dia da semana desconhecido: {tok}")
+    return out
+
+_HHMM = re.compile(r"([01]?\d|2[0-3]):([0-5]\d)")
+
+def _minutes(hhmm: str) -> int:
+    """'08:30' -> 510; fora do formato HH:MM (00:00 a 23:59) vira ValueError."""
+    m = _HHMM.fullmatch(hhmm.strip())
+    if not m:
+        raise ValueError(f"Hora inválida: {hhmm!r} (use HH:MM, ex.: 08:30)")
+    return int(m.group(1)) * 60 + int(m.group(2))
+
+def filter_rows(df: pd.DataFrame, quadras: list = None, dias: list = None,
+                hora_de: str = None, hora_ate: str = None) -> pd.DataFrame:
+    """Filtra por quadra (nome, sem diferenciar maiúsculas), dia da semana (0..6) e faixa de hora
+    [hora_de, hora_ate] em HH:MM; com faixa de hora, linhas sem hora válida ('Integral') saem."""
+    mask = pd.Series(True, index=df.index)
+    if quadras:
+        wanted = {q.strip().lower() for q in quadras if q.strip()}
+        mask &= df["quadra"].str.lower().isin(wanted)
+    if dias:
+        mask &= df["data"].dt.dayofweek.isin(dias)
+    if hora_de or hora_ate:
+        t = pd.to_datetime(df["hora"], format="%H:%M", errors="coerce")
+        mins = t.dt.hour * 60 + t.dt.minute
+        mask &= mins.notna()
+        if hora_de:
+            mask &= mins >= _minutes(hora_de)
+        if hora_ate:
+            mask &= mins <= _minutes(hora_ate)
+    return df[mask]
+
+def serialize(df: pd.DataFrame, fmt: str) -> bytes:
+    """Linhas no formato pedido. Parquet precisa do pyarrow (ImportError se não instalado)."""
+    if fmt == "parquet":
+        buf = io.BytesIO()
+        df.assign(data=df["data"].dt.date).to_parquet(buf, index=False, engine="pyarrow")
+        return buf.getvalue()
+    out = df.assign(data=df["data"].dt.strftime("%Y-%m-%d"))
+    if fmt == "csv":
+        return out.to_csv(index=False).encode("utf-8")
+    return json.dumps({"count": len(out), "rows": out.to_dict("records")}, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,100 @@
+import os, math, time, threading
+from collections import deque
+from app.metrics import QUEUE_WAIT_SECONDS
+
+# Quantos jobs de scraping rodam ao mesmo tempo (cada um segura um Chrome do pool)
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "2"))
+# Tamanho máximo da fila de espera; acima disso o /run responde 503 com Retry-After
+SCRAPE_QUEUE_MAX = int(os.getenv("SCRAPE_QUEUE_MAX", "20"))
+# Duração assumida de um job enquanto ainda não há histórico (s)
+_DEFAULT_JOB_SECONDS = 60.0
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Fila cheia; tente novamente em {retry_after} s.")
+        self.retry_after = retry_after
+
+class JobScheduler:
+    """Fila limitada + pool fixo de workers (substitui o BackgroundTasks sem limite)."""
+
+    def __init__(self, workers: int = SCRAPE_WORKERS, max_queue: int = SCRAPE_QUEUE_MAX):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._queue = deque()          # (job_id, fn, args, enfileirado_em)
+        self._running = set()
+        self._durations = deque(maxlen=20)
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"scrape-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job_id: str, fn, *args, force: bool = False):
+        """Enfileira `fn(*args)`. `force` ignora o limite (jobs baratos, ex.: servidos do cache)."""
+        with self._cond:
+            if not force and len(self._queue) >= self.max_queue:
+                raise QueueFull(self.eta(len(self._queue) + 1))
+            self._ensure_started()
+            self._queue.append((job_id, fn, args, time.time()))
+            self._cond.notify()
+
+    def avg_duration(self) -> float:
+        with self._cond:
+            d = list(self._durations)
+        return sum(d) / len(d) if d else _DEFAULT_JOB_SECONDS
+
+    def eta(self, position: int) -> int:
+        """Estimativa (s) até um job na `position` da fila terminar."""
+        # o _cond é reentrante (RLock): o submit chama eta já com o lock
+        with self._cond:
+            rounds = math.ceil((position + len(self._running)) / self.workers)
+            return int(rounds * self.avg_duration())
+
+    def position(self, job_id: str):
+        """1..N se está na fila, 0 se já está rodando, None se não está no scheduler."""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            for n, item in enumerate(self._queue, start=1):
+                if item[0] == job_id:
+                    return n
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """Tira da fila um job que ainda não começou. False se não estava na fila."""
+        with self._cond:
+            for item in self._queue:
+                if item[0] == job_id:
+                    self._queue.remove(item)
+                    return True
+        return False
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"queued": len(self._queue), "running": len(self._running),
+                    "workers": self.workers, "max_queue": self.max_queue}
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job_id, fn, args, queued_at = self._queue.popleft()
+                self._running.add(job_id)
+            t0 = time.time()
+            QUEUE_WAIT_SECONDS.observe(t0 - queued_at)
+            try:
+                fn(*args)
+            except Exception:
+                pass   # fn registra o próprio erro no job
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
+                    self._durations.append(time.time() - t0)
+
+SCHEDULER = JobScheduler()
@@ -1,83 +1,54 @@
-import os, re, time, calendar, unicodedata
+import os, re, time, queue, threading, weakref, contextvars, calendar, unicodedata
 from datetime import date, timedelta
-from typing import List, Tuple
+from typing import List, Tuple, NamedTuple
+from html import escape
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.support.expected_conditions import staleness_of
+from app.driver_pool import get_pool
+from app import session_cache, slot_cache, history
+from app.transform import build_wide, natural_key
+from app.metrics import span, traced, current_trace, format_trace, DAY_SECONDS, FALLBACKS, ERRORS
+from app.budget import current_budget, should_stop, stop_reason, REASONS
+from app.breaker import BREAKER
+from app.waits import (
+    WAIT_TABLE_TIMEOUT, WAIT_MONTH_TIMEOUT, WAIT_WINDOW_TIMEOUT,
+    wait_for_change, wait_dom_settled, wait_new_window, track_job_waits, format_stats,
+)
 
 SITE_URL = os.getenv("SITE_URL", "https://bbz.com.br/area-do-cliente/")
-AREA_GERAL = "https://servc9.webware.com.br/bin/sol/aAreaGeral.asp"
-MINHA_UNIDADE_RESERVAS = "https://servc9.webware.com.br/bin/aplic/cpMinhaUnidadeReservas.asp"
+AREA_GERAL = os.getenv("AREA_GERAL", "https://servc9.webware.com.br/bin/sol/aAreaGeral.asp")
+MINHA_UNIDADE_RESERVAS = os.getenv("MINHA_UNIDADE_RESERVAS",
+                                   "https://servc9.webware.com.br/bin/aplic/cpMinhaUnidadeReservas.asp")
 
-def wait_table_refresh(wait: WebDriverWait, driver, prev_html: str, timeout: int = 20):
-    """Aguarda a atualização do corpo da tabela comparando HTML anterior x novo."""
-    try:
-        wait.until(lambda d: d.find_element(By.CSS_SELECTOR, "#tabelaDePeriodos tbody"))
-        start = time.time()
-        while time.time() - start < timeout:
-            cur_el = driver.find_element(By.CSS_SELECTOR, "#tabelaDePeriodos tbody")
-            cur_html = cur_el.get_attribute("innerHTML")
-            if cur_html and cur_html != prev_html:
-                return True
-            time.sleep(0.15)
-    except Exception:
-        pass
-    return False
+# Recursos coletados quando o pedido não escolhe: "tenis" (todas as quadras de tênis da lista),
+# "todos" ou nomes separados por vírgula (ex.: "Quadra 1,Churrasqueira 1")
+DEFAULT_RESOURCES = os.getenv("DEFAULT_RESOURCES", "tenis")
+# Quantas quadras coletar ao mesmo tempo (cada uma em um Chrome do pool, mesma sessão)
+SCRAPE_PARALLELISM = int(os.getenv("SCRAPE_PARALLELISM", "1"))
+# Motor padrão de extração: "selenium" (cliques no calendário) ou "http" (requisições diretas)
+SCRAPE_ENGINE = os.getenv("SCRAPE_ENGINE", "selenium")
+ENGINES = ("selenium", "http")
+# Navegação no calendário: "api" (setDate do datepicker, com cliques como fallback) ou "click"
+CALENDAR_NAV = os.getenv("CALENDAR_NAV", "api")
+# Quanto esperar a tabela reagir ao setDate antes de cair para os cliques
+CALENDAR_JUMP_TIMEOUT = float(os.getenv("CALENDAR_JUMP_TIMEOUT", "5"))
+# Depois de falhas seguidas do salto via API, o navegador fica só nos cliques por N segundos
+CALENDAR_JUMP_COOLDOWN = float(os.getenv("CALENDAR_JUMP_COOLDOWN", "600"))
+
+def wait_table_refresh(wait: WebDriverWait, driver, prev_html: str, timeout: float = WAIT_TABLE_TIMEOUT):
+    """Aguarda a atualização do corpo da tabela comparando HTML anterior x novo (MutationObserver)."""
+    return wait_for_change(driver, "#tabelaDePeriodos tbody", prev_html or "", timeout=timeout, step="tabela")
 
 def _strip_accents(s: str) -> str:
     if not s:
         return ""
     return "".join(ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch))
 
-def save_html_from_wide_to_string(wide: pd.DataFrame) -> str:
-    df = wide.copy()
-    quad_cols = [c for c in df.columns if c.lower().startswith("quadra ")]
-    mask_header = df["Hora"].fillna("").eq("")
-    df.loc[mask_header, "Hora"] = "Hora"
-    for col in quad_cols:
-        df.loc[mask_header, col] = col
-    df.loc[mask_header, "DiaSemana"] = ""
-    for col in quad_cols:
-        s = df[col]
-        mask_empty_str = s.fillna("").astype(str).str.strip().eq("")
-        df.loc[~mask_header & mask_empty_str, col] = "indisponível"
-
-    def _status_to_css(val) -> str:
-        if val is None:
-            return ""
-        s = str(val).strip().lower()
-        if s == "nan":
-            return ""
-        if "indispon" in s:
-            return "background:#ffe4b5;border:1px solid #f0c88b;text-align:center;font-weight:600;"
-        if "dispon" in s:
-            return "background:#c6efce;border:1px solid #b7ddb9;font-weight:600;text-align:center;"
-        return "text-align:center;"
-
-    def _row_header_style(row):
-        if str(row.get("Hora", "")).strip() == "Hora":
-            return ["font-weight:700;background:#e0e0e0;border-bottom:2px solid #bbb"] * len(row)
-        return [""] * len(row)
-
-    sty = (df.style
-           .map(_status_to_css, subset=quad_cols)
-           .set_properties(**{
-               "white-space": "nowrap",
-               "text-align": "center"
-           }, subset=quad_cols + ["Hora", "Dia", "DiaSemana"])
-           .apply(_row_header_style, axis=1)
-    )
-    if hasattr(sty, "hide"):
-        sty = sty.hide(axis="index")
-    elif hasattr(sty, "hide_index"):
-        sty = sty.hide_index()
-
-    css = """
+RESULT_CSS = """
     <style>
       body{font-family:Inter,Segoe UI,Roboto,Arial,sans-serif;margin:20px;color:#222;}
       h1{font-size:20px;margin:0 0 8px 0}
@@ -86,25 +57,101 @@ def save_html_from_wide_to_string(wide: pd.DataFrame) -> str:
       .dot{display:inline-block;width:10px;height:10px;border-radius:2px;margin-right:6px;vertical-align:middle}
       .ok  {background:#c6efce;border:1px solid #b7ddb9}
       .blk {background:#ffe4b5;border:1px solid #f0c88b}
+      .miss{background:#eee;color:#777;border:1px dashed #bbb}
+      .partial{background:#fff4e5;border:1px solid #f0c88b;padding:8px 12px;margin:0 0 14px 0;font-size:13px}
       table{border-collapse:collapse;width:100%;font-size:13px}
-      thead{display:none;}
       th,td{padding:8px 10px;border-bottom:1px solid #eee}
+      td{white-space:nowrap;text-align:center}
+      td.ok,td.blk{font-weight:600}
       tbody tr:nth-child(even){background:#fafafa}
+      tr.hdr td{font-weight:700;background:#e0e0e0;border-bottom:2px solid #bbb}
       .footer{margin-top:16px;color:#777;font-size:12px}
     </style>
     """
 
+# célula de (dia, quadra) que o job não chegou a coletar (cancelado/prazo)
+NAO_COLETADO = "não coletado"
+
+def _status_class(val: str) -> str:
+    s = val.lower()
+    if s == NAO_COLETADO:
+        return " class='miss'"
+    if "indispon" in s:
+        return " class='blk'"
+    if "dispon" in s:
+        return " class='ok'"
+    return ""
+
+def _cell_text(val) -> str:
+    if val is None or (isinstance(val, float) and val != val):
+        return ""
+    return str(val).strip()
+
+def _partial_notice(reason: str, missing: dict, shown: set) -> str:
+    """Aviso de resultado parcial: motivo, quantos (dia, quadra) faltaram e os dias sem nada."""
+    total = sum(len(ds) for ds in missing.values())
+    dias = sorted({d for ds in missing.values() for d in ds})
+    ausentes = [date.fromisoformat(d).strftime("%d/%m/%Y") for d in dias
+                if date.fromisoformat(d).strftime("%d/%m/%Y") not in shown]
+    msg = f"<b>Resultado parcial</b> ({escape(REASONS.get(reason, reason))}): {total} dia(s)/quadra não coletados"
+    if ausentes:
+        msg += " · sem nenhum dado: " + ", ".join(ausentes)
+    return f"<div class='partial'>{msg}.</div>"
+
+def save_html_from_wide_to_string(wide: pd.DataFrame, missing: dict = None, partial: str = None) -> str:
+    """Renderiza a tabela larga direto em string, com classes CSS no lugar de estilos por célula.
+    `missing` ({quadra: [YYYY-MM-DD]}) marca como "não coletado" os dias que faltaram num
+    resultado parcial; `partial` é o motivo da interrupção."""
+    cols = list(wide.columns)
+    quad_idx = [i for i, c in enumerate(cols) if c not in ("Dia", "DiaSemana", "Hora")]
+    i_hora = cols.index("Hora")
+    i_dia = cols.index("Dia")
+    i_sem = cols.index("DiaSemana") if "DiaSemana" in cols else None
+    faltam = {(date.fromisoformat(d).strftime("%d/%m/%Y"), q) for q, ds in (missing or {}).items() for d in ds}
+
     html = []
     html.append("<!doctype html><html><head><meta charset='utf-8'>")
-    html.append(css)
+    html.append(RESULT_CSS)
     html.append("</head><body>")
-    html.append("<h1>Quadras de Tênis · Próximos 15 dias</h1>");
-    html.append("<div class='sub'>Dia · Dia da semana · Hora · Quadra 1 · Quadra 2 · Quadra 3</div>")
+    recursos = [cols[i] for i in quad_idx]
+    dias = [d for d in dict.fromkeys(wide["Dia"]) if d]
+    titulo = "Quadras de Tênis" if all(re.fullmatch(r"Quadra \d+", c) for c in recursos) else "Disponibilidade"
+    periodo = f"{dias[0]} a {dias[-1]}" if len(dias) > 1 else (dias[0] if dias else "sem dias")
+    html.append(f"<h1>{titulo} · {periodo}</h1>")
+    html.append("<div class='sub'>" + " · ".join(escape(c) for c in ["Dia", "Dia da semana", "Hora"] + recursos) + "</div>")
     html.append("<div class='legend'>"
                 "<span><span class='dot ok'></span>Disponível</span>"
                 "<span><span class='dot blk'></span>Indisponível</span>"
-                "</div>")
-    html.append(sty.to_html())
+                + ("<span><span class='dot miss'></span>Não coletado</span>" if faltam else "")
+                + "</div>")
+    if partial:
+        html.append(_partial_notice(partial, missing or {}, set(wide["Dia"])))
+
+    out = ["<table><tbody>"]
+    for row in wide.itertuples(index=False, name=None):
+        vals = [_cell_text(v) for v in row]
+        if vals[i_hora] == "":
+            # linha sem hora vira cabeçalho do dia
+            vals[i_hora] = "Hora"
+            for i in quad_idx:
+                vals[i] = cols[i]
+            if i_sem is not None:
+                vals[i_sem] = ""
+        elif vals[i_hora] != "Hora":
+            # cabeçalho dos dias 'Integral' bloqueados já vem pronto do build_wide
+            for i in quad_idx:
+                if (vals[i_dia], cols[i]) in faltam:
+                    vals[i] = NAO_COLETADO
+                elif vals[i] == "":
+                    vals[i] = "indisponível"
+        out.append("<tr class='hdr'>" if vals[i_hora] == "Hora" else "<tr>")
+        for i, v in enumerate(vals):
+            cls = _status_class(v) if i in quad_idx else ""
+            out.append(f"<td{cls}>{escape(v)}</td>")
+        out.append("</tr>")
+    out.append("</tbody></table>")
+    html.append("".join(out))
+
     html.append("<div class='footer'>Gerado automaticamente</div>")
     html.append("</body></html>")
     return "\n".join(html)
@@ -145,11 +192,96 @@ def click_next_month(wait, driver):
     nxt = wait.until(EC.element_to_be_clickable(
         (By.CSS_SELECTOR, ".datepicker-days th.next")
     ))
-    driver.execute_script("arguments[0].click();", nxt)
-    time.sleep(1.0)
+    hdr_sel = ".datepicker-days th.datepicker-switch"
+    # clica e devolve o cabeçalho de antes na mesma ida ao navegador
+    prev = driver.execute_script(
+        "var h = document.querySelector(arguments[1]); var t = h ? h.textContent : null;"
+        "arguments[0].click(); return t;", nxt, hdr_sel)
+    wait_for_change(driver, hdr_sel, prev or "", prop="textContent", timeout=WAIT_MONTH_TIMEOUT, step="mês")
+
+# Pula direto para a data pela API do bootstrap-datepicker (uma ida ao navegador).
+# Retorna [status, html anterior da tabela]; status: "ok", "indisponivel" ou "sem-api".
+_JUMP_JS = """
+var y = arguments[0], m = arguments[1], d = arguments[2];
+var $ = window.jQuery;
+if (!$ || !$.fn || !$.fn.datepicker) return ['sem-api', null];
+var host = $('.datepicker-inline').parent().add('input, [data-provide=datepicker], .date')
+  .filter(function() { return !!$(this).data('datepicker'); }).first();
+if (!host.length) return ['sem-api', null];
+var body = document.querySelector('#tabelaDePeriodos tbody');
+var prev = body ? body.innerHTML : '';
+var alvo = new Date(y, m - 1, d);
+// 'update' só mostra o mês do alvo (sem eventos), para conferir se o dia está liberado
+host.datepicker('update', alvo);
+var livre = $('.datepicker-days td.day:not(.old):not(.new):not(.disabled):not(.foraPeriodo)')
+  .filter(function() { return $.trim($(this).text()) === String(d); }).length > 0;
+if (!livre) return ['indisponivel', prev];
+// 'setDate' dispara changeDate, o mesmo evento que o clique no dia gera
+host.datepicker('setDate', alvo);
+return ['ok', prev];
+"""
+
+class _JumpState:
+    """Falhas seguidas do salto via API em um navegador; depois de algumas ele passa a usar só
+    cliques até `CALENDAR_JUMP_COOLDOWN` segundos depois, quando a API é tentada de novo."""
+    __slots__ = ("fails", "off_until")
+
+    def __init__(self):
+        self.fails, self.off_until = 0, 0.0
+
+_JUMP_MAX_FAILS = 3
+_JUMP_STATE = weakref.WeakKeyDictionary()   # driver -> _JumpState (some junto com o driver)
+_JUMP_LOCK = threading.Lock()
+
+def _jump_state(driver) -> _JumpState:
+    with _JUMP_LOCK:
+        st = _JUMP_STATE.get(driver)
+        if st is None:
+            st = _JUMP_STATE[driver] = _JumpState()
+        return st
+
+def _jump_off(st: _JumpState):
+    st.fails, st.off_until = 0, time.monotonic() + CALENDAR_JUMP_COOLDOWN
+
+def jump_to_date(driver, target: date):
+    """Seleciona `target` via API do datepicker e espera a tabela atualizar.
+    True = tabela atualizada; False = dia não selecionável; None = API indisponível (usar cliques)."""
+    if CALENDAR_NAV != "api":
+        return None
+    st = _jump_state(driver)
+    if st.off_until > time.monotonic():
+        return None
+    try:
+        status, prev_html = driver.execute_script(_JUMP_JS, target.year, target.month, target.day)
+    except WebDriverException:
+        return None
+    if status == "sem-api":
+        _jump_off(st)
+        return None
+    if status == "indisponivel":
+        return False
+    if wait_for_change(driver, "#tabelaDePeriodos tbody", prev_html or "",
+                       timeout=CALENDAR_JUMP_TIMEOUT, step="salto"):
+        st.fails = 0
+        return True
+    # a página não reagiu ao changeDate (ex.: escuta só o clique)
+    st.fails += 1
+    if st.fails >= _JUMP_MAX_FAILS:
+        _jump_off(st)
+    return None
 
 def click_day_in_calendar(wait, driver, target: date):
-    # alinhar mês
+    with span("click_day_in_calendar", dia=target.isoformat()):
+        return _click_day_in_calendar(wait, driver, target)
+
+def _click_day_in_calendar(wait, driver, target: date):
+    jumped = jump_to_date(driver, target)
+    if jumped is not None:
+        return jumped
+    if CALENDAR_NAV == "api":
+        FALLBACKS.inc(kind="calendario_cliques")
+
+    # fallback: alinhar mês clicando em "próximo"
     while True:
         header_start = get_header_month_start(wait, driver)
         if header_start.year == target.year and header_start.month == target.month:
@@ -173,7 +305,7 @@ def click_day_in_calendar(wait, driver, target: date):
         if (td.text or "").strip() == str(target.day):
             driver.execute_script("arguments[0].click();", td)
             # aguarda a tabela de períodos atualizar (sem sleep fixo)
-            wait_table_refresh(wait, driver, prev_html, timeout=20)
+            wait_table_refresh(wait, driver, prev_html)
             return True
     return False
 
@@ -201,8 +333,9 @@ def try_switch_to_any_frame(driver):
             driver.switch_to.default_content()
     return False
 
+@traced("ensure_reservas_list_ready")
 def ensure_reservas_list_ready(wait, driver, tries: int = 3) -> int:
-    """Garante que estamos no iframe certo e que os links de quadra já renderizaram."""
+    """Garante que estamos no iframe certo e que os links de recursos já renderizaram."""
     for _ in range(tries):
         driver.switch_to.default_content()
         try_switch_to_any_frame(driver)
@@ -212,127 +345,408 @@ def ensure_reservas_list_ready(wait, driver, tries: int = 3) -> int:
                 (By.XPATH, "//a[contains(@onclick,'SelectReserva')]")
             ))
         except Exception:
-            time.sleep(0.6)
             continue
         # já tem algo, contar via função padrão
-        itens = list_tenis_links(driver)
+        itens = _resource_links(driver)
         if itens:
             return len(itens)
-        time.sleep(0.6)
+        wait_dom_settled(driver, step="lista")
     return 0
 
-def switch_to_new_window_if_any(driver):
+def switch_to_new_window_if_any(driver, timeout: float = WAIT_WINDOW_TIMEOUT):
+    """Troca para outra janela (já aberta ou que abrir em até `timeout` s)."""
     base = driver.current_window_handle
-    time.sleep(0.5)
-    for h in driver.window_handles:
-        if h != base:
-            driver.switch_to.window(h)
-            return True
+    handles = driver.window_handles
+    outras = [h for h in handles if h != base]
+    alvo = outras[0] if outras else wait_new_window(driver, set(handles), timeout=timeout)
+    if alvo:
+        driver.switch_to.window(alvo)
+        return True
     return False
 
-def list_tenis_links(driver):
-    anchors = driver.find_elements(By.XPATH, "//a[contains(@onclick,'SelectReserva')]")
-    itens = []
-    for a in anchors:
-        onclick = a.get_attribute("onclick") or ""
-        txt = (a.text or "").strip()
-        m = re.search(r"'([^']*QUADRA[^']*)'", onclick, flags=re.I)
-        label = m.group(1).strip() if m else (txt or "")
-        norm = _strip_accents(label).lower()
-        if "quadra de tenis" in norm:
-            mnum = re.search(r"(\d+)", norm)
-            numero = int(mnum.group(1)) if mnum else None
-            itens.append((a, label, numero))
-    itens.sort(key=lambda t: (9999 if t[2] is None else t[2], (t[1] or "")))
+# uma única chamada ao chromedriver devolve todos os anchors com onclick e texto
+_LINKS_JS = """
+return Array.from(document.querySelectorAll("a[onclick*='SelectReserva']"))
+  .map(function(a){ return [a, a.getAttribute('onclick') || '', a.innerText || '']; });
+"""
+
+class Resource(NamedTuple):
+    """Um recurso da lista de reservas (anchor `SelectReserva(id, 'NOME')`)."""
+    nome: str        # nome exibido e chave de cache/histórico ("Quadra 1", "Churrasqueira 1")
+    label: str       # texto original do portal
+    rec: str         # id passado ao SelectReserva (None se o onclick não trouxer)
+    tenis: bool
+
+class ListAnchor(NamedTuple):
+    """Onde a lista de recursos ficou aberta: janela e endereço do documento (frame) da lista."""
+    handle: str
+    url: str
+
+def resource_name(label: str) -> str:
+    """Quadras de tênis viram "Quadra N" (nome usado desde sempre no cache e no histórico);
+    os demais recursos ficam com o texto do portal, só com a caixa ajustada."""
+    label = " ".join((label or "").split())
+    norm = _strip_accents(label).lower()
+    if "quadra de tenis" in norm:
+        mnum = re.search(r"(\d+)", norm)
+        return f"Quadra {int(mnum.group(1))}" if mnum else "Quadra de Tênis"
+    return label.capitalize()
+
+def _sort_key(r: Resource):
+    mnum = re.search(r"(\d+)", r.nome)
+    return (not r.tenis, re.sub(r"\d+", "", r.nome), int(mnum.group(1)) if mnum else -1, r.nome)
+
+def _resource_links(driver) -> list:
+    """[(anchor, Resource)] de todos os `SelectReserva` do frame atual, tênis primeiro."""
+    itens, vistos = [], set()
+    for a, onclick, txt in driver.execute_script(_LINKS_JS) or []:
+        m = re.search(r"SelectReserva\s*\(\s*['\"]?([^,'\")]*)['\"]?\s*(?:,\s*'([^']*)')?", onclick or "")
+        rec = (m.group(1).strip() or None) if m else None
+        label = " ".join(((m.group(2) if m and m.group(2) else "") or txt or "").split())
+        if not label:
+            continue
+        nome = resource_name(label)
+        if nome in vistos:
+            # nomes repetidos (ex.: dois "Salão de festas") ficam distintos pelo id
+            nome = f"{nome} ({rec or len(itens) + 1})"
+        vistos.add(nome)
+        itens.append((a, Resource(nome, label, rec, "quadra de tenis" in _strip_accents(label).lower())))
+    itens.sort(key=lambda t: _sort_key(t[1]))
     return itens
 
-def click_tenis_by_index(driver, idx: int):
-    itens = list_tenis_links(driver)
-    if not itens:
-        raise RuntimeError("Links de QUADRA DE TÊNIS não encontrados.")
-    alvo_num = idx + 1
-    for el, label, num in itens:
-        if num == alvo_num:
+def list_resources(driver) -> List[Resource]:
+    """Todos os recursos da lista de reservas aberta (quadras e demais modalidades)."""
+    return [r for _, r in _resource_links(driver)]
+
+_CATALOG = []   # recursos vistos na última lista aberta (para resolver pedidos antes do login)
+_CATALOG_LOCK = threading.Lock()
+
+def remember_resources(resources: List[Resource]):
+    global _CATALOG
+    if resources:
+        with _CATALOG_LOCK:
+            _CATALOG = list(resources)
+
+def known_resources() -> List[Resource]:
+    with _CATALOG_LOCK:
+        return list(_CATALOG)
+
+def select_resources(resources: List[Resource], selection=None):
+    """Recursos pedidos, na ordem da lista. `selection`: texto separado por vírgula ou lista, com
+    nomes, textos do portal ou ids, além de "tenis" e "todos". Retorna (escolhidos, não achados)."""
+    sel = selection if selection is not None else DEFAULT_RESOURCES
+    tokens = [t.strip() for t in (sel.split(",") if isinstance(sel, str) else sel) if t and t.strip()]
+    chosen, unknown = set(), []
+    for t in tokens or [DEFAULT_RESOURCES]:
+        n = _strip_accents(t).lower()
+        if n in ("todos", "todas", "*"):
+            match = resources
+        elif n in ("tenis", "quadras de tenis"):
+            match = [r for r in resources if r.tenis]
+        else:
+            match = [r for r in resources
+                     if n in (_strip_accents(r.nome).lower(), _strip_accents(r.label).lower(), (r.rec or "").lower())]
+        if not match:
+            unknown.append(t)
+        chosen.update(match)
+    return [r for r in resources if r in chosen], unknown
+
+def click_resource(driver, res: Resource):
+    """Clica no anchor do recurso na lista aberta (pelo id do SelectReserva, ou pelo texto)."""
+    for el, r in _resource_links(driver):
+        if (res.rec and r.rec == res.rec) or (not res.rec and r.label == res.label):
             driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
             driver.execute_script("arguments[0].click();", el)
             return
-    el = itens[min(idx, len(itens) - 1)][0]
-    driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
-    driver.execute_script("arguments[0].click();", el)
+    raise RuntimeError(f"{res.nome} não está na lista de recursos.")
+
+def hora_from_text(hora_txt: str) -> str:
+    hora_txt = (hora_txt or "").strip()
+    m = re.search(r"(\d{2}:\d{2})", hora_txt)
+    return m.group(1) if m else hora_txt.split()[0] if hora_txt else ""
+
+def status_from_cells(has_reservar_btn: bool, res_txt: str, mid_txt: str) -> str:
+    """Regra de status de uma linha: botão RESERVAR = disponível; senão o texto da célula."""
+    if has_reservar_btn:
+        return "disponível"
+    status = (res_txt or "").strip().lower()
+    if not status:
+        mid_txt = (mid_txt or "").strip()
+        status = mid_txt.lower() if mid_txt else "indisponível"
+    return status
+
+# lê todas as linhas da tabela em uma ida ao navegador: [hora, tem botão RESERVAR, texto reservar, texto do meio]
+_PERIODOS_JS = """
+var out = [];
+document.querySelectorAll('#tabelaDePeriodos tbody tr').forEach(function(tr){
+  var h = tr.querySelector('td.integral'), r = tr.querySelector('td.reservar');
+  if (!h || !r) return;
+  var btn = Array.prototype.some.call(r.querySelectorAll('button'),
+                                      function(b){ return /reservar/i.test(b.textContent); });
+  var mid = tr.querySelector('td.indisponivel, td.disponivel');
+  out.push([h.innerText, btn, r.innerText, mid ? mid.innerText : '']);
+});
+return out;
+"""
 
 def parse_period_table(wait, driver, day: date, quadra_nome: str) -> pd.DataFrame:
-    wait.until(EC.presence_of_element_located((By.ID, "tabelaDePeriodos")))
-    rows = driver.find_elements(By.CSS_SELECTOR, "#tabelaDePeriodos tbody tr")
-    out = []
-    for tr in rows:
-        try:
-            td_hora = tr.find_element(By.CSS_SELECTOR, "td.integral")
-            hora_txt = (td_hora.text or "").strip()
-            m = re.search(r"(\d{2}:\d{2})", hora_txt)
-            hora = m.group(1) if m else hora_txt.split()[0] if hora_txt else ""
-            td_res = tr.find_element(By.CSS_SELECTOR, "td.reservar")
-            btns = td_res.find_elements(By.XPATH, ".//button[contains(translate(.,'RESERVAR','reservar'),'reservar')]")
-            if btns:
-                status = "disponível"
-            else:
-                status = (td_res.text or "").strip().lower()
-                if not status:
-                    mid_txt = ""
-                    try:
-                        mid_txt = tr.find_element(By.CSS_SELECTOR, "td.indisponivel, td.disponivel").text.strip()
-                    except Exception:
-                        pass
-                    status = mid_txt.lower() if mid_txt else "indisponível"
-            out.append({"data": day, "quadra": quadra_nome, "hora": hora, "status": status})
-        except Exception:
-            continue
-    return pd.DataFrame(out)
+    with span("parse_period_table", quadra=quadra_nome, dia=day.isoformat()):
+        wait.until(EC.presence_of_element_located((By.ID, "tabelaDePeriodos")))
+        out = []
+        for hora_txt, has_btn, res_txt, mid_txt in driver.execute_script(_PERIODOS_JS) or []:
+            out.append({"data": day, "quadra": quadra_nome, "hora": hora_from_text(hora_txt),
+                        "status": status_from_cells(bool(has_btn), res_txt, mid_txt)})
+        return pd.DataFrame(out)
+
+def date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=n) for n in range((end - start).days + 1)]
 
-def extract_range_for_quadra(wait, driver, idx: int, start: date, end: date) -> pd.DataFrame:
-    quadra_nome = f"Quadra {idx+1}"
+def rows_frame(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["data","quadra","hora","status"])
+
+def record_day(quadra_nome: str, day: date, rows: list, on_day=None):
+    """Guarda as linhas de um dia recém-coletado no cache de slots e no histórico,
+    e avisa quem acompanha o job."""
+    slot_cache.CACHE.put(quadra_nome, day, rows)
+    history.record(quadra_nome, day, rows)
+    if on_day:
+        on_day(quadra_nome, day, rows)
+
+def extract_range_for_quadra(wait, driver, res: Resource, start: date, end: date, log=None,
+                             cached: dict = None, on_day=None) -> pd.DataFrame:
+    """Coleta os dias do intervalo de um recurso (a lista de recursos já deve estar aberta); dias
+    presentes em `cached` ({dia: linhas}) não são visitados e os visitados passam por `record_day`."""
+    L = log or (lambda msg: None)
+    cached = cached or {}
+    quadra_nome = res.nome
     ensure_reservas_list_ready(wait, driver, tries=4)
-    click_tenis_by_index(driver, idx)
+    click_resource(driver, res)
     switch_to_new_window_if_any(driver)
     try_switch_to_any_frame(driver)
 
-    all_rows = []
-    current = start
-    while current <= end:
-        ok = click_day_in_calendar(wait, driver, current)
-        if not ok:
-            current += timedelta(days=1)
+    by_day = dict(cached)
+    t_cal, t_tab = [], []   # tempo por dia (ms): navegação no calendário e leitura da tabela
+    for current in date_range(start, end):
+        if current in cached:
             continue
-        df = parse_period_table(wait, driver, current, quadra_nome)
-        if not df.empty:
-            all_rows.append(df)
-        current += timedelta(days=1)
+        if should_stop():
+            L(f"{quadra_nome}: coleta interrompida ({stop_reason()}) em {current:%d/%m}.")
+            break
+        try:
+            t0 = time.perf_counter()
+            ok = click_day_in_calendar(wait, driver, current)
+            t_cal.append((time.perf_counter() - t0) * 1000)
+            if not ok:
+                record_day(quadra_nome, current, [], on_day)
+                continue
+            t0 = time.perf_counter()
+            df = parse_period_table(wait, driver, current, quadra_nome)
+            t_tab.append((time.perf_counter() - t0) * 1000)
+        except Exception:
+            # cancelamento derruba o navegador no meio do dia: fica o que já foi coletado
+            if should_stop():
+                L(f"{quadra_nome}: coleta interrompida ({stop_reason()}) em {current:%d/%m}.")
+                break
+            raise
+        DAY_SECONDS.observe((t_cal[-1] + t_tab[-1]) / 1000, engine="selenium")
+        by_day[current] = df.to_dict("records")
+        record_day(quadra_nome, current, by_day[current], on_day)
+
+    if t_tab:
+        L(f"{quadra_nome}: por dia calendário {sum(t_cal)/len(t_cal):.0f} ms (máx {max(t_cal):.0f}), "
+          f"tabela {sum(t_tab)/len(t_tab):.0f} ms (máx {max(t_tab):.0f}) em {len(t_tab)} dias.")
+    return rows_frame([r for d in sorted(by_day) for r in by_day[d]])
+
+def day_events(quadra_nome: str, day: date, rows: list) -> dict:
+    """Evento de streaming com as linhas de um (quadra, dia)."""
+    return {"type": "rows", "quadra": quadra_nome, "data": day.isoformat(),
+            "rows": [{"hora": r.get("hora", ""), "status": r.get("status", "")} for r in rows]}
+
+def collect_quadra(wait, driver, res: Resource, start: date, end: date, log,
+                   engine: str = SCRAPE_ENGINE, fresh_since: float = None,
+                   on_event=None, use_cache: bool = True, nav: dict = None) -> pd.DataFrame:
+    """Coleta o intervalo de um recurso (`use_cache=False` recoleta tudo). `nav` guarda, por
+    navegador, onde a lista de recursos ficou aberta, para a próxima quadra reaproveitá-la."""
+    L = log
+    quadra_nome = res.nome
+    nav = nav if nav is not None else {}
+    total = (end - start).days + 1
+
+    def on_day(nome, day, rows):
+        if on_event:
+            on_event(day_events(nome, day, rows))
+            on_event({"type": "progress", "msg": f"{nome}, dia {(day - start).days + 1}/{total}"})
+
+    if use_cache:
+        cached, missing = slot_cache.CACHE.lookup_range(quadra_nome, start, end, fresh_since=fresh_since)
+    else:
+        cached, missing = {}, date_range(start, end)
+    for d in sorted(cached):
+        if on_event and cached[d]:
+            on_event(day_events(quadra_nome, d, cached[d]))
+    if not missing:
+        L(f"{quadra_nome}: {len(cached)} dias vieram do cache.")
+        return rows_frame([r for d in sorted(cached) for r in cached[d]])
+    if cached:
+        L(f"{quadra_nome}: {len(cached)} dias do cache, {len(missing)} a coletar.")
+    L(f"Preparando lista para {quadra_nome}…")
+    nav["anchor"] = open_resource_list(wait, driver, nav.get("anchor"), log=L)
+
+    L(f"Coletando {quadra_nome} ({len(missing)} dias)…")
+    if engine == "http":
+        from app.http_engine import extract_range_for_quadra_http
+        df = extract_range_for_quadra_http(wait, driver, res, start, end, log=L, cached=cached,
+                                           on_day=on_day)
+    else:
+        df = extract_range_for_quadra(wait, driver, res, start, end, log=L, cached=cached,
+                                      on_day=on_day)
+    L(f"{quadra_nome}: {len(df)} linhas.")
+    return df
+
+def collect_courts(driver, resources: List[Resource], start: date, end: date, log,
+                   username: str = None, password: str = None,
+                   parallelism: int = SCRAPE_PARALLELISM, engine: str = SCRAPE_ENGINE,
+                   fresh_since: float = None, on_event=None, use_cache: bool = True,
+                   anchor: ListAnchor = None):
+    """Coleta vários recursos. Cada navegador abre a lista de recursos uma vez e volta a ela entre
+    um recurso e outro (`anchor` = lista já aberta no driver principal). Com paralelismo > 1,
+    drivers extras do pool reaproveitam os cookies da sessão já logada e consomem a mesma fila.
+    Retorna (lista de DataFrames na ordem dos recursos, {nome: erro})."""
+    L = log
+    pending = queue.Queue()
+    for res in resources:
+        pending.put(res)
+    results, errors = {}, {}
+
+    def drain(drv, nav):
+        wait = WebDriverWait(drv, 25)
+        while not should_stop():
+            try:
+                res = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[res.nome] = collect_quadra(wait, drv, res, start, end, L, engine=engine,
+                                                   fresh_since=fresh_since, on_event=on_event,
+                                                   use_cache=use_cache, nav=nav)
+            except Exception as e:
+                errors[res.nome] = str(e)
+                L(f"{res.nome}: erro {e}")
+
+    cookies = driver.get_cookies() if parallelism > 1 else []
+    pool = get_pool()
+
+    def helper(n: int):
+        # só ajuda se houver navegador livre agora; senão o driver principal segue sozinho
+        with span("driver", ajudante=n):
+            drv = pool.acquire(timeout=2)
+        if drv is None:
+            L(f"Coleta paralela: sem navegador livre para o ajudante {n}.")
+            return
+        budget = current_budget()
+        on_cancel = budget.on_cancel(lambda: pool.abort(drv)) if budget else None
+        broken = False
+        try:
+            wait = WebDriverWait(drv, 25)
+            inject_session_cookies(drv, cookies)
+            drv.get(MINHA_UNIDADE_RESERVAS)
+            if not is_logged_in(drv) and not (username and do_login(wait, drv, username, password)):
+                L(f"Coleta paralela: ajudante {n} não conseguiu sessão.")
+                return
+            drain(drv, {})
+        except WebDriverException as e:
+            broken = True
+            L(f"Coleta paralela: ajudante {n} falhou ({e.__class__.__name__}).")
+        finally:
+            if on_cancel:
+                budget.remove(on_cancel)
+            pool.release(drv, broken=broken)
+
+    # cada thread roda numa cópia do contexto (mantém as estatísticas de espera do job)
+    helpers = [threading.Thread(target=contextvars.copy_context().run, args=(helper, n), daemon=True)
+               for n in range(1, min(parallelism, len(resources)))]
+    for t in helpers:
+        t.start()
+    drain(driver, {"anchor": anchor})
+    for t in helpers:
+        t.join()
 
-    return pd.concat(all_rows, ignore_index=True) if all_rows else pd.DataFrame(columns=["data","quadra","hora","status"])
+    dfs = [results[r.nome] for r in resources if r.nome in results and not results[r.nome].empty]
+    return dfs, errors
 
+@traced("open_nova_reserva_list")
 def open_nova_reserva_list(wait, driver):
-    driver.get(AREA_GERAL); time.sleep(0.8)
-    driver.get(MINHA_UNIDADE_RESERVAS); time.sleep(0.8)
-    switch_to_new_window_if_any(driver)
+    driver.get(AREA_GERAL); wait_dom_settled(driver, step="navegação")
+    driver.get(MINHA_UNIDADE_RESERVAS); wait_dom_settled(driver, step="navegação")
+    # GET não abre janela: só os cliques abaixo podem abrir uma (e só depois deles vale esperar)
     try_switch_to_any_frame(driver)
     nova = find_first(wait, [
         (By.XPATH, "//*[self::a or self::button][contains(.,'Nova Reserva')]"),
         (By.XPATH, "//a[@href='javascript:void(0);' and contains(.,'Reserva')]"),
     ], must_click=True, driver=driver)
     if nova:
-        driver.execute_script("arguments[0].click();", nova); time.sleep(0.8)
+        driver.execute_script("arguments[0].click();", nova); wait_dom_settled(driver, step="nova reserva")
         switch_to_new_window_if_any(driver); try_switch_to_any_frame(driver)
 
-def do_login(wait, driver, username: str, password: str):
+def remember_list(driver) -> ListAnchor:
+    return ListAnchor(driver.current_window_handle, driver.execute_script("return location.href;"))
+
+def back_to_list(wait, driver, anchor: ListAnchor) -> bool:
+    """Volta à lista já aberta sem refazer AREA_GERAL/MINHA_UNIDADE: fecha a janela que o recurso
+    abriu, se for o caso, ou recarrega só o frame da lista."""
+    try:
+        if driver.current_window_handle != anchor.handle:
+            driver.close()
+            driver.switch_to.window(anchor.handle)
+        try_switch_to_any_frame(driver)
+        if _resource_links(driver):
+            return True
+        driver.execute_script("location.href = arguments[0];", anchor.url)
+        wait_dom_settled(driver, step="lista")
+        return ensure_reservas_list_ready(wait, driver, tries=2) > 0
+    except WebDriverException:
+        return False
+
+def open_resource_list(wait, driver, anchor: ListAnchor = None, log=None) -> ListAnchor:
+    """Deixa a lista de recursos aberta e devolve onde ela está. Com `anchor`, reaproveita a lista
+    desta sessão; sem ele (ou se não der), segue o caminho oficial do portal."""
+    L = log or (lambda msg: None)
+    if anchor is not None:
+        if back_to_list(wait, driver, anchor):
+            return anchor if driver.current_window_handle == anchor.handle else remember_list(driver)
+        L("Lista aberta não respondeu; reabrindo pelo caminho do portal.")
+        FALLBACKS.inc(kind="lista_recarregada")
+    open_nova_reserva_list(wait, driver)   # caminho “oficial” do portal
+    count = ensure_reservas_list_ready(wait, driver, tries=4)
+    # fallback: se ainda 0, reabrir via fluxo oficial (às vezes o GET direto não injeta o iframe certo)
+    if count == 0:
+        L("Fallback: reabrindo via 'open_nova_reserva_list'.")
+        FALLBACKS.inc(kind="lista_reaberta")
+        open_nova_reserva_list(wait, driver)
+        count = ensure_reservas_list_ready(wait, driver, tries=4)
+        if count == 0:
+            raise RuntimeError("Links de recursos (SelectReserva) não renderizaram (iframe/JS).")
+    L(f"Recursos visíveis na lista: {count}")
+    return remember_list(driver)
+
+def do_login(wait, driver, username: str, password: str, log=None) -> bool:
+    """Faz o login no portal. Retorna True se houve redirecionamento para a área interna (webware)."""
+    L = log or (lambda msg: None)
+    L(f"Abrindo {SITE_URL}")
     driver.get(SITE_URL)
+    L(f"URL inicial: {driver.current_url}")
     user_input = wait.until(EC.presence_of_element_located((By.ID, "mem")))
     pass_input = wait.until(EC.presence_of_element_located((By.ID, "pass")))
     user_input.clear(); user_input.send_keys(username)
     pass_input.clear(); pass_input.send_keys(password)
+    L("Campos de login localizados e preenchidos.")
     try:
         try:
             cb = driver.find_element(By.ID, "termo")
             driver.execute_script("if(!arguments[0].checked){arguments[0].click();}", cb)
+            L("Checkbox de termos marcado.")
         except Exception:
+            L("Checkbox de termos não encontrado (ok).")
             for cb in driver.find_elements(By.CSS_SELECTOR, "input[type='checkbox']"):
                 if cb.is_displayed() and cb.is_enabled():
                     driver.execute_script("if(!arguments[0].checked){arguments[0].click();}", cb)
@@ -342,226 +756,305 @@ def do_login(wait, driver, username: str, password: str):
     btn = find_first(wait, [
         (By.XPATH, "//button[contains(.,'ENTRAR')]"),
         (By.CSS_SELECTOR, "button[type='submit']"),
-        (By.XPATH, "//input[@type='submit']"),
+        (By.XPATH, "//input[@type='submit' or @value='ENTRAR']"),
     ], must_click=True, driver=driver)
     if not btn:
         raise RuntimeError("Botão ENTRAR não encontrado.")
     driver.execute_script("arguments[0].click();", btn)
+    L("Clique no ENTRAR enviado.")
     try:
-        wait.until(lambda d: "webware" in d.current_url or "servc" in d.current_url)
+        with span("redirect"):
+            wait.until(lambda d: "webware" in d.current_url or "servc" in d.current_url)
+        return True
     except TimeoutException:
-        pass
+        return False
 
-def run_scraping(username: str, password: str, start_date: date = None, end_date: date = None) -> str:
-    from datetime import date as _date
-    if not start_date:
-        start_date = _date.today()
-    if not end_date:
-        end_date = _date.today() + timedelta(days=14)
+def is_logged_in(driver) -> bool:
+    """True se estamos na área interna (webware) e não fomos devolvidos à tela de login."""
+    url = driver.current_url or ""
+    if "webware" not in url and "servc" not in url:
+        return False
+    return not driver.find_elements(By.CSS_SELECTOR, "#mem, input[type='password']")
 
-    log = []
+def inject_session_cookies(driver, cookies: list):
+    """Injeta cookies do webware sem precisar navegar até o domínio antes."""
+    for c in cookies:
+        params = {k: c[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite") if k in c}
+        if "expiry" in c:
+            params["expires"] = c["expiry"]
+        try:
+            driver.execute_cdp_cmd("Network.setCookie", params)
+        except Exception:
+            # sem CDP: add_cookie exige estar no domínio do cookie
+            if "webware" not in (driver.current_url or ""):
+                driver.get(AREA_GERAL)
+            driver.add_cookie({k: v for k, v in c.items() if k != "sameSite"})
+
+def login_with_session_cache(wait, driver, username: str, password: str, log=None) -> bool:
+    """Reaproveita a sessão em cache da conta; se o portal recusar, faz o login completo."""
+    L = log or (lambda msg: None)
+    cookies = session_cache.get(username, password)
+    if cookies:
+        L("Sessão em cache encontrada; pulando o login.")
+        try:
+            inject_session_cookies(driver, cookies)
+            driver.get(MINHA_UNIDADE_RESERVAS)
+            if is_logged_in(driver):
+                L(f"Sessão reaproveitada: {driver.current_url}")
+                session_cache.mark_verified(username, password)
+                return True
+        except Exception as e:
+            L(f"Falha ao reaproveitar sessão: {e}")
+        L("Portal voltou para o login; refazendo login completo.")
+        FALLBACKS.inc(kind="login_completo")
+        session_cache.invalidate(username, password)
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except Exception:
+            driver.delete_all_cookies()
+
+    logged = do_login(wait, driver, username, password, log=L)
+    if logged:
+        session_cache.mark_verified(username, password)
+        session_cache.put(username, password, driver.get_cookies())
+    return logged
+
+def collect_from_cache(names: List[str], start: date, end: date, fresh_since: float = None):
+    """Se todos os recursos (`names`) tiverem todos os dias frescos no cache, devolve os
+    DataFrames; senão None."""
+    dfs = []
+    for nome in names:
+        cached, missing = slot_cache.CACHE.lookup_range(nome, start, end,
+                                                        fresh_since=fresh_since, count=False)
+        if missing:
+            return None
+        df = rows_frame([r for d in sorted(cached) for r in cached[d]])
+        if not df.empty:
+            dfs.append(df)
+    return dfs or None
+
+def _portal_failure(stage: str):
+    # job cancelado/sem prazo derruba o navegador no meio do caminho: isso não diz nada do portal
+    if not should_stop():
+        BREAKER.failure(stage)
+
+def _login_rejected(driver) -> bool:
+    """True se o portal terminou de carregar e continua mostrando o formulário de login (usuário ou
+    senha errados), o que não é problema de saúde do portal."""
+    try:
+        ready = driver.execute_script("return document.readyState;") == "complete"
+        return ready and bool(driver.find_elements(By.CSS_SELECTOR, "#mem, input[type='password']"))
+    except WebDriverException:
+        return False
+
+def _stopped_html(log: list) -> str:
+    html = f"<h3>Job interrompido</h3><p>{escape(REASONS.get(stop_reason(), ''))} antes de coletar algum dia.</p>"
+    return html + "<details><summary>Log</summary><pre>" + "\n".join(log) + "</pre></details>"
+
+def _collect_with_browser(username: str, password: str, start_date: date, end_date: date,
+                          engine: str, fresh_since: float, log: list, on_event=None,
+                          use_cache: bool = True, resources=None):
+    """Login + coleta via navegador do pool dos recursos escolhidos em `resources` (ver
+    `select_resources`). Retorna (dfs, nomes dos recursos, None) ou (None, None, html de diagnóstico)."""
     def L(msg):
         log.append(msg)
 
-    options = webdriver.ChromeOptions()
-    options.add_argument("--headless=new")
-    options.add_argument("--window-size=1366,900")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                         "AppleWebKit/537.36 (KHTML, like Gecko) "
-                         "Chrome/122.0.0.0 Safari/537.36")
-    options.add_argument("--blink-settings=imagesEnabled=false")
-    prefs = {
-        "profile.managed_default_content_settings.images": 2,
-        "profile.managed_default_content_settings.stylesheets": 2,
-        "profile.managed_default_content_settings.fonts": 2,
-    }
-    options.add_experimental_option("prefs", prefs)
-    
-    # carregar só quando DOM está pronto (não aguarda todos recursos)
-    options.page_load_strategy = "eager"
-
-    driver = webdriver.Chrome(service=Service(), options=options)
-    wait = WebDriverWait(driver, 25)
-    
-    # === Aceleração de rede: bloqueia recursos estáticos pesados ===
-    try:
-        driver.execute_cdp_cmd("Network.enable", {})
-        driver.execute_cdp_cmd("Network.setBlockedURLs", {
-            "urls": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp",
-                     "*.svg", "*.css", "*.woff", "*.woff2", "*.ttf"]
-        })
-    except Exception:
-        pass
-        
-    try:
-        L(f"Abrindo {SITE_URL}")
-        driver.get(SITE_URL)
-        L(f"URL inicial: {driver.current_url}")
+    with get_pool().session() as driver:
+        wait = WebDriverWait(driver, 25)
+        if should_stop():
+            # cancelado (ou sem prazo) enquanto esperava navegador
+            return None, None, _stopped_html(log)
 
         # === LOGIN ===
         try:
-            user_input = wait.until(EC.presence_of_element_located((By.ID, "mem")))
-            pass_input = wait.until(EC.presence_of_element_located((By.ID, "pass")))
-            user_input.clear(); user_input.send_keys(username)
-            pass_input.clear(); pass_input.send_keys(password)
-            L("Campos de login localizados e preenchidos.")
-
-            try:
-                cb = driver.find_element(By.ID, "termo")
-                driver.execute_script("if(!arguments[0].checked){arguments[0].click();}", cb)
-                L("Checkbox de termos marcado.")
-            except Exception:
-                L("Checkbox de termos não encontrado (ok).")
-
-            btn = find_first(wait, [
-                (By.XPATH, "//button[contains(.,'ENTRAR')]"),
-                (By.CSS_SELECTOR, "button[type='submit']"),
-                (By.XPATH, "//input[@type='submit' or @value='ENTRAR']"),
-            ], must_click=True, driver=driver)
-            if not btn:
-                raise RuntimeError("Botão ENTRAR não encontrado.")
-            driver.execute_script("arguments[0].click();", btn)
-            L("Clique no ENTRAR enviado.")
-
+            with span("login"):
+                logged = login_with_session_cache(wait, driver, username, password, log=L)
         except Exception as e:
+            if isinstance(e, TimeoutException):
+                _portal_failure("login")
             html = f"<h3>Falha ao preparar login</h3><pre>{e}</pre>"
             html += f"<details><summary>Log</summary><pre>{chr(10).join(log)}</pre></details>"
-            return html
+            return None, None, html
 
         # === PÓS LOGIN ===
-        try:
-            wait.until(lambda d: "webware" in d.current_url or "servc" in d.current_url)
+        if logged:
             L(f"Redirecionado para: {driver.current_url}")
-        except TimeoutException:
+        else:
             page = driver.page_source[:5000]
             L("Timeout aguardando redirecionamento pós-login.")
+            ERRORS.inc(stage="login")
+            if _login_rejected(driver):
+                L("O portal continua no formulário de login (credenciais recusadas?).")
+            else:
+                _portal_failure("login")
             html = "<h3>Login não confirmou</h3><p>O site não redirecionou para a área interna.</p>"
             html += "<details><summary>Diagnóstico</summary>"
             html += "<pre>" + "\n".join(log) + "</pre>"
             html += "<h4>Trecho da página</h4><pre>" + (page.replace('<','&lt;')) + "</pre>"
             html += "</details>"
-            return html
+            return None, None, html
 
-        # === ACESSA LISTA DE RESERVAS ===
+        # === ACESSA LISTA DE RECURSOS ===
         L("Abrindo 'Minha Unidade > Reservas'.")
-        open_nova_reserva_list(wait, driver)
+        try:
+            anchor = open_resource_list(wait, driver, log=L)
+        except RuntimeError as e:
+            anchor = None
+            L(str(e))
         L(f"Após abrir lista: URL={driver.current_url}")
 
-        L(f"URL atual antes de buscar quadras: {driver.current_url}")
         html_preview = driver.page_source[:2000]
         L(f"Prévia do HTML: {html_preview[:500].replace('<','&lt;')}")
-        itens = list_tenis_links(driver)
-        L(f"Links de QUADRA encontrados: {len(itens)}")
+        itens = list_resources(driver) if anchor else []
+        remember_resources(itens)
+        L(f"Recursos na lista ({len(itens)}): " + ", ".join(r.nome for r in itens))
 
         if not itens:
+            ERRORS.inc(stage="lista")
+            _portal_failure("lista")
             page = driver.page_source[:5000]
-            html = "<h3>Nenhuma quadra encontrada na lista</h3><p>Os seletores podem ter mudado ou o portal bloqueou o acesso.</p>"
+            html = "<h3>Nenhum recurso encontrado na lista</h3><p>Os seletores podem ter mudado ou o portal bloqueou o acesso.</p>"
             html += "<details><summary>Diagnóstico</summary><pre>" + "\n".join(log) + "</pre>"
             html += "<h4>Trecho da página</h4><pre>" + (page.replace('<','&lt;')) + "</pre></details>"
-            return html
+            return None, None, html
+
+        escolhidos, desconhecidos = select_resources(itens, resources)
+        if desconhecidos:
+            L("Pedidos que não estão na lista: " + ", ".join(desconhecidos))
+        if not escolhidos:
+            BREAKER.success()   # o portal respondeu; o pedido é que não casa com a lista
+            html = "<h3>Nenhum dos recursos pedidos está na lista</h3>"
+            html += "<p>Disponíveis: " + escape(", ".join(r.nome for r in itens)) + "</p>"
+            html += "<details><summary>Diagnóstico</summary><pre>" + "\n".join(log) + "</pre></details>"
+            return None, None, html
 
         # === COLETA POR INTERVALO ===
-        dfs = []
-        for i in range(3):
-            try:
-                L(f"Preparando lista para Quadra {i+1}…")
-                open_nova_reserva_list(wait, driver)   # caminho “oficial” do portal
-                count = ensure_reservas_list_ready(wait, driver, tries=4)
-                L(f"Links de QUADRA visíveis agora: {count}")
-                
-                # fallback: se ainda 0, reabrir via fluxo oficial (às vezes o GET direto não injeta o iframe certo)
-                if count == 0:
-                    L("Fallback: reabrindo via 'open_nova_reserva_list'.")
-                    open_nova_reserva_list(wait, driver)
-                    count = ensure_reservas_list_ready(wait, driver, tries=4)
-                    L(f"Links após fallback: {count}")
-                    if count == 0:
-                        raise RuntimeError("Links de QUADRA de TÊNIS não renderizaram (iframe/JS).")
-
-                L(f"Coletando Quadra {i+1} ({(end_date - start_date).days + 1} dias)…")
-                df = extract_range_for_quadra(wait, driver, i, start_date, end_date)
-                L(f"Quadra {i+1}: {len(df)} linhas.")
-                if not df.empty:
-                    dfs.append(df)
-            except Exception as e:
-                L(f"Quadra {i+1}: erro {e}")
+        L(f"Motor de extração: {engine}")
+        dfs, erros = collect_courts(driver, escolhidos, start_date, end_date, L,
+                                    username=username, password=password, engine=engine,
+                                    fresh_since=fresh_since, on_event=on_event, use_cache=use_cache,
+                                    anchor=anchor)
+        L("Cache de slots: {hits} acertos, {misses} faltas, {entries} dias em memória.".format(**slot_cache.CACHE.stats()))
+        if erros:
+            L("Recursos com erro: " + ", ".join(sorted(erros)))
 
+        courts = [r.nome for r in escolhidos]
+        if not dfs and should_stop():
+            return None, None, _stopped_html(log)
         if not dfs:
+            ERRORS.inc(stage="coleta")
+            _portal_failure("coleta")
             page = driver.page_source[:5000]
             html = "<h3>Nenhum dado coletado</h3><p>Pode ser bloqueio do site, mudança no HTML, ou sem slots publicados.</p>"
             html += "<details><summary>Diagnóstico</summary><pre>" + "\n".join(log) + "</pre>"
             html += "<h4>Trecho da página</h4><pre>" + (page.replace('<','&lt;')) + "</pre></details>"
-            return html
-
-        # === TRATAMENTO FINAL E RENDER HTML ===
-        full = pd.concat(dfs, ignore_index=True)
-        full["data"] = pd.to_datetime(full["data"])
-        full["hora"] = full["hora"].fillna("").astype(str).str.strip()
-        full["status"] = full["status"].astype(str).str.strip()
-
-        horas_catalogo = (
-            full.loc[full["hora"].str.len().gt(0) & ~full["hora"].str.lower().eq("integral"), "hora"]
-                .dropna().unique().tolist()
-        )
-
-        mask_integral = full["hora"].str.lower().eq("integral")
-        mask_integral_indisp = mask_integral & full["status"].str.contains("indispon", case=False, na=False)
-
-        headers = []
-        if mask_integral_indisp.any():
-            pairs = full.loc[mask_integral_indisp, ["data", "quadra"]].drop_duplicates()
-            for _, r in pairs.iterrows():
-                full = full[~(full["data"].eq(r["data"]) & full["quadra"].eq(r["quadra"]))]
-            novas = []
-            for _, r in pairs.iterrows():
-                for h in horas_catalogo:
-                    novas.append({"data": r["data"], "quadra": r["quadra"], "hora": h, "status": "indisponível"})
-                headers.append(r["data"])
-            full = pd.concat([full, pd.DataFrame(novas)], ignore_index=True)
-
-        dias_semana = ["segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo"]
-        full["Dia"] = full["data"].dt.strftime("%d/%m/%Y")
-        full["DiaSemana"] = full["data"].dt.dayofweek.map(lambda i: dias_semana[i])
-
-        wide = (
-            full.pivot_table(index=["Dia", "hora", "DiaSemana"],
-                             columns="quadra", values="status", aggfunc="first")
-                .reset_index()
-        )
-
-        if headers:
-            dias_hdr = pd.to_datetime(pd.Series(headers)).dt.strftime("%d/%m/%Y").unique().tolist()
-            add = pd.DataFrame([
-                {"Dia": d, "hora": "Hora", "DiaSemana": "DiaSemana",
-                 "Quadra 1": "Quadra 1", "Quadra 2": "Quadra 2", "Quadra 3": "Quadra 3"}
-                for d in dias_hdr
-            ])
-            wide = pd.concat([wide, add], ignore_index=True)
-            wide["_d"] = pd.to_datetime(wide["Dia"], format="%d/%m/%Y", errors="coerce")
-            wide["_t"] = pd.to_datetime(wide["hora"], format="%H:%M", errors="coerce")
-            wide = wide.sort_values(["_d", "_t"], kind="stable", na_position="first").drop(columns=["_d","_t"])
-
-        for i in range(1, 4):
-            col = f"Quadra {i}"
-            if col not in wide.columns:
-                wide[col] = None
-
-        wide = wide.rename(columns={"hora": "Hora"})
-        wide = wide[["Dia", "DiaSemana", "Hora", "Quadra 1", "Quadra 2", "Quadra 3"]]
-
-        html = save_html_from_wide_to_string(wide)
-        html += "<details style='margin:16px 0;'><summary>Log de execução</summary><pre>"
-        html += "\n".join(log)
-        html += "</pre></details>"
-        return html
-
-    finally:
+            return None, None, html
+        BREAKER.success()
+        return dfs, courts, None
+
+def scrape_rows(username: str, password: str, start_date: date = None, end_date: date = None,
+                engine: str = SCRAPE_ENGINE, fresh_since: float = None, on_event=None,
+                use_cache: bool = True, resources=None) -> dict:
+    """Coleta a disponibilidade no formato longo dos recursos escolhidos em `resources` (nomes,
+    rótulos ou códigos separados por vírgula, "tenis" ou "todos"; padrão DEFAULT_RESOURCES).
+    Retorna {"rows": DataFrame data/quadra/hora/status ou None, "log": [...], "diag": html ou None,
+    "courts": nomes dos recursos coletados};
+    `diag` vem preenchido (e `rows` None) quando a coleta não chegou a produzir linhas. Se o job
+    foi cancelado ou passou do prazo no meio, vêm também "partial" (motivo) e "missing" ({quadra: dias}).
+    `fresh_since` aceita linhas do cache coletadas desde esse instante (usado por jobs agregados);
+    `on_event` recebe os blocos (quadra, dia) e o progresso conforme a coleta anda;
+    `use_cache=False` ignora o cache de slots e recoleta todo o intervalo (usado pelo prefetch)."""
+    from datetime import date as _date
+    if not start_date:
+        start_date = _date.today()
+    if not end_date:
+        end_date = _date.today() + timedelta(days=14)
+
+    log = []
+    def L(msg):
+        log.append(msg)
+
+    emit = on_event or (lambda ev: None)
+    emit({"type": "progress", "msg": "Iniciando coleta…"})
+    waits = track_job_waits()
+    # o catálogo visto na última ida ao portal resolve a seleção sem abrir navegador
+    courts, desconhecidos = select_resources(known_resources(), resources)
+    dfs = None
+    # linhas do cache só saem para quem já provou o login (sessão em cache ou login recente)
+    if use_cache and courts and not desconhecidos and session_cache.verified(username, password):
+        courts = [r.nome for r in courts]
+        dfs = collect_from_cache(courts, start_date, end_date, fresh_since=fresh_since)
+    if dfs is not None:
+        L("Todos os dias vieram do cache de slots; navegador não foi aberto.")
+        for df in dfs:
+            for (quadra_nome, d), g in df.groupby(["quadra", "data"], sort=False):
+                emit(day_events(quadra_nome, d, g.to_dict("records")))
+    else:
+        # circuito aberto (portal falhando): falha aqui, sem pegar Chrome nem esperar timeouts
+        probe = BREAKER.admit()
+        if probe:
+            L("Circuito do portal meio-aberto: este job é o teste de recuperação.")
+        emit({"type": "progress", "msg": "Entrando no portal…"})
         try:
-            driver.quit()
-        except Exception:
-            pass
+            dfs, courts, diag = _collect_with_browser(username, password, start_date, end_date,
+                                                      engine, fresh_since, log, on_event=on_event,
+                                                      use_cache=use_cache, resources=resources)
+        except TimeoutException:
+            _portal_failure("portal")
+            raise
+        finally:
+            if probe:
+                BREAKER.end_probe()
+        if diag is not None:
+            return {"rows": None, "log": log, "diag": diag, "courts": None}
+
+    rows = pd.concat(dfs, ignore_index=True)
+    out = {"rows": rows, "log": log, "diag": None, "courts": courts}
+    if stop_reason():
+        missing = missing_days(rows, courts, start_date, end_date)
+        if missing:
+            n = sum(len(ds) for ds in missing.values())
+            L(f"Coleta interrompida ({stop_reason()}): {n} dia(s)/quadra ficaram sem dados.")
+            emit({"type": "progress", "msg": f"Coleta interrompida ({REASONS[stop_reason()]}); resultado parcial."})
+            out.update(partial=stop_reason(), missing=missing)
+    if waits:
+        L("Esperas: " + format_stats(waits))
+    if current_trace():
+        L("Etapas: " + format_trace(current_trace()))
+    return out
+
+def missing_days(rows: pd.DataFrame, courts: List[str], start: date, end: date) -> dict:
+    """{quadra: [YYYY-MM-DD]} dos dias do intervalo sem nenhuma linha coletada."""
+    got = set(zip(rows["quadra"], pd.to_datetime(rows["data"]).dt.date))
+    missing = {}
+    for q in courts:
+        ds = [d.isoformat() for d in date_range(start, end) if (q, d) not in got]
+        if ds:
+            missing[q] = ds
+    return missing
 
+def render_result(result: dict) -> str:
+    """HTML do resultado de `scrape_rows` (tabela larga + log), ou o diagnóstico."""
+    if result.get("diag") is not None:
+        return result["diag"]
+    with span("pivot"):
+        # sem a lista de recursos (jobs antigos), as colunas vêm dos dados e dos dias que faltaram
+        courts = result.get("courts") or sorted({*result["rows"]["quadra"].dropna(), *(result.get("missing") or {})},
+                                                key=natural_key)
+        wide = build_wide(result["rows"], courts)
+    with span("render"):
+        html = save_html_from_wide_to_string(wide, result.get("missing"), result.get("partial"))
+    html += "<details style='margin:16px 0;'><summary>Log de execução</summary><pre>"
+    html += "\n".join(result.get("log") or [])
+    html += "</pre></details>"
+    return html
 
+def run_scraping(username: str, password: str, start_date: date = None, end_date: date = None,
+                 engine: str = SCRAPE_ENGINE, fresh_since: float = None, on_event=None,
+                 resources=None) -> str:
+    """Coleta a disponibilidade e devolve o HTML do resultado (ver `scrape_rows`)."""
+    result = scrape_rows(username, password, start_date, end_date, engine=engine,
+                         fresh_since=fresh_since, on_event=on_event, resources=resources)
+    if on_event and result["diag"] is None:
+        on_event({"type": "progress", "msg": "Montando tabela final…"})
+    return render_result(result)
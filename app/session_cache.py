@@ -0,0 +1,77 @@
+import os, json, time, hmac, hashlib, threading
+from cryptography.fernet import Fernet, InvalidToken
+
+# Tempo de vida dos cookies de sessão em cache (segundos). 0 desliga o cache.
+SESSION_CACHE_TTL = int(os.getenv("SESSION_CACHE_TTL", "900"))
+# Por quanto tempo (s) um login confirmado no portal libera o atalho pelo cache de slots para a conta
+LOGIN_PROOF_TTL = int(os.getenv("LOGIN_PROOF_TTL", "900"))
+
+# Sem chave configurada, gera uma por processo (cache some no restart, o que é ok)
+_KEY = os.getenv("SESSION_CACHE_KEY") or Fernet.generate_key().decode()
+_FERNET = Fernet(_KEY)
+
+_CACHE = {}   # chave da conta -> (expira_em, token cifrado)
+_VERIFIED = {}   # chave da conta -> instante do último login confirmado no portal
+_LOCK = threading.Lock()
+
+def encrypt(payload) -> bytes:
+    return _FERNET.encrypt(json.dumps(payload).encode("utf-8"))
+
+def decrypt(token: bytes):
+    return json.loads(_FERNET.decrypt(token).decode("utf-8"))
+
+def account_key(username: str, password: str) -> str:
+    """HMAC de login+senha: senha trocada não reaproveita sessão antiga e nada fica em claro."""
+    msg = f"{username}\0{password}".encode("utf-8")
+    return hmac.new(_KEY.encode("utf-8"), msg, hashlib.sha256).hexdigest()
+
+def get(username: str, password: str):
+    """Retorna os cookies em cache da conta, ou None se ausentes/expirados."""
+    if SESSION_CACHE_TTL <= 0:
+        return None
+    key = account_key(username, password)
+    with _LOCK:
+        item = _CACHE.get(key)
+        if not item:
+            return None
+        expires_at, token = item
+        if expires_at < time.time():
+            _CACHE.pop(key, None)
+            return None
+    try:
+        return decrypt(token)
+    except InvalidToken:
+        invalidate(username, password)
+        return None
+
+def put(username: str, password: str, cookies: list):
+    if SESSION_CACHE_TTL <= 0 or not cookies:
+        return
+    token = encrypt(cookies)
+    now = time.time()
+    with _LOCK:
+        for k in [k for k, (exp, _) in _CACHE.items() if exp < now]:
+            del _CACHE[k]
+        _CACHE[account_key(username, password)] = (now + SESSION_CACHE_TTL, token)
+
+def invalidate(username: str, password: str):
+    with _LOCK:
+        _CACHE.pop(account_key(username, password), None)
+        _VERIFIED.pop(account_key(username, password), None)
+
+def mark_verified(username: str, password: str):
+    """Registra que o portal aceitou este login/senha agora."""
+    now = time.time()
+    with _LOCK:
+        for k in [k for k, t in _VERIFIED.items() if now - t > LOGIN_PROOF_TTL]:
+            del _VERIFIED[k]
+        _VERIFIED[account_key(username, password)] = now
+
+def verified(username: str, password: str) -> bool:
+    """True se a conta tem sessão em cache ou login confirmado há menos de LOGIN_PROOF_TTL: só
+    assim o app pode responder com linhas do cache de slots sem passar pelo portal."""
+    if get(username, password) is not None:
+        return True
+    with _LOCK:
+        t = _VERIFIED.get(account_key(username, password))
+    return t is not None and time.time() - t <= LOGIN_PROOF_TTL
@@ -0,0 +1,86 @@
+import os, time, threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+# TTL (s) das linhas de um dia; hoje/amanhã mudam mais, então expiram antes
+SLOT_CACHE_TTL = int(os.getenv("SLOT_CACHE_TTL", "600"))
+SLOT_CACHE_TTL_NEAR = int(os.getenv("SLOT_CACHE_TTL_NEAR", "120"))
+# Limite aproximado de memória do cache (bytes); acima disso sai o menos usado (LRU)
+SLOT_CACHE_MAX_BYTES = int(os.getenv("SLOT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+def _estimate_size(rows: list) -> int:
+    # estimativa grosseira: overhead do dict + strings de cada linha
+    return 200 + sum(240 + len(str(r.get("hora", ""))) + len(str(r.get("status", ""))) for r in rows)
+
+class SlotCache:
+    """Cache das linhas de `parse_period_table` por (quadra, dia), com TTL e LRU limitado por memória."""
+
+    def __init__(self, ttl: int = SLOT_CACHE_TTL, ttl_near: int = SLOT_CACHE_TTL_NEAR,
+                 max_bytes: int = SLOT_CACHE_MAX_BYTES, clock=time.time):
+        self.ttl, self.ttl_near, self.max_bytes = ttl, ttl_near, max_bytes
+        self.clock = clock           # relógio (s), trocável nos testes
+        self._data = OrderedDict()   # (quadra, dia) -> (buscado_em, linhas, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def ttl_for(self, day: date) -> int:
+        return self.ttl_near if (day - date.today()).days <= 1 else self.ttl
+
+    def _fresh(self, day: date, fetched_at: float, fresh_since: float = None) -> bool:
+        if fresh_since is not None and fetched_at >= fresh_since:
+            return True
+        return self.clock() - fetched_at < self.ttl_for(day)
+
+    def get(self, quadra: str, day: date, fresh_since: float = None, count: bool = True):
+        """Linhas do dia (lista de dicts, possivelmente vazia) ou None se ausente/velho.
+        `fresh_since` aceita qualquer coleta feita a partir desse instante, mesmo fora do TTL."""
+        key = (quadra, day)
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or not self._fresh(day, item[0], fresh_since):
+                self.misses += count
+                return None
+            self._data.move_to_end(key)
+            self.hits += count
+            return item[1]
+
+    def put(self, quadra: str, day: date, rows: list):
+        key = (quadra, day)
+        size = _estimate_size(rows)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self.bytes -= old[2]
+            self._data[key] = (self.clock(), list(rows), size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._data) > 1:
+                _, (_, _, sz) = self._data.popitem(last=False)
+                self.bytes -= sz
+                self.evictions += 1
+
+    def lookup_range(self, quadra: str, start: date, end: date, fresh_since: float = None,
+                     count: bool = True):
+        """Separa o intervalo em ({dia: linhas} vindos do cache, [dias faltando ou velhos])."""
+        cached, missing = {}, []
+        d = start
+        while d <= end:
+            rows = self.get(quadra, d, fresh_since=fresh_since, count=count)
+            if rows is None:
+                missing.append(d)
+            else:
+                cached[d] = rows
+            d += timedelta(days=1)
+        return cached, missing
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+CACHE = SlotCache()
@@ -0,0 +1,94 @@
+import re
+import pandas as pd
+from typing import List
+
+DIAS_SEMANA = ["segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo"]
+
+def natural_key(nome: str):
+    """Chave de ordenação que respeita números no nome ("Quadra 2" antes de "Quadra 10")."""
+    return [int(p) if p.isdigit() else p.lower() for p in re.split(r"(\d+)", str(nome))]
+
+def normalize_rows(full: pd.DataFrame) -> pd.DataFrame:
+    """Tipos canônicos do formato longo data/quadra/hora/status."""
+    full = full[["data", "quadra", "hora", "status"]].copy()
+    full["data"] = pd.to_datetime(full["data"])
+    full["hora"] = full["hora"].fillna("").astype(str).str.strip()
+    full["status"] = full["status"].astype(str).str.strip()
+    return full
+
+def expand_integral(full: pd.DataFrame):
+    """Dias/quadras com 'Integral' indisponível viram todas as horas do catálogo indisponíveis.
+    Retorna (linhas expandidas, datas bloqueadas)."""
+    hora_l = full["hora"].str.lower()
+    is_integral = hora_l.eq("integral")
+    blocked = (full.loc[is_integral & full["status"].str.contains("indispon", case=False, na=False),
+                        ["data", "quadra"]]
+               .drop_duplicates())
+    if blocked.empty:
+        return full, blocked["data"]
+
+    catalogo = pd.DataFrame({"hora": full.loc[full["hora"].ne("") & ~is_integral, "hora"].unique()})
+    # anti-join: descarta tudo do par (data, quadra) bloqueado...
+    keep = ~pd.MultiIndex.from_frame(full[["data", "quadra"]]).isin(pd.MultiIndex.from_frame(blocked))
+    # ...e recoloca o catálogo de horas como indisponível
+    novas = blocked.merge(catalogo, how="cross").assign(status="indisponível")
+    return pd.concat([full[keep], novas], ignore_index=True), blocked["data"].drop_duplicates()
+
+def build_wide(full: pd.DataFrame, courts: List[str] = None) -> pd.DataFrame:
+    """Formato longo (data, quadra, hora, status) -> tabela larga Dia/DiaSemana/Hora/<quadra...>.
+    As colunas seguem `courts` (recursos pedidos, mesmo os sem linhas) e depois os demais recursos
+    presentes nos dados, em ordem natural.
+
+    Ordena por data e hora reais; linhas sem hora válida ("", "Integral") e o cabeçalho
+    dos dias bloqueados vêm antes das horas do dia."""
+    full, blocked_days = expand_integral(normalize_rows(full))
+
+    courts = list(courts or [])
+    courts += sorted(set(full["quadra"].dropna().unique()) - set(courts), key=natural_key)
+
+    full = full.drop_duplicates(["data", "hora", "quadra"], keep="first")
+    full["quadra"] = pd.Categorical(full["quadra"], categories=courts)
+    wide = (full.set_index(["data", "hora", "quadra"])["status"]
+                .unstack("quadra")
+                .reindex(columns=courts))
+    wide.columns = list(courts)
+    wide = wide.astype(object).where(wide.notna(), None).reset_index()
+    wide["_hdr"] = 0
+
+    if len(blocked_days):
+        hdr = pd.DataFrame({"data": blocked_days.to_numpy(), "hora": "Hora", "_hdr": 1})
+        for c in courts:
+            hdr[c] = c
+        wide = pd.concat([wide, hdr], ignore_index=True)
+
+    # chaves ordinais: minutos da hora (-1 = sem hora válida), calculadas só sobre os valores únicos
+    horas = pd.Series(wide["hora"].unique())
+    minutos = pd.to_datetime(horas, format="%H:%M", errors="coerce")
+    minutos = (minutos.dt.hour * 60 + minutos.dt.minute).fillna(-1).astype(int)
+    wide["_t"] = wide["hora"].map(dict(zip(horas, minutos)))
+    wide = wide.sort_values(["data", "_t", "_hdr", "hora"], kind="stable")
+
+    dias = pd.Series(wide["data"].unique())
+    wide["Dia"] = wide["data"].map(dict(zip(dias, dias.dt.strftime("%d/%m/%Y"))))
+    wide["DiaSemana"] = pd.Categorical.from_codes(wide["data"].dt.dayofweek, DIAS_SEMANA).astype(object)
+    wide.loc[wide["_hdr"].eq(1), "DiaSemana"] = "DiaSemana"
+
+    wide = wide.rename(columns={"hora": "Hora"})
+    return wide[["Dia", "DiaSemana", "Hora"] + courts].reset_index(drop=True)
+
+def tidy_rows(full: pd.DataFrame) -> pd.DataFrame:
+    """Formato longo para exportação: 'Integral' indisponível já expandido, sem linhas sem hora,
+    ordenado por data, quadra (ordem natural) e hora real, e com a coluna dia_semana."""
+    full, _ = expand_integral(normalize_rows(full))
+    full = full[full["hora"].ne("")].drop_duplicates(["data", "quadra", "hora"], keep="first")
+    horas = pd.Series(full["hora"].unique())
+    minutos = pd.to_datetime(horas, format="%H:%M", errors="coerce")
+    minutos = (minutos.dt.hour * 60 + minutos.dt.minute).fillna(-1).astype(int)
+    quadras = sorted(full["quadra"].unique(), key=natural_key)
+    full = (full.assign(_t=full["hora"].map(dict(zip(horas, minutos))),
+                        _q=full["quadra"].map({q: i for i, q in enumerate(quadras)}))
+                .sort_values(["data", "_q", "_t", "hora"], kind="stable")
+                .drop(columns=["_t", "_q"])
+                .reset_index(drop=True))
+    full["dia_semana"] = pd.Categorical.from_codes(full["data"].dt.dayofweek, DIAS_SEMANA).astype(object)
+    return full[["data", "dia_semana", "quadra", "hora", "status"]]
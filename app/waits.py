@@ -0,0 +1,105 @@
+import os, time, threading
+from contextvars import ContextVar
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, JavascriptException
+
+# Timeouts (s) de cada tipo de espera
+WAIT_TABLE_TIMEOUT = float(os.getenv("WAIT_TABLE_TIMEOUT", "20"))     # tabela de períodos atualizar
+WAIT_MONTH_TIMEOUT = float(os.getenv("WAIT_MONTH_TIMEOUT", "10"))     # cabeçalho do calendário trocar de mês
+WAIT_WINDOW_TIMEOUT = float(os.getenv("WAIT_WINDOW_TIMEOUT", "0.5"))  # janela nova aparecer após um clique
+WAIT_SETTLE_TIMEOUT = float(os.getenv("WAIT_SETTLE_TIMEOUT", "5"))    # DOM parar de mudar após navegação
+WAIT_SETTLE_QUIET_MS = int(os.getenv("WAIT_SETTLE_QUIET_MS", "150"))  # silêncio que conta como "parou"
+
+# Espera no navegador até o alvo mudar (MutationObserver), sem polling do lado do Python.
+# args: seletor, propriedade lida (innerHTML/textContent), valor anterior (null = só existir), timeout ms
+_CHANGE_JS = """
+var sel = arguments[0], prop = arguments[1], prev = arguments[2], ms = arguments[3];
+var done = arguments[arguments.length - 1];
+function changed() {
+  var el = document.querySelector(sel);
+  if (!el) return false;
+  var cur = el[prop];
+  return prev === null ? true : (cur && cur !== prev);
+}
+if (changed()) return done(true);
+var timer, obs = new MutationObserver(function() {
+  if (changed()) { obs.disconnect(); clearTimeout(timer); done(true); }
+});
+obs.observe(document, {childList: true, subtree: true, characterData: true, attributes: true});
+timer = setTimeout(function() { obs.disconnect(); done(changed()); }, ms);
+"""
+
+# Resolve quando o DOM fica `quiet` ms sem mutações (ou no timeout).
+_SETTLE_JS = """
+var quiet = arguments[0], ms = arguments[1], done = arguments[arguments.length - 1];
+var finish, idle, obs;
+function end(ok) { obs.disconnect(); clearTimeout(idle); clearTimeout(finish); done(ok); }
+obs = new MutationObserver(function() { clearTimeout(idle); idle = setTimeout(function(){ end(true); }, quiet); });
+obs.observe(document, {childList: true, subtree: true, characterData: true, attributes: true});
+idle = setTimeout(function(){ end(true); }, quiet);
+finish = setTimeout(function(){ end(false); }, ms);
+"""
+
+# estatística global por etapa: [esperas, ms total, ms máx, timeouts]
+WAIT_STATS = {}
+_STATS_LOCK = threading.Lock()
+# estatística do job corrente (um dict como WAIT_STATS), quando alguém ativar
+_JOB_STATS = ContextVar("wait_job_stats", default=None)
+
+def record_wait(step: str, ms: float, ok: bool):
+    for stats in (WAIT_STATS, _JOB_STATS.get()):
+        if stats is None:
+            continue
+        with _STATS_LOCK:
+            s = stats.setdefault(step, [0, 0.0, 0.0, 0])
+            s[0] += 1; s[1] += ms; s[2] = max(s[2], ms); s[3] += (not ok)
+
+def track_job_waits() -> dict:
+    """Começa a acumular as esperas do job corrente (contexto atual) e devolve o dict."""
+    stats = {}
+    _JOB_STATS.set(stats)
+    return stats
+
+def format_stats(stats: dict) -> str:
+    parts = []
+    for step, (n, total, mx, to) in sorted(stats.items()):
+        extra = f", {to} timeout(s)" if to else ""
+        parts.append(f"{step} {n}× média {total/n:.0f} ms (máx {mx:.0f}{extra})")
+    return "; ".join(parts)
+
+def _timed(step: str, fn):
+    """Mede a espera `fn`; timeout (ou a página trocando no meio da espera) vira False. Sessão morta
+    ou navegador derrubado (cancelamento) sobem, para o job parar em vez de seguir esperando."""
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        ok = bool(fn())
+        return ok
+    except (TimeoutException, JavascriptException):
+        return False
+    finally:
+        record_wait(step, (time.perf_counter() - t0) * 1000, ok)
+
+def wait_for_change(driver, selector: str, prev=None, prop: str = "innerHTML",
+                    timeout: float = WAIT_TABLE_TIMEOUT, step: str = "mudança") -> bool:
+    """Espera `selector` existir (prev=None) ou o valor de `prop` ficar diferente de `prev`."""
+    return _timed(step, lambda: driver.execute_async_script(
+        _CHANGE_JS, selector, prop, prev, int(timeout * 1000)))
+
+def wait_dom_settled(driver, timeout: float = WAIT_SETTLE_TIMEOUT,
+                     quiet_ms: int = WAIT_SETTLE_QUIET_MS, step: str = "dom") -> bool:
+    """Espera o DOM do frame atual ficar `quiet_ms` sem mutações (substitui sleeps após navegação)."""
+    return _timed(step, lambda: driver.execute_async_script(_SETTLE_JS, quiet_ms, int(timeout * 1000)))
+
+def wait_new_window(driver, known: set, timeout: float = WAIT_WINDOW_TIMEOUT, step: str = "janela"):
+    """Handle de uma janela que não está em `known`, assim que aparecer; None no timeout."""
+    found = []
+
+    def _poll(d):
+        novas = [h for h in d.window_handles if h not in known]
+        if novas:
+            found.append(novas[0])
+        return bool(novas)
+
+    _timed(step, lambda: WebDriverWait(driver, timeout, poll_frequency=0.05).until(_poll))
+    return found[0] if found else None
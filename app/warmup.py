@@ -0,0 +1,59 @@
+import os, time, threading
+
+# Aquecimento na subida (opcional): importa pandas/selenium/scraper, resolve o chromedriver e lança
+# um Chrome para o pool, em segundo plano; /health/ready só responde 200 quando ele termina
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "0") == "1"
+
+class Warmup:
+    """Etapas do aquecimento com o tempo de cada uma. Sem aquecimento ligado, o processo já nasce pronto."""
+
+    def __init__(self):
+        self.state = "desligado"    # "desligado" | "rodando" | "pronto" | "falhou"
+        self.steps = {}             # etapa -> ms
+        self.error = None
+        self.started_at = None
+        self.done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("desligado", "pronto")
+
+    def _step(self, name: str, fn):
+        t0 = time.perf_counter()
+        fn()
+        self.steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+    def run(self, launch: bool = True):
+        """Roda as etapas (bloqueia). `launch=False` só importa (ex.: web no modo worker, sem Chrome)."""
+        self.state, self.started_at = "rodando", time.time()
+        try:
+            self._step("imports", _import_heavy)
+            if launch:
+                from app.driver_pool import get_pool, resolve_chrome_paths
+                self._step("chromedriver", resolve_chrome_paths)
+                self._step("chrome", lambda: get_pool().prewarm(1))
+            self.state = "pronto"
+        except Exception as e:
+            self.state, self.error = "falhou", str(e)
+        finally:
+            self.done.set()
+
+    def start(self, launch: bool = True):
+        self.state = "rodando"
+        threading.Thread(target=self.run, args=(launch,), name="warmup", daemon=True).start()
+        return self
+
+    def stats(self) -> dict:
+        return {"ready": self.ready, "state": self.state, "steps_ms": dict(self.steps), "error": self.error}
+
+def _import_heavy():
+    # o que o primeiro job importaria: pandas, selenium e o scraper inteiro
+    import app.jobs, app.results, app.scraper
+
+WARMUP = Warmup()
+
+def start_warmup(launch: bool = True):
+    """Liga o aquecimento se STARTUP_WARMUP=1."""
+    if STARTUP_WARMUP and WARMUP.state == "desligado":
+        WARMUP.start(launch)
+    return WARMUP
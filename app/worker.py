@@ -0,0 +1,90 @@
+"""Processo worker: consome a fila do job store e roda as coletas.
+
+Uso (web com JOB_RUNNER=worker; web e workers com o mesmo JOB_STORE e a mesma SESSION_CACHE_KEY):
+    python -m app.worker
+"""
+import os, time, logging, threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography.fernet import InvalidToken
+from app import jobstore, session_cache, prefetch, metrics, warmup
+from app.driver_pool import get_pool
+from app.jobs import execute_job
+from app.scheduler import SCRAPE_WORKERS
+
+# Porta do /metrics do worker (0 desliga); o /metrics do web não enxerga as coletas feitas aqui
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+log = logging.getLogger(__name__)
+
+def run_one(store, timeout: float = 5) -> bool:
+    """Pega um job da fila e roda. False se a fila ficou vazia até o timeout."""
+    item = store.dequeue(timeout)
+    if item is None:
+        return False
+    job_id, payload = item
+    try:
+        cred = session_cache.decrypt(payload["cred"].encode("ascii"))
+    except (InvalidToken, KeyError, ValueError):
+        store.finish(job_id, status="error", html=None,
+                     error="Credenciais ilegíveis no worker (SESSION_CACHE_KEY diferente da do web?).")
+        return True
+    execute_job(store, job_id, cred["username"], cred["password"],
+                date.fromisoformat(payload["start"]), date.fromisoformat(payload["end"]), payload.get("engine"),
+                payload.get("resources"))
+    return True
+
+def _loop(store):
+    while True:
+        try:
+            run_one(store)
+        except Exception as e:
+            # job store fora do ar (ex.: redis reiniciando): espera e tenta de novo
+            log.exception("falha ao consumir a fila: %s", e)
+            time.sleep(5)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    # mesmo destino do web (uvicorn): stderr, com nível e horário
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if jobstore.JOB_STORE == "memory":
+        raise SystemExit("O worker precisa de JOB_STORE=sqlite ou redis (compartilhado com o web).")
+    if not os.getenv("SESSION_CACHE_KEY"):
+        raise SystemExit("Defina SESSION_CACHE_KEY igual à do web: as credenciais vão cifradas na fila.")
+    store = jobstore.get_store()
+    if os.getenv("DRIVER_POOL_PREWARM", "0") == "1":
+        threading.Thread(target=get_pool().prewarm, daemon=True).start()
+    warmup.start_warmup()
+    prefetch.start_prefetcher()
+    if WORKER_METRICS_PORT:
+        server = ThreadingHTTPServer(("0.0.0.0", WORKER_METRICS_PORT), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="worker-metrics", daemon=True).start()
+
+    n = max(1, SCRAPE_WORKERS)
+    for i in range(n):
+        threading.Thread(target=_loop, args=(store,), name=f"job-worker-{i}", daemon=True).start()
+    log.info("%d coletas simultâneas, job store %s", n, jobstore.JOB_STORE)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        get_pool().close()
+
+if __name__ == "__main__":
+    main()
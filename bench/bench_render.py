@@ -0,0 +1,86 @@
+"""Compara o renderer enxuto com o antigo caminho via pandas Styler (tempo e tamanho do HTML).
+
+Uso (na raiz do repositório):  python -m bench.bench_render
+"""
+import gzip, random, time
+from datetime import date, timedelta
+import pandas as pd
+from app.scraper import save_html_from_wide_to_string
+
+DIAS_SEMANA = ["segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo"]
+HORAS = [f"{h:02d}:00" for h in range(6, 23)]
+
+def make_wide(days: int, courts: int = 3, seed: int = 7) -> pd.DataFrame:
+    """Tabela larga sintética no formato de `build_wide` (com alguns dias bloqueados por 'Integral')."""
+    rnd = random.Random(seed)
+    quad = [f"Quadra {i}" for i in range(1, courts + 1)]
+    rows = []
+    d0 = date(2025, 1, 6)
+    for n in range(days):
+        d = d0 + timedelta(days=n)
+        dia, sem = d.strftime("%d/%m/%Y"), DIAS_SEMANA[d.weekday()]
+        if n % 9 == 4:
+            rows.append({"Dia": dia, "DiaSemana": "DiaSemana", "Hora": "Hora", **{q: q for q in quad}})
+        for h in HORAS:
+            rows.append({"Dia": dia, "DiaSemana": sem, "Hora": h,
+                         **{q: rnd.choice(["disponível", "indisponível", "indisponível", None]) for q in quad}})
+    return pd.DataFrame(rows, columns=["Dia", "DiaSemana", "Hora"] + quad)
+
+def save_html_styler(wide: pd.DataFrame) -> str:
+    """Renderer antigo (Styler + CSS inline por célula), mantido aqui só para comparação."""
+    df = wide.copy()
+    quad_cols = [c for c in df.columns if c.lower().startswith("quadra ")]
+    mask_header = df["Hora"].fillna("").eq("")
+    df.loc[mask_header, "Hora"] = "Hora"
+    for col in quad_cols:
+        df.loc[mask_header, col] = col
+    df.loc[mask_header, "DiaSemana"] = ""
+    for col in quad_cols:
+        s = df[col]
+        mask_empty_str = s.fillna("").astype(str).str.strip().eq("")
+        df.loc[~mask_header & mask_empty_str, col] = "indisponível"
+
+    def _status_to_css(val) -> str:
+        if val is None:
+            return ""
+        s = str(val).strip().lower()
+        if s == "nan":
+            return ""
+        if "indispon" in s:
+            return "background:#ffe4b5;border:1px solid #f0c88b;text-align:center;font-weight:600;"
+        if "dispon" in s:
+            return "background:#c6efce;border:1px solid #b7ddb9;font-weight:600;text-align:center;"
+        return "text-align:center;"
+
+    def _row_header_style(row):
+        if str(row.get("Hora", "")).strip() == "Hora":
+            return ["font-weight:700;background:#e0e0e0;border-bottom:2px solid #bbb"] * len(row)
+        return [""] * len(row)
+
+    sty = (df.style
+           .map(_status_to_css, subset=quad_cols)
+           .set_properties(**{"white-space": "nowrap", "text-align": "center"},
+                           subset=quad_cols + ["Hora", "Dia", "DiaSemana"])
+           .apply(_row_header_style, axis=1)
+           .hide(axis="index"))
+    return "<!doctype html><html><head><meta charset='utf-8'></head><body>" + sty.to_html() + "</body></html>"
+
+def _time(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def main():
+    print(f"{'dias':>5} {'renderer':<8} {'ms':>9} {'bytes':>10} {'gzip':>9}")
+    for days in (15, 45):
+        wide = make_wide(days)
+        for nome, fn in (("styler", save_html_styler), ("enxuto", save_html_from_wide_to_string)):
+            ms = _time(fn, wide, repeat=5)
+            html = fn(wide).encode("utf-8")
+            print(f"{days:>5} {nome:<8} {ms:>9.1f} {len(html):>10} {len(gzip.compress(html)):>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark ponta a ponta do scraper contra o portal falso (bench/mock_portal.py).
+
+Mede `run_scraping` completo (latência por job e por dia, por motor e tamanho de período),
+funções isoladas (`list_resources`, `parse_period_table`, `save_html_from_wide_to_string`)
+e o pico de memória (RSS do Python + Chromes filhos). Precisa de Chrome/chromedriver locais.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_scrape
+    python -m bench.bench_scrape --days 15 45 --engines selenium http --latency-ms 80 --rows 17
+"""
+import argparse, os, resource, threading, time
+from datetime import date, timedelta
+from bench.mock_portal import MockPortal, BASE
+
+COURTS = 3
+USER, PASSWORD = "bench", "bench"
+
+def _tree_rss_kb(root: int) -> int:
+    """RSS (kB) de `root` e descendentes, lido do /proc (Linux)."""
+    parents, rss = {}, {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parents[int(pid)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{pid}/statm") as f:
+                rss[int(pid)] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+        except (OSError, ValueError, IndexError):
+            continue
+    tree, frontier = {root}, [root]
+    while frontier:
+        p = frontier.pop()
+        for c, pp in parents.items():
+            if pp == p and c not in tree:
+                tree.add(c)
+                frontier.append(c)
+    return sum(rss.get(p, 0) for p in tree)
+
+class PeakRSS:
+    """Amostra o RSS da árvore de processos em segundo plano e guarda o pico."""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval, self.peak_kb = interval, 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak_kb = max(self.peak_kb, _tree_rss_kb(os.getpid()))
+            except OSError:
+                # sem /proc: fica só o pico do próprio Python
+                self.peak_kb = max(self.peak_kb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def bench_jobs(days_list, engines):
+    from app import scraper, slot_cache, session_cache, metrics
+    print(f"{'motor':<9} {'dias':>5} {'job s':>8} {'ms/dia':>8} {'linhas':>7}")
+    for engine in engines:
+        for days in days_list:
+            # cada rodada começa fria: sem dias em cache e com login completo
+            slot_cache.CACHE.clear()
+            session_cache.invalidate(USER, PASSWORD)
+            spans = metrics.start_trace()
+            start = date.today()
+            t0 = time.perf_counter()
+            html = scraper.run_scraping(USER, PASSWORD, start, start + timedelta(days=days - 1), engine=engine)
+            job_s = time.perf_counter() - t0
+            if "Nenhum dado coletado" in html or "Login não confirmou" in html:
+                print(f"{engine:<9} {days:>5} falhou (veja o log no HTML)")
+                continue
+            coleta = sum(s["ms"] for s in spans
+                         if s["name"] in ("click_day_in_calendar", "parse_period_table", "fetch_periodos"))
+            linhas = html.count("<tr")
+            print(f"{engine:<9} {days:>5} {job_s:>8.2f} {coleta / (days * COURTS):>8.1f} {linhas:>7}")
+
+def bench_functions(portal: MockPortal, repeat: int = 30):
+    from selenium.webdriver.support.ui import WebDriverWait
+    from app import scraper
+    from app.driver_pool import get_pool
+    from bench.bench_render import make_wide
+
+    with get_pool().session() as driver:
+        wait = WebDriverWait(driver, 25)
+        scraper.do_login(wait, driver, USER, PASSWORD)
+        driver.get(portal.base_url + BASE + "/aplic/listaRecursos.asp")
+        ms = _best(lambda: scraper.list_resources(driver), repeat)
+        print(f"list_resources              {ms:>8.2f} ms")
+        driver.get(portal.base_url + BASE + "/aplic/reserva.asp?rec=101")
+        scraper.wait_for_change(driver, "#tabelaDePeriodos tbody tr")
+        ms = _best(lambda: scraper.parse_period_table(wait, driver, date.today(), "Quadra 1"), repeat)
+        print(f"parse_period_table          {ms:>8.2f} ms")
+    for days in (15, 45):
+        wide = make_wide(days)
+        ms = _best(lambda: scraper.save_html_from_wide_to_string(wide), repeat)
+        print(f"save_html ({days} dias)        {ms:>8.2f} ms")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do scraper contra o portal falso.")
+    ap.add_argument("--days", type=int, nargs="+", default=[15, 45])
+    ap.add_argument("--engines", nargs="+", default=["selenium", "http"])
+    ap.add_argument("--latency-ms", type=int, default=50)
+    ap.add_argument("--rows", type=int, default=17)
+    ap.add_argument("--datepicker", choices=("inline", "jquery"), default="inline",
+                    help="jquery: bootstrap-datepicker de verdade (exercita o salto via setDate)")
+    args = ap.parse_args()
+
+    portal = MockPortal(latency_ms=args.latency_ms, rows=args.rows, datepicker=args.datepicker).start()
+    # as URLs do portal são lidas no import do app; por isso o import vem depois
+    os.environ.update(portal.env())
+    from app.driver_pool import get_pool
+    print(f"portal falso em {portal.base_url} (latência {args.latency_ms} ms, {args.rows} linhas/dia, datepicker {args.datepicker})")
+    try:
+        with PeakRSS() as rss:
+            get_pool().prewarm(1)
+            bench_jobs(args.days, args.engines)
+            bench_functions(portal)
+        print(f"pico de RSS (Python + Chromes): {rss.peak_kb / 1024:.0f} MB")
+        print(f"requisições ao portal: {portal.requests}")
+    finally:
+        get_pool().close()
+        portal.stop()
+
+if __name__ == "__main__":
+    main()
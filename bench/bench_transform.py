@@ -0,0 +1,117 @@
+"""Micro-benchmark do pós-processamento (expansão de 'Integral' + pivot) em 15/45/180 dias × N quadras.
+
+Compara `app.transform.build_wide` com a implementação antiga e confere que o resultado é o mesmo
+(a antiga só ordena por data real quando há dias bloqueados; aqui as duas são reordenadas igual).
+
+Uso (na raiz do repositório):  python -m bench.bench_transform
+"""
+import random, time
+from datetime import date, timedelta
+import pandas as pd
+from app.transform import build_wide
+
+HORAS = [f"{h:02d}:00" for h in range(6, 23)]
+
+def make_rows(days: int, courts: int, seed: int = 11) -> pd.DataFrame:
+    """Linhas longas sintéticas como as de `parse_period_table`, com ~1 dia em 6 bloqueado por 'Integral'."""
+    rnd = random.Random(seed)
+    rows = []
+    d0 = date(2025, 1, 6)
+    for q in range(1, courts + 1):
+        for n in range(days):
+            d = d0 + timedelta(days=n)
+            if rnd.random() < 1 / 6:
+                rows.append({"data": d, "quadra": f"Quadra {q}", "hora": "Integral", "status": "indisponível"})
+                continue
+            for h in HORAS:
+                rows.append({"data": d, "quadra": f"Quadra {q}", "hora": h,
+                             "status": rnd.choice(["disponível", "indisponível"])})
+    return pd.DataFrame(rows)
+
+def build_wide_legacy(dfs) -> pd.DataFrame:
+    """Pós-processamento antigo de `run_scraping` (iterrows + pivot_table), só para comparação."""
+    full = pd.concat(dfs, ignore_index=True)
+    full["data"] = pd.to_datetime(full["data"])
+    full["hora"] = full["hora"].fillna("").astype(str).str.strip()
+    full["status"] = full["status"].astype(str).str.strip()
+
+    horas_catalogo = (
+        full.loc[full["hora"].str.len().gt(0) & ~full["hora"].str.lower().eq("integral"), "hora"]
+            .dropna().unique().tolist()
+    )
+
+    mask_integral = full["hora"].str.lower().eq("integral")
+    mask_integral_indisp = mask_integral & full["status"].str.contains("indispon", case=False, na=False)
+
+    headers = []
+    if mask_integral_indisp.any():
+        pairs = full.loc[mask_integral_indisp, ["data", "quadra"]].drop_duplicates()
+        for _, r in pairs.iterrows():
+            full = full[~(full["data"].eq(r["data"]) & full["quadra"].eq(r["quadra"]))]
+        novas = []
+        for _, r in pairs.iterrows():
+            for h in horas_catalogo:
+                novas.append({"data": r["data"], "quadra": r["quadra"], "hora": h, "status": "indisponível"})
+            headers.append(r["data"])
+        full = pd.concat([full, pd.DataFrame(novas)], ignore_index=True)
+
+    dias_semana = ["segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo"]
+    full["Dia"] = full["data"].dt.strftime("%d/%m/%Y")
+    full["DiaSemana"] = full["data"].dt.dayofweek.map(lambda i: dias_semana[i])
+
+    wide = (
+        full.pivot_table(index=["Dia", "hora", "DiaSemana"],
+                         columns="quadra", values="status", aggfunc="first")
+            .reset_index()
+    )
+
+    if headers:
+        dias_hdr = pd.to_datetime(pd.Series(headers)).dt.strftime("%d/%m/%Y").unique().tolist()
+        add = pd.DataFrame([
+            {"Dia": d, "hora": "Hora", "DiaSemana": "DiaSemana",
+             "Quadra 1": "Quadra 1", "Quadra 2": "Quadra 2", "Quadra 3": "Quadra 3"}
+            for d in dias_hdr
+        ])
+        wide = pd.concat([wide, add], ignore_index=True)
+        wide["_d"] = pd.to_datetime(wide["Dia"], format="%d/%m/%Y", errors="coerce")
+        wide["_t"] = pd.to_datetime(wide["hora"], format="%H:%M", errors="coerce")
+        wide = wide.sort_values(["_d", "_t"], kind="stable", na_position="first").drop(columns=["_d","_t"])
+
+    for i in range(1, 4):
+        col = f"Quadra {i}"
+        if col not in wide.columns:
+            wide[col] = None
+
+    wide = wide.rename(columns={"hora": "Hora"})
+    wide = wide[["Dia", "DiaSemana", "Hora", "Quadra 1", "Quadra 2", "Quadra 3"]]
+    return wide
+
+def _canon(wide: pd.DataFrame) -> pd.DataFrame:
+    w = wide.copy()
+    w["_d"] = pd.to_datetime(w["Dia"], format="%d/%m/%Y")
+    w["_t"] = pd.to_datetime(w["Hora"], format="%H:%M", errors="coerce")
+    w["_h"] = w["Hora"].eq("Hora")
+    w = w.sort_values(["_d", "_t", "_h", "Hora"], na_position="first", kind="stable")
+    return w.drop(columns=["_d", "_t", "_h"]).fillna("").astype(str).reset_index(drop=True)
+
+def _time(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, out
+
+def main():
+    print(f"{'dias':>5} {'quadras':>7} {'linhas':>7} {'antigo ms':>10} {'novo ms':>9} {'igual':>6}")
+    for courts in (3, 6):
+        for days in (15, 45, 180):
+            full = make_rows(days, courts)
+            cols = [f"Quadra {i}" for i in range(1, courts + 1)]
+            t_old, old = _time(lambda: build_wide_legacy([full]))
+            t_new, new = _time(lambda: build_wide(full, courts=cols))
+            same = _canon(old[["Dia", "DiaSemana", "Hora"] + cols]).equals(_canon(new)) if courts == 3 else "-"
+            print(f"{days:>5} {courts:>7} {len(full):>7} {t_old:>10.1f} {t_new:>9.1f} {str(same):>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Portal falso (BBZ + webware) para medir o scraper sem tocar no site real.
+
+Serve o formulário de login (#mem, #pass, #termo, ENTRAR), a lista de recursos num iframe com
+anchors `SelectReserva`, e a página de reserva com um datepicker inline e `#tabelaDePeriodos`
+atualizada por XHR. Latência e quantidade de linhas por dia são configuráveis.
+
+O datepicker padrão é um imitador em JS puro (só cliques; o salto via API cai para eles). Com
+`--datepicker jquery` a página usa jQuery + bootstrap-datepicker de verdade (carregados de
+`DATEPICKER_ASSETS`, por padrão da CDN), como o portal real, e o salto via `setDate` é exercitado.
+
+Tudo fica sob http://127.0.0.1:<porta>; as páginas internas ficam em /servc9/... para que as
+checagens de URL do scraper ("servc" na URL = área logada) funcionem sem alteração.
+
+Uso isolado (imprime as variáveis de ambiente para apontar o app para o mock):
+    python -m bench.mock_portal --port 8765 --latency-ms 80 --rows 17 --datepicker jquery
+"""
+import argparse, random, secrets, threading, time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+LOGIN_PATH = "/area-do-cliente/"
+BASE = "/servc9/bin"
+
+RECURSOS = [(101, "QUADRA DE TENIS 1"), (102, "QUADRA DE TENIS 2"), (103, "QUADRA DE TENIS 3"),
+            (201, "CHURRASQUEIRA 1"), (202, "SALAO DE FESTAS")]
+
+_PAGE = "<!doctype html><html><head><meta charset='utf-8'><title>{title}</title></head><body>{body}</body></html>"
+
+_LOGIN_BODY = f"""
+<h2>Área do cliente</h2>{{erro}}
+<form method="post" action="{BASE}/login.asp">
+  <input id="mem" name="mem" placeholder="Matrícula">
+  <input id="pass" name="pass" type="password" placeholder="Senha">
+  <label><input type="checkbox" id="termo" name="termo" value="1"> Li e aceito os termos</label>
+  <button type="submit">ENTRAR</button>
+</form>
+"""
+
+# jQuery, bootstrap-datepicker e o idioma pt-BR (cabeçalho "Outubro 2026", como no portal)
+DATEPICKER_ASSETS = (
+    "https://cdnjs.cloudflare.com/ajax/libs/jquery/3.7.1/jquery.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/bootstrap-datepicker/1.10.0/js/bootstrap-datepicker.min.js",
+    "https://cdnjs.cloudflare.com/ajax/libs/bootstrap-datepicker/1.10.0/locales/bootstrap-datepicker.pt-BR.min.js",
+)
+
+_CARREGAR_JS = """
+function pad(n) { return (n < 10 ? '0' : '') + n; }
+function dmy(d) { return pad(d.getDate()) + '/' + pad(d.getMonth() + 1) + '/' + d.getFullYear(); }
+function carregar(d) {
+  var xhr = new XMLHttpRequest();
+  xhr.open('GET', 'periodos.asp?rec=' + REC + '&data=' + encodeURIComponent(dmy(d)));
+  xhr.onload = function() { document.querySelector('#tabelaDePeriodos tbody').innerHTML = xhr.responseText; };
+  xhr.send();
+}
+var hoje = new Date(); hoje.setHours(0, 0, 0, 0);
+var limite = new Date(hoje); limite.setDate(limite.getDate() + JANELA);
+"""
+
+# bootstrap-datepicker inline: cliques e `setDate` disparam o mesmo changeDate que recarrega a tabela
+_RESERVA_JQUERY_JS = """
+$('#dp').datepicker({language: 'pt-BR', format: 'dd/mm/yyyy', startDate: hoje, endDate: limite,
+                     todayHighlight: true, defaultViewDate: hoje})
+  .on('changeDate', function(e) { if (e.date) carregar(e.date); });
+$('#dp').datepicker('update', hoje);
+carregar(hoje);
+"""
+
+_RESERVA_JS = """
+var MESES = ['Janeiro','Fevereiro','Março','Abril','Maio','Junho','Julho','Agosto',
+             'Setembro','Outubro','Novembro','Dezembro'];
+var view = new Date(hoje.getFullYear(), hoje.getMonth(), 1), sel = hoje;
+var dp = document.getElementById('dp');
+function render() {
+  var y = view.getFullYear(), m = view.getMonth(), first = new Date(y, m, 1);
+  var h = '<div class="datepicker datepicker-inline"><div class="datepicker-days"><table><thead><tr>'
+        + '<th class="prev">&laquo;</th><th class="datepicker-switch" colspan="5">' + MESES[m] + ' ' + y
+        + '</th><th class="next">&raquo;</th></tr></thead><tbody><tr>';
+  for (var i = 0; i < 42; i++) {
+    var d = new Date(y, m, 1 - first.getDay() + i), cls = 'day';
+    var mm = d.getFullYear() * 12 + d.getMonth(), vm = y * 12 + m;
+    if (mm < vm) cls += ' old'; else if (mm > vm) cls += ' new';
+    if (d < hoje) cls += ' disabled'; else if (d > limite) cls += ' foraPeriodo';
+    if (+d === +sel) cls += ' active';
+    h += '<td class="' + cls + '" data-date="' + dmy(d) + '">' + d.getDate() + '</td>';
+    if (i % 7 === 6 && i < 41) h += '</tr><tr>';
+  }
+  dp.innerHTML = h + '</tr></tbody></table></div></div>';
+}
+dp.addEventListener('click', function(e) {
+  var t = e.target, c = t.classList;
+  if (c.contains('next') || c.contains('prev')) {
+    view = new Date(view.getFullYear(), view.getMonth() + (c.contains('next') ? 1 : -1), 1);
+    render();
+  } else if (c.contains('day') && !c.contains('disabled') && !c.contains('foraPeriodo')) {
+    var p = t.getAttribute('data-date').split('/');
+    sel = new Date(+p[2], +p[1] - 1, +p[0]);
+    view = new Date(sel.getFullYear(), sel.getMonth(), 1);
+    render(); carregar(sel);
+  }
+});
+render(); carregar(sel);
+"""
+
+class MockPortal:
+    """Servidor HTTP do portal falso, rodando numa thread própria."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: int = 50,
+                 rows: int = 17, window_days: int = 60, integral_ratio: float = 0.1, seed: int = 1,
+                 datepicker: str = "inline", assets: tuple = DATEPICKER_ASSETS):
+        if datepicker not in ("inline", "jquery"):
+            raise ValueError(f"datepicker desconhecido: {datepicker}")
+        self.latency_ms, self.rows, self.window_days = latency_ms, rows, window_days
+        self.datepicker, self.assets = datepicker, assets
+        self.integral_ratio, self.seed = integral_ratio, seed
+        self.sessions = set()
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.portal = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Variáveis de ambiente que apontam o app para este mock."""
+        return {"SITE_URL": self.base_url + LOGIN_PATH,
+                "AREA_GERAL": self.base_url + BASE + "/sol/aAreaGeral.asp",
+                "MINHA_UNIDADE_RESERVAS": self.base_url + BASE + "/aplic/cpMinhaUnidadeReservas.asp"}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-portal", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def periodos(self, rec: int, day: date) -> str:
+        """Linhas <tr> de um dia; determinísticas por (recurso, dia, seed)."""
+        rnd = random.Random(f"{self.seed}-{rec}-{day.isoformat()}")
+        attr = f" data-dia='{day.isoformat()}'"
+        if rnd.random() < self.integral_ratio:
+            return (f"<tr{attr}><td class='integral'>Integral</td>"
+                    "<td class='indisponivel'>Indisponível</td><td class='reservar'></td></tr>")
+        out = []
+        for n in range(self.rows):
+            hora = f"{6 + n % 18:02d}:{30 * (n // 18) % 60:02d}"
+            if rnd.random() < 0.5:
+                out.append(f"<tr{attr}><td class='integral'>{hora}</td><td class='disponivel'>Disponível</td>"
+                           "<td class='reservar'><button type='button'>RESERVAR</button></td></tr>")
+            else:
+                out.append(f"<tr{attr}><td class='integral'>{hora}</td>"
+                           "<td class='indisponivel'>Indisponível</td><td class='reservar'></td></tr>")
+        return "".join(out)
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    @property
+    def portal(self) -> MockPortal:
+        return self.server.portal
+
+    def _send(self, status: int, body: str = "", headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _page(self, title: str, body: str, headers: dict = None):
+        self._send(200, _PAGE.format(title=title, body=body), headers)
+
+    def _redirect(self, url: str, headers: dict = None):
+        self._send(302, "", {"Location": url, **(headers or {})})
+
+    def _logged(self) -> bool:
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            k, _, v = part.strip().partition("=")
+            if k == "ASPSESSIONID" and v in self.portal.sessions:
+                return True
+        return False
+
+    def _delay(self):
+        self.portal.requests += 1
+        if self.portal.latency_ms:
+            time.sleep(self.portal.latency_ms / 1000)
+
+    def do_POST(self):
+        self._delay()
+        path = urlsplit(self.path).path
+        if path != BASE + "/login.asp":
+            return self._send(404, "não encontrado")
+        size = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(size).decode("utf-8"))
+        if not form.get("mem") or not form.get("pass") or not form.get("termo"):
+            return self._page("Login", _LOGIN_BODY.format(erro="<p>Preencha os dados e aceite os termos.</p>"))
+        token = secrets.token_hex(8)
+        self.portal.sessions.add(token)
+        self._redirect(BASE + "/sol/aAreaGeral.asp", {"Set-Cookie": f"ASPSESSIONID={token}; Path=/"})
+
+    def do_GET(self):
+        self._delay()
+        parts = urlsplit(self.path)
+        path, qs = parts.path, parse_qs(parts.query)
+        if path in ("/", LOGIN_PATH, LOGIN_PATH.rstrip("/")):
+            return self._page("Login", _LOGIN_BODY.format(erro=""))
+        if not path.startswith(BASE + "/"):
+            return self._send(404, "não encontrado")
+        if not self._logged():
+            return self._redirect(LOGIN_PATH)
+
+        page = path[len(BASE):]
+        if page == "/sol/aAreaGeral.asp":
+            return self._page("Área geral", "<h2>Área geral</h2><a href='../aplic/cpMinhaUnidadeReservas.asp'>Minha unidade</a>")
+        if page == "/aplic/cpMinhaUnidadeReservas.asp":
+            return self._page("Minha unidade", "<h2>Minhas reservas</h2>"
+                              "<a href='javascript:void(0);' onclick=\"location.href='novaReserva.asp'\">Nova Reserva</a>")
+        if page == "/aplic/novaReserva.asp":
+            return self._page("Nova reserva", "<h2>Nova reserva</h2>"
+                              "<iframe id='frmRecursos' src='listaRecursos.asp' width='100%' height='600'></iframe>")
+        if page == "/aplic/listaRecursos.asp":
+            links = "".join(f"<li><a href='javascript:void(0)' onclick=\"SelectReserva({rec},'{nome}')\">{nome}</a></li>"
+                            for rec, nome in RECURSOS)
+            return self._page("Recursos", "<script>function SelectReserva(id, nome)"
+                              "{ location.href = 'reserva.asp?rec=' + id; }</script>"
+                              f"<p>Selecione o recurso para a reserva</p><ul>{links}</ul>")
+        if page == "/aplic/reserva.asp":
+            rec = int((qs.get("rec") or ["0"])[0])
+            nome = dict(RECURSOS).get(rec, "?")
+            js = f"var REC = {rec}, JANELA = {self.portal.window_days};" + _CARREGAR_JS
+            libs = ""
+            if self.portal.datepicker == "jquery":
+                js += _RESERVA_JQUERY_JS
+                libs = "".join(f"<script src='{src}'></script>" for src in self.portal.assets)
+            else:
+                js += _RESERVA_JS
+            return self._page("Reserva", f"<h2>Reserva · {nome}</h2><div id='dp'></div>"
+                              "<table id='tabelaDePeriodos'><thead><tr><th>Horário</th><th>Situação</th>"
+                              f"<th></th></tr></thead><tbody></tbody></table>{libs}<script>{js}</script>")
+        if page == "/aplic/periodos.asp":
+            rec = int((qs.get("rec") or ["0"])[0])
+            day = datetime.strptime((qs.get("data") or [""])[0], "%d/%m/%Y").date()
+            return self._send(200, self.portal.periodos(rec, day))
+        return self._send(404, "não encontrado")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=int, default=50)
+    ap.add_argument("--rows", type=int, default=17)
+    ap.add_argument("--window-days", type=int, default=60)
+    ap.add_argument("--datepicker", choices=("inline", "jquery"), default="inline")
+    args = ap.parse_args()
+    portal = MockPortal(args.host, args.port, args.latency_ms, args.rows, args.window_days,
+                        datepicker=args.datepicker).start()
+    for k, v in portal.env().items():
+        print(f"export {k}={v}")
+    try:
+        portal._thread.join()
+    except KeyboardInterrupt:
+        portal.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import time
+from datetime import date, timedelta
+import pytest
+from fastapi.testclient import TestClient
+import app.main as m
+from app.scheduler import JobScheduler
+
+@pytest.fixture
+def client():
+    return TestClient(m.app)
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """Scheduler e INFLIGHT novos por teste (um worker), no lugar dos globais do app."""
+    s = JobScheduler(workers=1, max_queue=5)
+    monkeypatch.setattr(m, "SCHEDULER", s)
+    monkeypatch.setattr(m, "INFLIGHT", {})
+    return s
+
+@pytest.fixture
+def post_run(client):
+    """POST /run (período de hoje + `dias`) e devolve o id do job."""
+    def post(dias: int = 2, **form):
+        hoje = date.today()
+        data = {"username": "u", "password": "p", "start_date": hoje.isoformat(),
+                "end_date": (hoje + timedelta(days=dias)).isoformat(), **form}
+        r = client.post("/run", data=data, follow_redirects=False)
+        assert r.status_code == 303, r.text
+        return r.headers["location"].rsplit("/", 1)[1]
+    return post
+
+def wait_until(cond, timeout: float = 5):
+    end = time.time() + timeout
+    while not cond():
+        if time.time() > end:
+            raise AssertionError("condição não ocorreu a tempo")
+        time.sleep(0.01)
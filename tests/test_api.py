@@ -0,0 +1,11 @@
+import app.main as m
+
+def test_unknown_engine_has_its_own_error(post_run):
+    job = m.STORE.get(post_run(engine="turbo"))
+    assert job["status"] == "error"
+    assert job["error"].startswith("Modo de coleta desconhecido: turbo")
+    assert "Datas" not in job["error"]
+
+def test_bad_dates_still_report_dates(post_run):
+    job = m.STORE.get(post_run(start_date="2026-10-20", end_date="2026-10-10", engine="turbo"))
+    assert job["error"].startswith("Datas inválidas:")
@@ -0,0 +1,128 @@
+import contextvars
+import pytest
+from selenium.common.exceptions import WebDriverException
+from app import scraper
+from app.breaker import PortalBreaker, CircuitOpen
+from app.budget import start_budget
+
+def open_breaker(b: PortalBreaker, stage: str = "login"):
+    for _ in range(b.threshold):
+        b.failure(stage)
+
+def expire(b: PortalBreaker):
+    # em vez de esperar `open_seconds`, recua o instante em que o circuito abriu
+    b.opened_at -= b.open_seconds + 1
+
+def test_opens_after_threshold_failures_of_one_stage():
+    b = PortalBreaker(threshold=3, window=300, open_seconds=120)
+    b.failure("login")
+    b.failure("lista")
+    b.failure("login")
+    assert b.state == "fechado" and b.admit() is False
+    b.failure("login")
+    assert (b.state, b.stage) == ("aberto", "login")
+    with pytest.raises(CircuitOpen) as e:
+        b.check()
+    assert e.value.stage == "login" and 0 < e.value.retry_after <= 120
+    with pytest.raises(CircuitOpen):
+        b.admit()
+
+def test_failures_outside_the_window_do_not_count():
+    b = PortalBreaker(threshold=2, window=300, open_seconds=120)
+    b.failure("coleta")
+    b._failures["coleta"][0] -= 301
+    b.failure("coleta")
+    assert b.state == "fechado"
+    assert b.stats()["failures"] == {"coleta": 1}
+
+def test_half_open_admits_a_single_probe():
+    b = PortalBreaker(threshold=2, window=300, open_seconds=120)
+    open_breaker(b)
+    expire(b)
+    b.check()                       # check não reserva o teste
+    assert b.admit() is True
+    assert (b.state, b.probing) == ("meio-aberto", True)
+    with pytest.raises(CircuitOpen):
+        b.check()
+    with pytest.raises(CircuitOpen):
+        b.admit()
+
+def test_successful_probe_closes():
+    b = PortalBreaker(threshold=2, window=300, open_seconds=120)
+    open_breaker(b)
+    expire(b)
+    assert b.admit()
+    b.success()
+    assert (b.state, b.stage, b.probing, b.retry_after()) == ("fechado", None, False, 0)
+    assert b.admit() is False
+    # as falhas de antes do teste não contam mais
+    b.failure("login")
+    assert b.state == "fechado"
+
+def test_failed_probe_reopens():
+    b = PortalBreaker(threshold=2, window=300, open_seconds=120)
+    open_breaker(b)
+    expire(b)
+    assert b.admit()
+    b.failure("coleta")
+    assert (b.state, b.stage, b.probing) == ("aberto", "coleta", False)
+    assert b.retry_after() > 0
+    with pytest.raises(CircuitOpen):
+        b.admit()
+
+def test_probe_without_verdict_lets_the_next_one_in():
+    b = PortalBreaker(threshold=2, window=300, open_seconds=120)
+    open_breaker(b)
+    expire(b)
+    assert b.admit()
+    b.end_probe()
+    assert b.state == "meio-aberto"
+    assert b.admit() is True
+
+def test_zero_threshold_disables():
+    b = PortalBreaker(threshold=0, window=300, open_seconds=120)
+    for _ in range(10):
+        b.failure("login")
+    assert b.state == "fechado" and b.admit() is False
+
+@pytest.fixture
+def breaker(monkeypatch):
+    b = PortalBreaker(threshold=1, window=300, open_seconds=120)
+    monkeypatch.setattr(scraper, "BREAKER", b)
+    return b
+
+def test_aborted_job_does_not_trip(breaker):
+    def job():
+        start_budget(0).cancel()
+        scraper._portal_failure("coleta")
+    contextvars.copy_context().run(job)
+    assert breaker.state == "fechado" and breaker.stats()["failures"] == {}
+
+def test_failure_of_a_live_job_trips(breaker):
+    def job():
+        start_budget(0)
+        scraper._portal_failure("coleta")
+    contextvars.copy_context().run(job)
+    assert breaker.state == "aberto"
+
+class LoginPage:
+    def __init__(self, ready="complete", form=True, error=None):
+        self.ready, self.form, self.error = ready, form, error
+
+    def execute_script(self, script):
+        if self.error:
+            raise self.error
+        return self.ready
+
+    def find_elements(self, by, selector):
+        assert "#mem" in selector
+        return [object()] if self.form else []
+
+def test_bad_credentials_are_not_a_portal_failure():
+    # página carregada e formulário de login ainda na tela: usuário/senha errados
+    assert scraper._login_rejected(LoginPage()) is True
+
+@pytest.mark.parametrize("page", [LoginPage(ready="loading"), LoginPage(form=False),
+                                  LoginPage(error=WebDriverException("sessão caiu"))])
+def test_stuck_login_counts_as_portal_failure(page):
+    assert scraper._login_rejected(page) is False
@@ -0,0 +1,61 @@
+import contextvars, time
+from app.budget import Budget, start_budget, should_stop, stop_reason, current_budget
+
+def in_job(fn):
+    """Roda `fn` num contexto próprio, como cada job roda na sua thread."""
+    return contextvars.copy_context().run(fn)
+
+def test_without_budget_nothing_stops():
+    assert in_job(lambda: (current_budget(), should_stop(), stop_reason())) == (None, False, None)
+
+def test_zero_seconds_means_no_deadline():
+    b = Budget(0)
+    assert b.deadline is None
+    assert not b.should_stop()
+
+def test_deadline():
+    b = Budget(60)
+    assert not b.should_stop() and b.reason is None
+    b.deadline = time.time() - 1
+    assert b.should_stop()
+    assert b.reason == "prazo"
+    # cancelar depois do prazo não troca o motivo
+    b.cancel()
+    assert b.reason == "prazo"
+
+def test_cancel_runs_callbacks_once():
+    b = Budget(0)
+    chamadas = []
+    b.on_cancel(lambda: chamadas.append("a"))
+    removida = b.on_cancel(lambda: chamadas.append("b"))
+    b.remove(removida)
+    b.cancel()
+    b.cancel()
+    assert chamadas == ["a"]
+    assert b.should_stop() and b.reason == "cancelado"
+    # registrada depois do cancelamento: roda na hora
+    b.on_cancel(lambda: chamadas.append("c"))
+    assert chamadas == ["a", "c"]
+
+def test_failing_callback_does_not_block_the_others():
+    b = Budget(0)
+    chamadas = []
+    b.on_cancel(lambda: 1 / 0)
+    b.on_cancel(lambda: chamadas.append("ok"))
+    b.cancel()
+    assert chamadas == ["ok"]
+
+def test_module_helpers_follow_the_current_job():
+    def job():
+        budget = start_budget(60)
+        antes = (should_stop(), stop_reason())
+        budget.cancel()
+        return antes, (should_stop(), stop_reason())
+    assert in_job(job) == ((False, None), (True, "cancelado"))
+
+def test_budgets_are_isolated_per_context():
+    def job():
+        start_budget(60).cancel()
+        return should_stop()
+    assert in_job(job) is True
+    assert in_job(should_stop) is False
@@ -0,0 +1,83 @@
+import threading
+from datetime import date, timedelta
+import pytest
+import app.jobs
+import app.main as m
+from app import scraper
+from app.budget import should_stop
+from conftest import wait_until
+
+HOJE = date.today()
+
+@pytest.fixture
+def coleta(monkeypatch, scheduler):
+    """Troca a coleta no navegador por uma que entrega parte do período e espera o job ser
+    cancelado (ou perder o prazo) antes de devolver, como a coleta real entre um dia e outro."""
+    state = {"comecou": threading.Event()}
+
+    def collect(username, password, start, end, engine, fresh_since, log, on_event=None,
+                use_cache=True, resources=None):
+        d1 = start + timedelta(days=1)
+        rows = scraper.rows_frame([
+            {"data": start, "quadra": "Quadra 1", "hora": "Integral", "status": "Indisponível"},
+            {"data": start, "quadra": "Quadra 2", "hora": "08:00", "status": "disponível"},
+            {"data": start, "quadra": "Quadra 2", "hora": "09:00", "status": "indisponível"},
+            {"data": d1, "quadra": "Quadra 2", "hora": "08:00", "status": "disponível"},
+        ])
+        state["comecou"].set()
+        wait_until(should_stop)
+        return [rows], ["Quadra 1", "Quadra 2"], None
+
+    monkeypatch.setattr(scraper, "_collect_with_browser", collect)
+    return state
+
+def finished(job_id: str) -> bool:
+    return bool((m.STORE.get(job_id) or {}).get("finished_at"))
+
+def test_delete_running_job_returns_partial_result(coleta, client, post_run):
+    job_id = post_run(dias=2)
+    assert coleta["comecou"].wait(5)
+    r = client.delete(f"/api/job/{job_id}")
+    assert (r.status_code, r.json()) == (202, {"status": "cancelling"})
+    wait_until(lambda: finished(job_id))
+
+    job = m.STORE.get(job_id)
+    assert (job["status"], job["partial"]) == ("ok", "cancelado")
+    d1, d2 = HOJE + timedelta(days=1), HOJE + timedelta(days=2)
+    assert job["missing"] == {"Quadra 1": [d1.isoformat(), d2.isoformat()], "Quadra 2": [d2.isoformat()]}
+
+    r = client.get(f"/api/job/{job_id}/rows")
+    assert r.status_code == 200
+    assert r.headers["X-Partial-Result"] == "cancelado"
+    assert {(x["quadra"], x["data"]) for x in r.json()["rows"]} >= {("Quadra 2", d1.isoformat())}
+
+    html = client.get(f"/api/job/{job_id}").text
+    assert "Resultado parcial" in html and "cancelado pelo usuário" in html
+    assert f"sem nenhum dado: {d2:%d/%m/%Y}" in html
+    # Quadra 1 faltou num dia que Quadra 2 tem: a célula diz "não coletado"
+    assert "não coletado" in html
+    # o cabeçalho do dia bloqueado ('Integral') mantém o nome das quadras
+    assert (f"<tr class='hdr'><td>{HOJE:%d/%m/%Y}</td><td>DiaSemana</td><td>Hora</td>"
+            "<td>Quadra 1</td><td>Quadra 2</td></tr>") in html
+
+    assert client.delete(f"/api/job/{job_id}").status_code == 409
+
+def test_deadline_returns_partial_result(coleta, monkeypatch, post_run):
+    monkeypatch.setattr(app.jobs, "JOB_DEADLINE_SECONDS", 0.2)
+    job_id = post_run(dias=2)
+    wait_until(lambda: finished(job_id))
+    job = m.STORE.get(job_id)
+    assert (job["status"], job["partial"]) == ("ok", "prazo")
+
+def test_delete_queued_job_never_runs(coleta, client, scheduler, post_run):
+    bloqueio = threading.Event()
+    scheduler.submit("ocupa", bloqueio.wait, 5)
+    job_id = post_run(dias=2)
+    assert client.delete(f"/api/job/{job_id}").json() == {"status": "cancelled"}
+    bloqueio.set()
+    job = m.STORE.get(job_id)
+    assert job["cancelled"] is True and job["status"] == "error"
+    assert not coleta["comecou"].wait(0.3)
+
+def test_delete_unknown_job(client):
+    assert client.delete("/api/job/nao-existe").status_code == 404
@@ -0,0 +1,103 @@
+import threading
+import pytest
+import app.jobs
+import app.main as m
+from conftest import wait_until
+
+@pytest.fixture
+def jobs(monkeypatch, scheduler):
+    """execute_job falso: registra (job_id, fresh_since), falha para ids em `falhar` e segura
+    os ids em `segurar` até `soltar` ser setado."""
+    state = {"rodou": [], "falhar": set(), "segurar": set(), "soltar": threading.Event(),
+             "comecou": threading.Event()}
+
+    def execute_job(store, job_id, username, password, start, end, engine=None, resources=None,
+                    fresh_since=None):
+        state["rodou"].append((job_id, fresh_since))
+        if job_id in state["segurar"]:
+            state["comecou"].set()
+            state["soltar"].wait(5)
+        if job_id in state["falhar"]:
+            store.finish(job_id, status="error", html=None, error="portal caiu")
+            raise RuntimeError("portal caiu")
+        store.finish(job_id, status="ok", html="<p>ok</p>", error=None)
+
+    monkeypatch.setattr(app.jobs, "execute_job", execute_job)
+    return state
+
+def ran(state) -> list:
+    return [j for j, _ in state["rodou"]]
+
+def test_follower_attaches_to_leader_covering_its_range(scheduler):
+    assert m._attach_or_lead("L", 1, 10, "tenis", ("L",)) is None
+    assert m._attach_or_lead("F", 3, 7, "tenis", ("F",)) == "L"
+    assert m._attach_or_lead("F2", 1, 10, "tenis", ("F2",)) == "L"
+    assert [a[0] for a in m.INFLIGHT["L"]["followers"]] == ["F", "F2"]
+
+def test_wider_range_or_other_resources_lead_their_own_job(scheduler):
+    m._attach_or_lead("L", 5, 10, "tenis", ("L",))
+    assert m._attach_or_lead("A", 4, 10, "tenis", ("A",)) is None
+    assert m._attach_or_lead("B", 5, 11, "tenis", ("B",)) is None
+    assert m._attach_or_lead("C", 6, 8, "todos", ("C",)) is None
+    assert m.INFLIGHT["L"]["followers"] == []
+    assert set(m.INFLIGHT) == {"L", "A", "B", "C"}
+
+def occupy_worker(jobs, scheduler):
+    # o único worker fica ocupado: o próximo líder espera na fila (mas já está no INFLIGHT)
+    jobs["segurar"].add("ocupa")
+    scheduler.submit("ocupa", m._do_job, "ocupa", "u", "p", 0, 0, None, None)
+    assert jobs["comecou"].wait(5)
+
+def test_follower_reuses_the_leader_through_run(jobs, scheduler, post_run):
+    occupy_worker(jobs, scheduler)
+    lider = post_run(dias=5)
+    seguidor = post_run(dias=2)
+    assert m.STORE.get(seguidor)["leader"] == lider
+    jobs["soltar"].set()
+    wait_until(lambda: ran(jobs) == ["ocupa", lider, seguidor])
+    # o seguidor roda depois do líder, aceitando o que ele coletou (fresh_since = início do líder)
+    assert jobs["rodou"][2][1] is not None
+    assert m.INFLIGHT == {}
+
+def test_failed_leader_releases_followers(jobs, scheduler):
+    jobs["falhar"].add("L")
+    m.STORE.create("L", {"status": "pending"})
+    m.STORE.create("F", {"status": "pending"})
+    args = ("L", "u", "p", 1, 10, None, "tenis")
+    assert m._attach_or_lead("L", 1, 10, "tenis", args) is None
+    assert m._attach_or_lead("F", 2, 3, "tenis", ("F", "u", "p", 2, 3, None, "tenis")) == "L"
+    started = m.INFLIGHT["L"]["started"]
+    scheduler.submit("L", m._do_job, *args)
+    wait_until(lambda: ran(jobs) == ["L", "F"])
+    assert jobs["rodou"][1] == ("F", started)
+    assert m.STORE.get("F")["status"] == "ok"
+    assert m.INFLIGHT == {}
+
+def test_cancelled_queued_leader_hands_followers_over(jobs, client, scheduler, post_run):
+    occupy_worker(jobs, scheduler)
+    lider = post_run(dias=5)
+    seguidor = post_run(dias=2)
+    assert m.STORE.get(seguidor)["leader"] == lider
+
+    assert client.delete(f"/api/job/{lider}").json() == {"status": "cancelled"}
+    assert lider not in m.INFLIGHT
+    # pedido novo igual não se pendura no líder cancelado: vira líder
+    novo = post_run(dias=1)
+    assert m.STORE.get(novo).get("leader") is None
+    assert novo in m.INFLIGHT
+
+    jobs["soltar"].set()
+    wait_until(lambda: set(ran(jobs)) == {"ocupa", seguidor, novo})
+    assert lider not in ran(jobs)
+    assert m.STORE.get(lider)["cancelled"] is True
+    assert m.STORE.get(seguidor)["status"] == "ok"
+
+def test_cancelled_follower_is_dropped(jobs, client, scheduler, post_run):
+    occupy_worker(jobs, scheduler)
+    lider = post_run(dias=5)
+    seguidor = post_run(dias=2)
+    assert client.delete(f"/api/job/{seguidor}").json() == {"status": "cancelled"}
+    assert m.INFLIGHT[lider]["followers"] == []
+    jobs["soltar"].set()
+    wait_until(lambda: ran(jobs) == ["ocupa", lider])
+    assert m.STORE.get(seguidor)["cancelled"] is True
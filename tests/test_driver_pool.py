@@ -0,0 +1,71 @@
+import itertools
+import pytest
+from app import driver_pool
+from app.driver_pool import DriverPool
+
+@pytest.fixture
+def chrome(monkeypatch):
+    """Troca o Chrome por objetos simples e registra quem foi lançado e quem foi fechado."""
+    state = {"launched": [], "quit": [], "on_launch": None}
+    ids = itertools.count(1)
+
+    def launch():
+        if state["on_launch"]:
+            state["on_launch"]()
+        d = f"chrome-{next(ids)}"
+        state["launched"].append(d)
+        return d
+
+    monkeypatch.setattr(driver_pool, "launch_driver", launch)
+    monkeypatch.setattr(driver_pool, "_quit", state["quit"].append)
+    monkeypatch.setattr(driver_pool, "is_healthy", lambda d: True)
+    monkeypatch.setattr(driver_pool, "reset_driver", lambda d: True)
+    return state
+
+def alive(state) -> int:
+    return len(state["launched"]) - len(state["quit"])
+
+def test_prewarm_counts_drivers_in_use(chrome):
+    pool = DriverPool(size=2)
+    a = pool.acquire(timeout=0)
+    pool.prewarm()
+    assert alive(chrome) == 2
+    b = pool.acquire(timeout=0)
+    pool.prewarm()
+    assert alive(chrome) == 2
+    pool.release(a)
+    pool.release(b)
+    assert alive(chrome) == 2
+    assert pool.free_slots() == 2
+
+def test_release_quits_drivers_above_pool_size(chrome):
+    pool = DriverPool(size=2)
+    a, b = pool.acquire(timeout=0), pool.acquire(timeout=0)
+    # ociosos que apareceram enquanto os dois jobs rodavam (ex.: aquecimento antigo)
+    pool._idle.append(driver_pool.launch_driver())
+    pool.release(a)
+    assert chrome["quit"] == [a]
+    # com `a` fora, sobram o ocioso e `b`: cabe no pool
+    pool.release(b)
+    assert chrome["quit"] == [a]
+    assert alive(chrome) == 2
+
+def test_prewarm_drops_a_launch_that_raced_with_jobs(chrome):
+    pool = DriverPool(size=2)
+
+    def jobs_take_every_slot():
+        chrome["on_launch"] = None
+        pool.acquire(timeout=0)
+        pool.acquire(timeout=0)
+
+    chrome["on_launch"] = jobs_take_every_slot
+    pool.prewarm()
+    assert pool._idle == []
+    assert alive(chrome) == 2
+
+def test_acquire_waits_for_a_slot(chrome):
+    pool = DriverPool(size=1)
+    a = pool.acquire(timeout=0)
+    assert pool.acquire(timeout=0.05) is None
+    pool.release(a)
+    assert pool.acquire(timeout=0) == a
@@ -0,0 +1,224 @@
+import shutil, contextvars
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+import pandas as pd
+import pytest
+import requests
+from lxml import html as lxml_html
+from selenium.common.exceptions import WebDriverException
+from app import http_engine
+from app.budget import start_budget
+from app.http_engine import PeriodRequest, new_session, parse_periodos_html
+from app.scraper import Resource, hora_from_text, status_from_cells
+from bench.mock_portal import BASE, MockPortal
+
+REC = 101
+HOJE = date.today()
+# janela fixa (atravessa a virada do mês) para a mistura de dias 'Integral' não depender de hoje
+INICIO = date(2026, 10, 25)
+
+@pytest.fixture(scope="module")
+def portal():
+    p = MockPortal(latency_ms=0, integral_ratio=0.3).start()
+    yield p
+    p.stop()
+
+@pytest.fixture(scope="module")
+def cookies(portal):
+    s = requests.Session()
+    s.post(portal.base_url + BASE + "/login.asp", data={"mem": "123", "pass": "x", "termo": "1"})
+    return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in s.cookies]
+
+def captured_for(portal, day: date) -> list:
+    """O que o gancho de XHR do motor HTTP registra quando o datepicker do mock carrega `day`
+    (a URL é a que o JS da página monta: data em dd/mm/aaaa com encodeURIComponent)."""
+    url = f"{portal.base_url}{BASE}/aplic/periodos.asp?rec={REC}&data={day:%d}%2F{day:%m}%2F{day:%Y}"
+    return [{"method": "GET", "url": url, "headers": {}, "body": None},
+            {"method": "POST", "url": portal.base_url + "/log", "headers": {}, "body": "evento=clique"}]
+
+def _cls(*names) -> str:
+    return " or ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {n} ')" for n in names)
+
+def selenium_rows(fragment: str, day: date, quadra: str) -> list:
+    """Mesma leitura do `_PERIODOS_JS` do scraper (td.integral, botão RESERVAR, td.reservar,
+    td.indisponivel/.disponivel), para comparar sem Chrome."""
+    doc = lxml_html.fromstring(f"<table id='tabelaDePeriodos'><tbody>{fragment}</tbody></table>")
+    out = []
+    for tr in doc.xpath("//table[@id='tabelaDePeriodos']/tbody/tr"):
+        h, r = tr.xpath(f"td[{_cls('integral')}]"), tr.xpath(f"td[{_cls('reservar')}]")
+        if not h or not r:
+            continue
+        btn = any("reservar" in b.text_content().lower() for b in r[0].xpath(".//button"))
+        mid = tr.xpath(f"td[{_cls('indisponivel', 'disponivel')}]")
+        out.append({"data": day, "quadra": quadra, "hora": hora_from_text(h[0].text_content()),
+                    "status": status_from_cells(btn, r[0].text_content().strip(),
+                                                mid[0].text_content().strip() if mid else "")})
+    return out
+
+def test_learn_finds_the_request_carrying_the_clicked_day(portal):
+    modelo = PeriodRequest.learn(captured_for(portal, HOJE), HOJE)
+    assert modelo is not None
+    assert (modelo.method, modelo.fmt, modelo.encoded) == ("GET", "%d/%m/%Y", True)
+    assert modelo.url.endswith(f"periodos.asp?rec={REC}&data={{data}}")
+
+def test_learn_without_the_date_returns_none(portal):
+    assert PeriodRequest.learn(captured_for(portal, HOJE), HOJE + timedelta(days=1)) is None
+    assert PeriodRequest.learn([], HOJE) is None
+
+def test_render_replaces_the_date_in_url_and_body():
+    modelo = PeriodRequest.learn([{"method": "post", "url": "http://x/periodos.asp",
+                                   "body": "rec=1&dia=2026-10-31", "headers": {"X-Requested-With": "XMLHttpRequest"}}],
+                                 date(2026, 10, 31))
+    assert (modelo.method, modelo.fmt, modelo.encoded) == ("POST", "%Y-%m-%d", False)
+    assert modelo.render(date(2026, 11, 1)) == ("http://x/periodos.asp", "rec=1&dia=2026-11-01")
+    assert modelo.headers == {"X-Requested-With": "XMLHttpRequest"}
+
+def test_replayed_request_matches_selenium_parsing(portal, cookies):
+    modelo = PeriodRequest.learn(captured_for(portal, INICIO), INICIO)
+    sess = new_session(cookies)
+    integral = 0
+    for n in range(1, 15):
+        d = INICIO + timedelta(days=n)
+        rows = parse_periodos_html(modelo.fetch(sess, d), d, "Quadra 1")
+        assert rows
+        assert rows == selenium_rows(portal.periodos(REC, d), d, "Quadra 1")
+        integral += rows[0]["hora"] == "Integral"
+    # a janela cobre dias bloqueados ('Integral') e dias normais
+    assert 0 < integral < 14
+
+def test_replay_without_session_gets_no_rows(portal):
+    modelo = PeriodRequest.learn(captured_for(portal, HOJE), HOJE)
+    # sem cookie o portal devolve a página de login: o motor vê zero linhas e volta ao Selenium
+    assert parse_periodos_html(modelo.fetch(new_session([]), HOJE), HOJE, "Quadra 1") == []
+
+def test_parse_full_page_and_fragment(portal):
+    frag = portal.periodos(REC, HOJE)
+    page = f"<html><body><table id='tabelaDePeriodos'><tbody>{frag}</tbody></table></body></html>"
+    assert parse_periodos_html(page, HOJE, "Q") == parse_periodos_html(frag.encode("utf-8"), HOJE, "Q")
+    assert parse_periodos_html(b"", HOJE, "Q") == []
+
+def test_parse_matches_selenium_in_chrome(portal, cookies):
+    if not (shutil.which("chromedriver") and (shutil.which("google-chrome") or shutil.which("chromium"))):
+        pytest.skip("sem Chrome/chromedriver")
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
+    from app.scraper import parse_period_table, wait_for_change
+    opts = webdriver.ChromeOptions()
+    opts.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=opts)
+    try:
+        driver.get(portal.base_url + "/")
+        for c in cookies:
+            driver.add_cookie({"name": c["name"], "value": c["value"], "path": "/",
+                               "domain": urlsplit(portal.base_url).hostname})
+        driver.get(f"{portal.base_url}{BASE}/aplic/reserva.asp?rec={REC}")
+        assert wait_for_change(driver, "#tabelaDePeriodos tbody tr")
+        via_chrome = parse_period_table(WebDriverWait(driver, 10), driver, HOJE, "Quadra 1").to_dict("records")
+    finally:
+        driver.quit()
+    modelo = PeriodRequest.learn(captured_for(portal, HOJE), HOJE)
+    assert via_chrome == parse_periodos_html(modelo.fetch(new_session(cookies), HOJE), HOJE, "Quadra 1")
+
+class FakeDriver:
+    """O suficiente de um WebDriver para `extract_range_for_quadra_http`: o gancho de XHR registra
+    a requisição que o clique no dia "disparou"."""
+
+    def __init__(self, portal, cookies):
+        self.portal, self.cookies, self.reqs = portal, cookies, []
+
+    def execute_script(self, js, *args):
+        if js == http_engine._HOOK_JS:
+            self.reqs = []
+        elif "__bbzReqs" in js:
+            return list(self.reqs)
+        elif "userAgent" in js:
+            return "pytest"
+        elif "location.href" in js:
+            return f"{self.portal.base_url}{BASE}/aplic/reserva.asp?rec={REC}"
+
+    def get_cookies(self):
+        return self.cookies
+
+@pytest.fixture
+def engine(portal, cookies, monkeypatch):
+    """Motor HTTP com o navegador trocado por FakeDriver; `sem_xhr` são dias cujo clique não
+    dispara a requisição e `on_click(d)` roda antes de cada clique."""
+    state = {"cliques": [], "gravados": [], "sem_xhr": set(), "on_click": None}
+    driver = FakeDriver(portal, cookies)
+
+    def click_day(wait, drv, d):
+        if state["on_click"]:
+            state["on_click"](d)
+        state["cliques"].append(d)
+        if d not in state["sem_xhr"]:
+            drv.reqs = captured_for(portal, d)[:1]
+        return True
+
+    for nome in ("ensure_reservas_list_ready", "click_resource", "switch_to_new_window_if_any",
+                 "try_switch_to_any_frame"):
+        monkeypatch.setattr(http_engine, nome, lambda *a, **k: None)
+    monkeypatch.setattr(http_engine, "click_day_in_calendar", click_day)
+    monkeypatch.setattr(http_engine, "parse_period_table", lambda wait, drv, d, q: pd.DataFrame(
+        selenium_rows(portal.periodos(REC, d), d, q)))
+    monkeypatch.setattr(http_engine, "record_day", lambda q, d, rows, on_day=None: state["gravados"].append(d))
+
+    def run(dias: int, cancel_on: date = None):
+        log = []
+        def job():
+            budget = start_budget(0)
+            if cancel_on:
+                def on_click(d):
+                    if d == cancel_on:
+                        budget.cancel()
+                        raise WebDriverException("navegador derrubado pelo cancelamento")
+                state["on_click"] = on_click
+            res = Resource("Quadra 1", "QUADRA DE TENIS 1", str(REC), True)
+            return http_engine.extract_range_for_quadra_http(
+                None, driver, res, INICIO, INICIO + timedelta(days=dias - 1), log=log.append)
+        return contextvars.copy_context().run(job), log
+    state["run"] = run
+    return state
+
+def expected(dias: int) -> list:
+    return [INICIO + timedelta(days=n) for n in range(dias)]
+
+def test_engine_learns_on_first_day_then_uses_http(engine, portal):
+    df, log = engine["run"](6)
+    assert engine["cliques"] == [INICIO]
+    assert engine["gravados"] == expected(6)
+    assert df.to_dict("records") == [r for d in expected(6) for r in selenium_rows(portal.periodos(REC, d), d, "Quadra 1")]
+    assert any("motor HTTP usando GET" in m for m in log)
+
+def test_engine_retries_learning_after_a_day_without_xhr(engine):
+    engine["sem_xhr"] = {INICIO, INICIO + timedelta(days=1)}
+    df, log = engine["run"](6)
+    # os dois primeiros dias não disparam a requisição: o modelo sai do terceiro
+    assert engine["cliques"] == expected(3)
+    assert engine["gravados"] == expected(6)
+    assert sorted(df["data"].unique()) == expected(6)
+    assert not any("não identificada" in m for m in log)
+
+def test_engine_without_any_xhr_stays_on_selenium(engine):
+    engine["sem_xhr"] = set(expected(4))
+    df, log = engine["run"](4)
+    assert engine["cliques"] == expected(4)
+    assert sum("não identificada" in m for m in log) == 1
+
+def test_cancel_during_first_selenium_day_is_a_partial_result(engine):
+    df, log = engine["run"](4, cancel_on=INICIO)
+    assert df.empty
+    assert engine["gravados"] == []
+    assert any("coleta interrompida (cancelado)" in m for m in log)
+
+def test_cancel_while_learning_keeps_collected_days(engine):
+    engine["sem_xhr"] = set(expected(4))
+    df, log = engine["run"](4, cancel_on=INICIO + timedelta(days=2))
+    assert engine["gravados"] == expected(2)
+    assert sorted(df["data"].unique()) == expected(2)
+
+def test_browser_error_without_cancel_still_raises(engine):
+    def boom(d):
+        raise WebDriverException("chrome caiu")
+    engine["on_click"] = boom
+    with pytest.raises(WebDriverException):
+        engine["run"](2)
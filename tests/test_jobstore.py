@@ -0,0 +1,157 @@
+import socketserver, threading, time
+import pytest
+from app.jobstore import RedisJobStore, RespClient, RespError
+
+class _FakeRedis(socketserver.ThreadingTCPServer):
+    """Servidor RESP2 em processo com só os comandos que o RedisJobStore usa (sem TTL)."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, password: str = None):
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.password = password
+        self.data = {}
+        self.cond = threading.Condition()
+        self.connections = 0
+
+def _enc(v) -> bytes:
+    if v is None:
+        return b"$-1\r\n"
+    if isinstance(v, Exception):
+        return b"-" + str(v).encode() + b"\r\n"
+    if isinstance(v, int):
+        return b":%d\r\n" % v
+    if isinstance(v, str):
+        return b"+" + v.encode() + b"\r\n"
+    if isinstance(v, bytes):
+        return b"$%d\r\n%s\r\n" % (len(v), v)
+    return b"*%d\r\n" % len(v) + b"".join(_enc(x) for x in v)
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    def _read(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        out = []
+        for _ in range(int(line[1:])):
+            n = int(self.rfile.readline()[1:])
+            out.append(self.rfile.read(n + 2)[:-2])
+        return out
+
+    def handle(self):
+        srv = self.server
+        srv.connections += 1
+        authed = srv.password is None
+        while (cmd := self._read()) is not None:
+            name, a = cmd[0].decode().upper(), cmd[1:]
+            if name == "AUTH":
+                authed = a[-1].decode() == srv.password
+                self.wfile.write(_enc("OK" if authed else Exception("WRONGPASS invalid password")))
+                continue
+            if not authed:
+                self.wfile.write(_enc(Exception("NOAUTH Authentication required.")))
+                continue
+            self.wfile.write(_enc(self._run(srv, name, a)))
+
+    @staticmethod
+    def _run(srv, name, a):
+        d = srv.data
+        with srv.cond:
+            if name in ("SELECT", "SET"):
+                if name == "SET":
+                    d[a[0]] = a[1]
+                return "OK"
+            if name == "DEL":
+                return sum(d.pop(k, None) is not None for k in a)
+            if name == "EXISTS":
+                return sum(k in d for k in a)
+            if name == "EXPIRE":
+                return int(a[0] in d)
+            if name == "HSET":
+                h = d.setdefault(a[0], {})
+                for i in range(1, len(a), 2):
+                    h[a[i]] = a[i + 1]
+                return (len(a) - 1) // 2
+            if name == "HGETALL":
+                return [x for kv in d.get(a[0], {}).items() for x in kv]
+            if name == "HGET":
+                return d.get(a[0], {}).get(a[1])
+            if name == "HMGET":
+                return [d.get(a[0], {}).get(k) for k in a[1:]]
+            if name == "GET":
+                return d.get(a[0])
+            if name == "RPUSH":
+                d.setdefault(a[0], []).extend(a[1:])
+                srv.cond.notify_all()
+                return len(d[a[0]])
+            if name == "LLEN":
+                return len(d.get(a[0], []))
+            if name == "LRANGE":
+                lst, start, stop = d.get(a[0], []), int(a[1]), int(a[2])
+                return lst[start:] if stop == -1 else lst[start:stop + 1]
+            if name == "BLPOP":
+                end = time.time() + float(a[-1])
+                while not d.get(a[0]) and time.time() < end:
+                    srv.cond.wait(end - time.time())
+                return [a[0], d[a[0]].pop(0)] if d.get(a[0]) else None
+            return Exception(f"ERR unknown command '{name}'")
+
+@pytest.fixture
+def fake_redis():
+    srv = _FakeRedis(password="s3nha")
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def _url(srv, password):
+    host, port = srv.server_address
+    return f"redis://:{password}@{host}:{port}/1"
+
+def test_store_roundtrip(fake_redis):
+    store = RedisJobStore(_url(fake_redis, "s3nha"), prefix="t:")
+    store.create("j1", {"status": "pending", "html": None})
+    assert store.get("j1")["status"] == "pending"
+    assert store.get("nope") is None
+
+    store.enqueue("j1", {"username": "u", "dias": 3})
+    assert store.queue_len() == 1
+    assert store.queue_position("j1") == 1
+    assert store.dequeue(timeout=1) == ("j1", {"username": "u", "dias": 3})
+    assert store.queue_len() == 0
+    assert store.dequeue(timeout=1) is None
+
+    store.update("j1", status="running", started_at=time.time())
+    assert store.queue_position("j1") == 0
+    store.append_event("j1", {"type": "progress", "msg": "oi"})
+    store.finish("j1", status="ok", html="<p>ok</p>")
+    job = store.get("j1")
+    assert (job["status"], job["html"]) == ("ok", "<p>ok</p>")
+    assert store.queue_position("j1") is None
+    assert store.events("j1") == [{"type": "progress", "msg": "oi"}, {"type": "done", "status": "ok"}]
+    assert store.events("j1", 1) == [{"type": "done", "status": "ok"}]
+    assert store.events("nope") is None
+
+    store.delete("j1")
+    assert store.get("j1") is None
+
+def test_update_of_missing_job_does_not_create_it(fake_redis):
+    store = RedisJobStore(_url(fake_redis, "s3nha"), prefix="t:")
+    store.update("fantasma", status="running")
+    assert store.get("fantasma") is None
+
+def test_failed_auth_does_not_cache_the_connection(fake_redis):
+    bad = RespClient(_url(fake_redis, "errada"))
+    with pytest.raises(RespError):
+        bad.call("GET", "x")
+    assert getattr(bad._local, "conn", None) is None
+    # a próxima chamada reconecta (e tenta o AUTH de novo) em vez de usar a conexão sem senha
+    with pytest.raises(RespError, match="WRONGPASS"):
+        bad.call("GET", "x")
+    assert fake_redis.connections == 2
+
+def test_connection_is_reused_after_auth(fake_redis):
+    client = RespClient(_url(fake_redis, "s3nha"))
+    client.call("SET", "k", "v")
+    assert client.call("GET", "k") == b"v"
+    assert fake_redis.connections == 1
@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+import pytest
+from app.slot_cache import SlotCache, _estimate_size
+
+HOJE = date.today()
+LONGE = HOJE + timedelta(days=10)   # fora de hoje/amanhã: usa o TTL normal
+
+class Clock:
+    def __init__(self, t: float = 1_000_000.0):
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+def rows(day: date, *horas, quadra: str = "Quadra 1") -> list:
+    return [{"data": day, "quadra": quadra, "hora": h, "status": "disponível"} for h in horas]
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def cache(clock):
+    return SlotCache(ttl=600, ttl_near=120, max_bytes=10**6, clock=clock)
+
+def test_keyed_by_court_and_day(cache):
+    cache.put("Quadra 1", LONGE, rows(LONGE, "08:00"))
+    cache.put("Quadra 2", LONGE, rows(LONGE, "09:00", quadra="Quadra 2"))
+    assert [r["hora"] for r in cache.get("Quadra 1", LONGE)] == ["08:00"]
+    assert [r["hora"] for r in cache.get("Quadra 2", LONGE)] == ["09:00"]
+    assert cache.get("Quadra 1", LONGE + timedelta(days=1)) is None
+    assert cache.get("Quadra 3", LONGE) is None
+    # sobrescrever a mesma chave troca as linhas e não soma bytes
+    cache.put("Quadra 1", LONGE, rows(LONGE, "10:00"))
+    assert [r["hora"] for r in cache.get("Quadra 1", LONGE)] == ["10:00"]
+    assert cache.stats()["entries"] == 2
+    assert cache.bytes == _estimate_size(rows(LONGE, "10:00")) + _estimate_size(rows(LONGE, "09:00"))
+
+def test_empty_day_is_a_hit(cache):
+    cache.put("Quadra 1", LONGE, [])
+    assert cache.get("Quadra 1", LONGE) == []
+    assert cache.stats()["hits"] == 1
+
+def test_ttl_expiry(cache, clock):
+    cache.put("Quadra 1", LONGE, rows(LONGE, "08:00"))
+    clock.t += 599
+    assert cache.get("Quadra 1", LONGE) is not None
+    clock.t += 1
+    assert cache.get("Quadra 1", LONGE) is None
+    assert cache.stats()["misses"] == 1
+
+def test_today_and_tomorrow_use_the_short_ttl(cache, clock):
+    amanha = HOJE + timedelta(days=1)
+    for d in (HOJE, amanha, LONGE):
+        cache.put("Quadra 1", d, rows(d, "08:00"))
+    clock.t += 121
+    assert cache.get("Quadra 1", HOJE) is None
+    assert cache.get("Quadra 1", amanha) is None
+    assert cache.get("Quadra 1", LONGE) is not None
+
+def test_fresh_since_accepts_old_entries_collected_after_it(cache, clock):
+    inicio_job = clock.t
+    cache.put("Quadra 1", LONGE, rows(LONGE, "08:00"))
+    clock.t += 3600
+    assert cache.get("Quadra 1", LONGE) is None
+    assert cache.get("Quadra 1", LONGE, fresh_since=inicio_job) is not None
+    assert cache.get("Quadra 1", LONGE, fresh_since=inicio_job + 1) is None
+
+def test_lru_eviction_by_bytes(clock):
+    um_dia = _estimate_size(rows(LONGE, "08:00"))
+    cache = SlotCache(ttl=600, ttl_near=120, max_bytes=2 * um_dia, clock=clock)
+    d1, d2, d3 = (LONGE + timedelta(days=n) for n in range(3))
+    cache.put("Quadra 1", d1, rows(d1, "08:00"))
+    cache.put("Quadra 1", d2, rows(d2, "08:00"))
+    cache.get("Quadra 1", d1)          # d1 passa a ser o mais recente; d2 é o menos usado
+    cache.put("Quadra 1", d3, rows(d3, "08:00"))
+    assert cache.get("Quadra 1", d2) is None
+    assert cache.get("Quadra 1", d1) is not None
+    assert cache.get("Quadra 1", d3) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.bytes <= cache.max_bytes
+
+def test_single_entry_larger_than_limit_is_kept(clock):
+    cache = SlotCache(max_bytes=10, clock=clock)
+    cache.put("Quadra 1", LONGE, rows(LONGE, "08:00", "09:00"))
+    assert cache.get("Quadra 1", LONGE) is not None
+
+def test_lookup_range_splits_cached_and_missing(cache, clock):
+    d0, d1, d2 = (LONGE + timedelta(days=n) for n in range(3))
+    cache.put("Quadra 1", d0, rows(d0, "08:00"))
+    cache.put("Quadra 1", d2, [])
+    cached, missing = cache.lookup_range("Quadra 1", d0, d2)
+    assert sorted(cached) == [d0, d2]
+    assert missing == [d1]
+    hits = cache.stats()["hits"]
+    cache.lookup_range("Quadra 1", d0, d2, count=False)
+    assert cache.stats()["hits"] == hits
+    clock.t += 600
+    assert cache.lookup_range("Quadra 1", d0, d2) == ({}, [d0, d1, d2])
+
+def test_clear(cache):
+    cache.put("Quadra 1", LONGE, rows(LONGE, "08:00"))
+    cache.clear()
+    assert cache.stats()["entries"] == 0 and cache.bytes == 0
+    assert cache.get("Quadra 1", LONGE) is None
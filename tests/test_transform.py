@@ -0,0 +1,98 @@
+import pandas as pd
+from app.transform import build_wide, expand_integral, normalize_rows, tidy_rows
+
+COLS = ["data", "quadra", "hora", "status"]
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=COLS)
+
+# 31/10 (sábado) e 01/11 (domingo): a virada do mês pega a ordenação por texto de "Dia"
+ROWS = frame([
+    ("2026-11-01", "Quadra 10", "10:00", "disponível"),
+    ("2026-10-31", "Quadra 10", "08:00", "disponível"),
+    ("2026-10-31", "Quadra 2", "09:00", "indisponível"),
+    ("2026-10-31", "Quadra 2", "08:00", "disponível"),
+    ("2026-11-01", "Quadra 2", "Integral", "Indisponível"),
+    ("2026-10-31", "Quadra 10", "10:00", "indisponível"),
+])
+
+def test_expand_integral_blocks_every_hour_of_the_catalog():
+    full, blocked = expand_integral(normalize_rows(ROWS))
+    dia = full[(full["data"] == "2026-11-01") & (full["quadra"] == "Quadra 2")]
+    assert sorted(dia["hora"]) == ["08:00", "09:00", "10:00"]
+    assert set(dia["status"]) == {"indisponível"}
+    assert [d.date().isoformat() for d in blocked] == ["2026-11-01"]
+    # o outro recurso do mesmo dia não é tocado
+    assert len(full[(full["data"] == "2026-11-01") & (full["quadra"] == "Quadra 10")]) == 1
+
+def test_expand_integral_without_blocked_days_keeps_rows():
+    full = normalize_rows(ROWS[ROWS["hora"] != "Integral"])
+    out, blocked = expand_integral(full)
+    assert out is full
+    assert blocked.empty
+
+def test_expand_integral_ignores_available_integral():
+    full = normalize_rows(frame([("2026-10-31", "Quadra 1", "Integral", "Disponível"),
+                                 ("2026-10-31", "Quadra 1", "08:00", "disponível")]))
+    out, blocked = expand_integral(full)
+    assert blocked.empty
+    assert len(out) == 2
+
+def test_build_wide_columns_follow_natural_court_order():
+    wide = build_wide(ROWS)
+    assert list(wide.columns) == ["Dia", "DiaSemana", "Hora", "Quadra 2", "Quadra 10"]
+
+def test_build_wide_requested_courts_come_first_even_without_rows():
+    wide = build_wide(ROWS, ["Quadra 3"])
+    assert list(wide.columns) == ["Dia", "DiaSemana", "Hora", "Quadra 3", "Quadra 2", "Quadra 10"]
+    assert wide["Quadra 3"].isna().sum() == len(wide) - 1   # só o cabeçalho do dia bloqueado
+
+def test_build_wide_orders_across_month_boundary():
+    wide = build_wide(ROWS)
+    assert list(wide["Dia"].drop_duplicates()) == ["31/10/2026", "01/11/2026"]
+    assert list(wide.loc[wide["Dia"] == "31/10/2026", "Hora"]) == ["08:00", "09:00", "10:00"]
+    assert list(wide.loc[wide["Dia"] == "31/10/2026", "DiaSemana"].unique()) == ["sábado"]
+
+def test_build_wide_blocked_day_gets_header_row_first():
+    wide = build_wide(ROWS)
+    dia = wide[wide["Dia"] == "01/11/2026"].reset_index(drop=True)
+    assert dia.loc[0].tolist() == ["01/11/2026", "DiaSemana", "Hora", "Quadra 2", "Quadra 10"]
+    assert list(dia["Hora"][1:]) == ["08:00", "09:00", "10:00"]
+    assert set(dia["Quadra 2"][1:]) == {"indisponível"}
+    assert list(dia["Quadra 10"][1:]) == [None, None, "disponível"]
+    assert (wide["Hora"] == "Hora").sum() == 1
+
+def test_build_wide_sorts_hours_by_time_not_text():
+    wide = build_wide(frame([("2026-10-31", "Quadra 1", "10:00", "disponível"),
+                             ("2026-10-31", "Quadra 1", "9:30", "disponível"),
+                             ("2026-10-31", "Quadra 1", "", "disponível")]))
+    assert list(wide["Hora"]) == ["", "9:30", "10:00"]
+
+def test_build_wide_empty_input():
+    wide = build_wide(frame([]))
+    assert wide.empty
+    assert list(wide.columns) == ["Dia", "DiaSemana", "Hora"]
+    assert list(build_wide(frame([]), ["Quadra 1"]).columns) == ["Dia", "DiaSemana", "Hora", "Quadra 1"]
+
+def test_tidy_rows_expands_integral_and_orders_naturally():
+    tidy = tidy_rows(ROWS)
+    assert list(tidy.columns) == ["data", "dia_semana", "quadra", "hora", "status"]
+    assert "Integral" not in set(tidy["hora"])
+    assert list(zip(tidy["data"].dt.strftime("%d/%m"), tidy["quadra"], tidy["hora"])) == [
+        ("31/10", "Quadra 2", "08:00"), ("31/10", "Quadra 2", "09:00"),
+        ("31/10", "Quadra 10", "08:00"), ("31/10", "Quadra 10", "10:00"),
+        ("01/11", "Quadra 2", "08:00"), ("01/11", "Quadra 2", "09:00"), ("01/11", "Quadra 2", "10:00"),
+        ("01/11", "Quadra 10", "10:00"),
+    ]
+    assert list(tidy["dia_semana"].unique()) == ["sábado", "domingo"]
+
+def test_tidy_rows_drops_rows_without_hour_and_duplicates():
+    tidy = tidy_rows(frame([("2026-10-31", "Quadra 1", "", "disponível"),
+                            ("2026-10-31", "Quadra 1", "08:00", "disponível"),
+                            ("2026-10-31", "Quadra 1", "08:00", "indisponível")]))
+    assert list(tidy["status"]) == ["disponível"]
+
+def test_tidy_rows_empty_input():
+    tidy = tidy_rows(frame([]))
+    assert tidy.empty
+    assert list(tidy.columns) == ["data", "dia_semana", "quadra", "hora", "status"]
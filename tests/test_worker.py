@@ -0,0 +1,25 @@
+import logging
+import pytest
+from app import worker
+
+class Parar(BaseException):
+    """Sai do laço infinito (_loop só trata Exception)."""
+
+def test_loop_logs_store_errors_and_retries(monkeypatch, caplog):
+    chamadas = []
+
+    def run_one(store):
+        chamadas.append(store)
+        if len(chamadas) == 1:
+            raise ConnectionError("redis fora do ar")
+        raise Parar
+
+    monkeypatch.setattr(worker, "run_one", run_one)
+    monkeypatch.setattr(worker.time, "sleep", lambda s: None)
+    caplog.set_level(logging.ERROR, logger="app.worker")
+    with pytest.raises(Parar):
+        worker._loop("store")
+    assert len(chamadas) == 2
+    [rec] = caplog.records
+    assert rec.name == "app.worker" and rec.levelno == logging.ERROR
+    assert "redis fora do ar" in rec.getMessage() and rec.exc_info is not None